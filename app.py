@@ -5,6 +5,27 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import numpy as np
 
+from orcamento.arquivos import versao_dados
+from orcamento.artefatos import Artefatos, versao_codigo
+from orcamento.busca import buscar, indexar_textos
+from orcamento.cache_colunar import carregar_tabela
+from orcamento.classificacao import (
+    FUNDEB,
+    TRANSFERENCIAS,
+    TRANSFERENCIAS_ESTADO,
+    TRANSFERENCIAS_UNIAO,
+    TRIBUTARIAS,
+    indexar_tabela,
+    posicoes_prefixo,
+    somar_prefixo,
+)
+from orcamento.conversao import CENTAVOS_POR_REAL, colunas_em_reais, em_reais, reais_para_centavos
+from orcamento.esquemas import ESQUEMAS, ESTRUTURA_LOA, RECEITAS_LOA
+from orcamento.filtros import combinar_mascaras, mascara_posicoes, ordem_em_arrays
+from orcamento.hierarquia import montar_cubo, ramos_do_cubo
+from orcamento.metricas import Metricas
+from orcamento.paginacao import TAMANHO_PAGINA, numero_de_paginas, ordenar_coluna, posicoes_da_pagina, selecionar_ordem
+
 # Configuração da página
 st.set_page_config(
     page_title="LOA Rifaina - Análise Orçamentária", 
@@ -44,51 +65,105 @@ hide_streamlit_style = """
                 """
 st.markdown(hide_streamlit_style, unsafe_allow_html=True)
 
-# Função para carregar e processar dados
-@st.cache_data
-def load_data():
-    """Carrega e processa os dados da LOA"""
-    
-    # Carregar dados de receitas orçadas (file1)
-    try:
-        receitas_orcadas = pd.read_csv("download-123842.557.csv", sep=';', encoding='utf-8')
-    except:
-        receitas_orcadas = pd.read_csv("download-123842.557.csv", sep=';', encoding='latin-1')
-    
-    # Carregar dados de estrutura de receitas (file2)  
-    try:
-        estrutura_receitas = pd.read_csv("download-123701.452.csv", sep=';', encoding='utf-8')
-    except:
-        estrutura_receitas = pd.read_csv("download-123701.452.csv", sep=';', encoding='latin-1')
-    
-    return receitas_orcadas, estrutura_receitas
+# Funções para carregar e processar dados
+# O cache de cada arquivo é chaveado pela versão (conteúdo) dele: sem mudança, não recarrega.
+# cache_resource devolve o mesmo DataFrame para todas as sessões, sem cópia: a tabela
+# já vem com as colunas derivadas e nunca deve ser alterada pelas páginas
+@st.cache_resource
+def load_tabela(nome, versao):
+    """Carrega uma tabela do registro de esquemas, só com as colunas declaradas"""
+    return carregar_tabela(ESQUEMAS[nome])
 
-def format_currency(value):
-    """Formata valores em moeda brasileira"""
-    return f"R$ {value:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+# Índices, cubo e figuras também ficam no armazém em disco, chaveados pela versão dos
+# dados e do código: depois de um reinício, são lidos de lá em vez de montados de novo
+artefatos = Artefatos(versao_codigo(__file__))
 
-def create_treemap_data(df, codigo_col, nome_col, valor_col, nivel_max=4):
-    """Cria dados para treemap hierárquico"""
-    treemap_data = []
-    
-    # Agrupar por diferentes níveis hierárquicos
-    for nivel in range(1, nivel_max + 1):
-        df_nivel = df.copy()
-        df_nivel['codigo_truncado'] = df_nivel[codigo_col].str[:4 + (nivel-1)*3]
-        df_nivel['nome_truncado'] = df_nivel[nome_col]
-        
-        grouped = df_nivel.groupby(['codigo_truncado', 'nome_truncado'])[valor_col].sum().reset_index()
-        grouped['nivel'] = nivel
-        treemap_data.append(grouped)
-    
-    return pd.concat(treemap_data, ignore_index=True)
+@st.cache_resource
+def load_indice(nome, versao, coluna, valores):
+    """Índice de prefixos dos códigos de classificação, montado uma vez por versão do arquivo"""
+    return artefatos.carregar(
+        'indice', (nome, versao, coluna, valores),
+        lambda: indexar_tabela(load_tabela(nome, versao), coluna, valores),
+    )
+
+@st.cache_resource
+def load_busca(nome, versao, coluna):
+    """Índice invertido (sem acentos e maiúsculas) de uma coluna de texto, montado uma vez por versão do arquivo"""
+    return artefatos.carregar(
+        'busca', (nome, versao, coluna),
+        lambda: indexar_textos(load_tabela(nome, versao)[coluna].tolist()),
+    )
+
+@st.cache_resource
+def load_cubo(versao_receitas, versao_estrutura):
+    """Cubo do TOTOR acumulado pela árvore da estrutura, montado uma vez por versão dos arquivos"""
+    return artefatos.carregar('cubo', (versao_receitas, versao_estrutura), lambda: montar_cubo(
+        load_tabela(ESTRUTURA_LOA.nome, versao_estrutura),
+        [(load_tabela(RECEITAS_LOA.nome, versao_receitas), 'CODRE', ['TOTOR'])],
+    ))
+
+@st.cache_resource(show_spinner=False)
+def load_ordens(versao):
+    """Colunas ordenáveis do Detalhamento, ordenadas uma vez por versão do arquivo"""
+    def montar():
+        receitas = load_tabela(RECEITAS_LOA.nome, versao)
+        colunas = {'Valor Previsto': 'TOTOR', 'Código': 'CODRE', 'Descrição': 'NOME'}
+        return {rotulo: ordem_em_arrays(ordenar_coluna(receitas[coluna].tolist())) for rotulo, coluna in colunas.items()}
+    return artefatos.carregar('ordens', (versao,), montar)
+
+# Figuras montadas uma vez e compartilhadas entre sessões, chaveadas pela visão, pela
+# versão dos dados e pelos parâmetros; passando de FIGURAS_EM_CACHE, saem as usadas
+# há mais tempo. Fica em cache só a especificação (fig.to_dict()), e cada chamada monta
+# uma figura nova, que a sessão pode alterar sem afetar as outras (cada especificação
+# também fica no armazém de artefatos em disco)
+FIGURAS_EM_CACHE = 64
+
+@st.cache_resource(show_spinner=False, max_entries=FIGURAS_EM_CACHE)
+def load_especificacao(visao, versao, parametros, _montar):
+    """Especificação da figura de uma visão, montada por _montar() só se não estiver em cache
+    
+    _montar fica fora da chave: tudo o que ele lê precisa depender só da versão
+    dos dados e dos parâmetros.
+    """
+    return artefatos.carregar('figura', (visao, versao, parametros), lambda: _montar().to_dict())
+
+def load_figura(visao, versao, parametros, _montar):
+    """Figura nova da visão, montada a partir da especificação em cache"""
+    return go.Figure(load_especificacao(visao, versao, parametros, _montar))
+
+def format_currency(value):
+    """Formata valores em centavos como moeda brasileira"""
+    centavos = int(round(value))
+    reais, resto = divmod(abs(centavos), CENTAVOS_POR_REAL)
+    sinal = '-' if centavos < 0 else ''
+    return f"R$ {sinal}{reais:,}".replace(',', '.') + f",{resto:02d}"
 
 # Carregar dados
 st.title("📊 Análise da LOA - Município de Rifaina")
 st.markdown("**Lei Orçamentária Anual - Dashboard Interativo**")
 
+versao_receitas = versao_dados(RECEITAS_LOA.arquivo)
+versao_estrutura = versao_dados(ESTRUTURA_LOA.arquivo)
+versao_loa = versao_dados(RECEITAS_LOA.arquivo, ESTRUTURA_LOA.arquivo)
+
+# Conjuntos de dados, índices e métricas sob demanda: cada nó é calculado na primeira
+# vez que uma página pede por ele (a busca e o cubo, por exemplo, só nas páginas que os usam)
+metricas = Metricas()
+
+@metricas.metrica
+def receitas():
+    """Receitas da LOA, com o TOTOR em centavos"""
+    return load_tabela(RECEITAS_LOA.nome, versao_receitas)
+
+@metricas.metrica
+def estrutura():
+    """Estrutura (árvore) da classificação da receita"""
+    return load_tabela(ESTRUTURA_LOA.nome, versao_estrutura)
+
+# A barra lateral mostra as duas tabelas em todas as páginas
 with st.spinner("Carregando dados da LOA..."):
-    receitas_orcadas, estrutura_receitas = load_data()
+    receitas_orcadas = metricas['receitas']
+    estrutura_receitas = metricas['estrutura']
 
 # Verificar se os dados foram carregados corretamente
 if receitas_orcadas.empty or estrutura_receitas.empty:
@@ -101,21 +176,43 @@ st.sidebar.metric("Total de Receitas Previstas", len(receitas_orcadas))
 st.sidebar.metric("Categorias de Receita", len(estrutura_receitas))
 
 # Processamento de dados para análise
-receitas_orcadas['TOTOR'] = pd.to_numeric(receitas_orcadas['TOTOR'], errors='coerce').fillna(0)
-total_orcamento = receitas_orcadas['TOTOR'].sum()
+# TOTOR já vem em centavos pelo esquema; avisar sobre valores que não puderam ser lidos
+totor_invalidos = receitas_orcadas.attrs.get('celulas_invalidas', [])
+if totor_invalidos:
+    st.sidebar.warning(f"⚠️ {len(totor_invalidos)} valores de TOTOR inválidos foram considerados como zero.")
 
-# Calcular categorias principais globalmente
-receitas_tributarias = receitas_orcadas[
-    receitas_orcadas['CODRE'].str.startswith(('1112', '1113', '1114', '1121', '1122'))
-]['TOTOR'].sum()
+@metricas.metrica
+def indice_receitas():
+    """Índice de prefixos do CODRE, para as somas por categoria"""
+    return load_indice(RECEITAS_LOA.nome, versao_receitas, 'CODRE', ('TOTOR',))
 
-transferencias = receitas_orcadas[
-    receitas_orcadas['CODRE'].str.startswith(('1711', '1712', '1713', '1714', '1716', '1721', '1722', '1723', '1724', '1751'))
-]['TOTOR'].sum()
+@metricas.metrica
+def busca_receitas():
+    """Índice invertido das descrições, para a busca do Detalhamento"""
+    return load_busca(RECEITAS_LOA.nome, versao_receitas, 'NOME')
 
-outras_receitas = total_orcamento - receitas_tributarias - transferencias
+@metricas.metrica
+def cubo_receitas():
+    """TOTOR acumulado pela árvore da estrutura"""
+    return load_cubo(versao_receitas, versao_estrutura)
 
-st.sidebar.metric("Orçamento Total", format_currency(total_orcamento))
+@metricas.metrica
+def total_orcamento(receitas):
+    return receitas['TOTOR'].sum()
+
+@metricas.metrica
+def receitas_tributarias(indice_receitas):
+    return somar_prefixo(indice_receitas, TRIBUTARIAS, 'TOTOR')
+
+@metricas.metrica
+def transferencias(indice_receitas):
+    return somar_prefixo(indice_receitas, TRANSFERENCIAS, 'TOTOR')
+
+@metricas.metrica
+def outras_receitas(total_orcamento, receitas_tributarias, transferencias):
+    return total_orcamento - receitas_tributarias - transferencias
+
+st.sidebar.metric("Orçamento Total", format_currency(metricas['total_orcamento']))
 
 # Menu de navegação
 opcao = st.sidebar.selectbox(
@@ -151,29 +248,29 @@ if opcao == "Visão Geral":
     with col1:
         st.metric(
             "💰 Orçamento Total",
-            format_currency(total_orcamento),
+            format_currency(metricas['total_orcamento']),
             help="Valor total previsto para todas as receitas"
         )
     
     with col2:
         st.metric(
             "🏛️ Receitas Tributárias",
-            format_currency(receitas_tributarias),
-            f"{(receitas_tributarias/total_orcamento*100):.1f}% do total"
+            format_currency(metricas['receitas_tributarias']),
+            f"{(metricas['receitas_tributarias']/metricas['total_orcamento']*100):.1f}% do total"
         )
     
     with col3:
         st.metric(
             "🔄 Transferências",
-            format_currency(transferencias),
-            f"{(transferencias/total_orcamento*100):.1f}% do total"
+            format_currency(metricas['transferencias']),
+            f"{(metricas['transferencias']/metricas['total_orcamento']*100):.1f}% do total"
         )
     
     with col4:
         st.metric(
             "📋 Outras Receitas",
-            format_currency(outras_receitas),
-            f"{(outras_receitas/total_orcamento*100):.1f}% do total"
+            format_currency(metricas['outras_receitas']),
+            f"{(metricas['outras_receitas']/metricas['total_orcamento']*100):.1f}% do total"
         )
     
     st.divider()
@@ -183,36 +280,41 @@ if opcao == "Visão Geral":
     
     with col1:
         # Gráfico de pizza - Composição do orçamento
-        fig_pizza = go.Figure(data=[go.Pie(
-            labels=['Receitas Tributárias', 'Transferências', 'Outras Receitas'],
-            values=[receitas_tributarias, transferencias, outras_receitas],
-            hole=0.4,
-            marker_colors=['#1f77b4', '#ff7f0e', '#2ca02c']
-        )])
-        
-        fig_pizza.update_layout(
-            title="Composição do Orçamento por Categoria",
-            showlegend=True,
-            height=400
-        )
+        def montar_composicao():
+            fig_pizza = go.Figure(data=[go.Pie(
+                labels=['Receitas Tributárias', 'Transferências', 'Outras Receitas'],
+                values=[em_reais(metricas['receitas_tributarias']), em_reais(metricas['transferencias']), em_reais(metricas['outras_receitas'])],
+                hole=0.4,
+                marker_colors=['#1f77b4', '#ff7f0e', '#2ca02c']
+            )])
+            
+            fig_pizza.update_layout(
+                title="Composição do Orçamento por Categoria",
+                showlegend=True,
+                height=400
+            )
+            return fig_pizza
         
-        st.plotly_chart(fig_pizza, use_container_width=True)
+        st.plotly_chart(load_figura('composicao', versao_loa, (), montar_composicao), use_container_width=True)
     
     with col2:
         # Top 10 maiores receitas
-        top_receitas = receitas_orcadas.nlargest(10, 'TOTOR')
-        
-        fig_bar = px.bar(
-            top_receitas,
-            x='TOTOR',
-            y='NOME',
-            orientation='h',
-            title="Top 10 Maiores Receitas Previstas",
-            labels={'TOTOR': 'Valor (R$)', 'NOME': 'Receita'}
-        )
+        def montar_top_receitas():
+            top_receitas = receitas_orcadas.nlargest(10, 'TOTOR')
+            
+            fig_bar = px.bar(
+                colunas_em_reais(top_receitas, 'TOTOR'),
+                x='TOTOR',
+                y='NOME',
+                orientation='h',
+                title="Top 10 Maiores Receitas Previstas",
+                labels={'TOTOR': 'Valor (R$)', 'NOME': 'Receita'}
+            )
+            
+            fig_bar.update_layout(height=400, yaxis={'categoryorder': 'total ascending'})
+            return fig_bar
         
-        fig_bar.update_layout(height=400, yaxis={'categoryorder': 'total ascending'})
-        st.plotly_chart(fig_bar, use_container_width=True)
+        st.plotly_chart(load_figura('top_receitas', versao_loa, (), montar_top_receitas), use_container_width=True)
 
 # ==============================================================================
 # ANÁLISE POR CATEGORIA
@@ -220,11 +322,7 @@ if opcao == "Visão Geral":
 elif opcao == "Análise por Categoria":
     st.header("📊 Análise por Categoria de Receita")
     
-    # Agrupar receitas por nível hierárquico
-    receitas_orcadas['nivel_1'] = receitas_orcadas['CODRE'].str[:4]
-    receitas_orcadas['nivel_2'] = receitas_orcadas['CODRE'].str[:7]
-    
-    # Análise por nível 1
+    # Análise por nível 1 (nivel_1/nivel_2 já vêm calculados na carga)
     nivel1_agrupado = receitas_orcadas.groupby('nivel_1')['TOTOR'].sum().sort_values(ascending=False)
     
     # Mapear códigos para nomes mais legíveis
@@ -255,21 +353,27 @@ elif opcao == "Análise por Categoria":
         '2213': 'Alienação de Bens'
     }
     
-    # Treemap hierárquico
-    fig_treemap = go.Figure(go.Treemap(
-        labels=[codigo_nomes.get(codigo, f"Código {codigo}") for codigo in nivel1_agrupado.index],
-        values=nivel1_agrupado.values,
-        parents=[""] * len(nivel1_agrupado),
-        textinfo="label+value+percent parent",
-        hovertemplate='<b>%{label}</b><br>Valor: R$ %{value:,.2f}<br>Participação: %{percentParent}<extra></extra>'
-    ))
-    
-    fig_treemap.update_layout(
-        title="Distribuição Hierárquica das Receitas",
-        height=500
-    )
+    # Treemap hierárquico, direto do cubo da estrutura (cada conta já soma as descendentes)
+    def montar_treemap():
+        ramos = ramos_do_cubo(metricas['cubo_receitas'], 'TOTOR')
+        fig_treemap = go.Figure(go.Treemap(
+            ids=ramos.index,
+            labels=ramos['NOMRE'],
+            values=em_reais(ramos['TOTOR']),
+            parents=ramos['pai'],
+            branchvalues="total",
+            maxdepth=3,
+            textinfo="label+value+percent parent",
+            hovertemplate='<b>%{label}</b><br>Valor: R$ %{value:,.2f}<br>Participação: %{percentParent}<extra></extra>'
+        ))
+        
+        fig_treemap.update_layout(
+            title="Distribuição Hierárquica das Receitas",
+            height=500
+        )
+        return fig_treemap
     
-    st.plotly_chart(fig_treemap, use_container_width=True)
+    st.plotly_chart(load_figura('treemap', versao_loa, (), montar_treemap), use_container_width=True)
     
     # Tabela detalhada
     st.subheader("📋 Detalhamento por Categoria")
@@ -277,7 +381,7 @@ elif opcao == "Análise por Categoria":
     categoria_detalhes = []
     for codigo, valor in nivel1_agrupado.items():
         nome = codigo_nomes.get(codigo, f"Código {codigo}")
-        participacao = (valor / total_orcamento) * 100
+        participacao = (valor / metricas['total_orcamento']) * 100
         categoria_detalhes.append({
             'Código': codigo,
             'Categoria': nome,
@@ -295,44 +399,47 @@ elif opcao == "Receitas Tributárias":
     st.header("🏛️ Análise das Receitas Tributárias")
     
     # Filtrar apenas receitas tributárias
-    tributarias = receitas_orcadas[
-        receitas_orcadas['CODRE'].str.startswith(('1112', '1113', '1114', '1121', '1122'))
-    ].copy()
+    tributarias = receitas_orcadas.iloc[posicoes_prefixo(metricas['indice_receitas'], TRIBUTARIAS)]
     
     if not tributarias.empty:
         col1, col2 = st.columns(2)
         
         with col1:
             # Análise por tipo de tributo
-            tributos_tipo = {
-                'IPTU': tributarias[tributarias['CODRE'].str.startswith('1112.5')]['TOTOR'].sum(),
-                'ITBI': tributarias[tributarias['CODRE'].str.startswith('1112.53')]['TOTOR'].sum(),
-                'IRRF': tributarias[tributarias['CODRE'].str.startswith('1113')]['TOTOR'].sum(),
-                'ISSQN': tributarias[tributarias['CODRE'].str.startswith('1114')]['TOTOR'].sum(),
-                'Taxas': tributarias[tributarias['CODRE'].str.startswith(('1121', '1122'))]['TOTOR'].sum()
-            }
-            
-            fig_tributos = px.bar(
-                x=list(tributos_tipo.keys()),
-                y=list(tributos_tipo.values()),
-                title="Receitas por Tipo de Tributo",
-                labels={'x': 'Tipo de Tributo', 'y': 'Valor (R$)'}
-            )
+            def montar_tributos():
+                tributos_tipo = {
+                    'IPTU': somar_prefixo(metricas['indice_receitas'], '1112.5', 'TOTOR'),
+                    'ITBI': somar_prefixo(metricas['indice_receitas'], '1112.53', 'TOTOR'),
+                    'IRRF': somar_prefixo(metricas['indice_receitas'], '1113', 'TOTOR'),
+                    'ISSQN': somar_prefixo(metricas['indice_receitas'], '1114', 'TOTOR'),
+                    'Taxas': somar_prefixo(metricas['indice_receitas'], ('1121', '1122'), 'TOTOR')
+                }
+                
+                fig_tributos = px.bar(
+                    x=list(tributos_tipo.keys()),
+                    y=[em_reais(valor) for valor in tributos_tipo.values()],
+                    title="Receitas por Tipo de Tributo",
+                    labels={'x': 'Tipo de Tributo', 'y': 'Valor (R$)'}
+                )
+                return fig_tributos
             
-            st.plotly_chart(fig_tributos, use_container_width=True)
+            st.plotly_chart(load_figura('tributos', versao_loa, (), montar_tributos), use_container_width=True)
         
         with col2:
             # Distribuição IPTU
-            iptu_detalhes = tributarias[tributarias['CODRE'].str.startswith('1112.5')]
+            iptu_detalhes = receitas_orcadas.iloc[posicoes_prefixo(metricas['indice_receitas'], '1112.5')]
             
             if not iptu_detalhes.empty:
-                fig_iptu = px.pie(
-                    iptu_detalhes,
-                    values='TOTOR',
-                    names='NOME',
-                    title="Detalhamento do IPTU"
-                )
-                st.plotly_chart(fig_iptu, use_container_width=True)
+                def montar_iptu():
+                    fig_iptu = px.pie(
+                        colunas_em_reais(iptu_detalhes, 'TOTOR'),
+                        values='TOTOR',
+                        names='NOME',
+                        title="Detalhamento do IPTU"
+                    )
+                    return fig_iptu
+                
+                st.plotly_chart(load_figura('iptu', versao_loa, (), montar_iptu), use_container_width=True)
         
         # Tabela de tributárias
         st.subheader("📋 Detalhamento das Receitas Tributárias")
@@ -351,15 +458,13 @@ elif opcao == "Transferências":
     st.header("🔄 Análise das Transferências")
     
     # Filtrar transferências
-    transf = receitas_orcadas[
-        receitas_orcadas['CODRE'].str.startswith(('1711', '1712', '1713', '1714', '1716', '1721', '1722', '1723', '1724', '1751'))
-    ].copy()
+    transf = receitas_orcadas.iloc[posicoes_prefixo(metricas['indice_receitas'], TRANSFERENCIAS)]
     
     if not transf.empty:
         # Separar por origem
-        transf_uniao = transf[transf['CODRE'].str.startswith(('1711', '1712', '1713', '1714', '1716', '1719'))]['TOTOR'].sum()
-        transf_estado = transf[transf['CODRE'].str.startswith(('1721', '1722', '1723', '1724', '1729'))]['TOTOR'].sum()
-        fundeb = transf[transf['CODRE'].str.startswith('1751')]['TOTOR'].sum()
+        transf_uniao = somar_prefixo(metricas['indice_receitas'], TRANSFERENCIAS_UNIAO, 'TOTOR')
+        transf_estado = somar_prefixo(metricas['indice_receitas'], TRANSFERENCIAS_ESTADO, 'TOTOR')
+        fundeb = somar_prefixo(metricas['indice_receitas'], FUNDEB, 'TOTOR')
         
         col1, col2, col3 = st.columns(3)
         
@@ -371,14 +476,17 @@ elif opcao == "Transferências":
             st.metric("FUNDEB", format_currency(fundeb))
         
         # Gráfico de transferências por origem
-        fig_origem = go.Figure(data=[go.Pie(
-            labels=['União', 'Estado', 'FUNDEB'],
-            values=[transf_uniao, transf_estado, fundeb],
-            hole=0.3
-        )])
+        def montar_origem():
+            fig_origem = go.Figure(data=[go.Pie(
+                labels=['União', 'Estado', 'FUNDEB'],
+                values=[em_reais(transf_uniao), em_reais(transf_estado), em_reais(fundeb)],
+                hole=0.3
+            )])
+            
+            fig_origem.update_layout(title="Transferências por Origem")
+            return fig_origem
         
-        fig_origem.update_layout(title="Transferências por Origem")
-        st.plotly_chart(fig_origem, use_container_width=True)
+        st.plotly_chart(load_figura('transferencias_origem', versao_loa, (), montar_origem), use_container_width=True)
         
         # Principais transferências
         st.subheader("🔝 Principais Transferências")
@@ -396,148 +504,174 @@ elif opcao == "Transferências":
 elif opcao == "Detalhamento":
     st.header("🔍 Detalhamento Completo")
     
-    # Filtros
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        valor_min = st.number_input("Valor mínimo (R$)", min_value=0, value=0)
-    
-    with col2:
-        busca = st.text_input("Buscar por descrição")
-    
-    # Aplicar filtros
-    dados_filtrados = receitas_orcadas.copy()
-    
-    if valor_min > 0:
-        dados_filtrados = dados_filtrados[dados_filtrados['TOTOR'] >= valor_min]
-    
-    if busca:
-        dados_filtrados = dados_filtrados[
-            dados_filtrados['NOME'].str.contains(busca, case=False, na=False)
-        ]
-    
-    # Mostrar resultados
-    st.subheader(f"📊 Resultados ({len(dados_filtrados)} registros)")
-    
-    if not dados_filtrados.empty:
-        # Preparar dados para exibição
-        display_data = dados_filtrados[['CODRE', 'NOME', 'TOTOR']].copy()
-        display_data['TOTOR'] = display_data['TOTOR'].apply(format_currency)
-        display_data.columns = ['Código', 'Descrição', 'Valor Previsto']
-        
-        st.dataframe(display_data, use_container_width=True)
-        
-        # Estatísticas dos dados filtrados
-        col1, col2, col3 = st.columns(3)
+    # Filtros e resultados num fragmento: mudar um filtro roda de novo só esta seção
+    @st.fragment
+    def detalhar_loa():
+        """Busca e filtros das receitas da LOA, com os totais do que foi filtrado"""
+        # Filtros
+        col1, col2 = st.columns(2)
         
         with col1:
-            st.metric("Total Filtrado", format_currency(dados_filtrados['TOTOR'].sum()))
+            valor_min = st.number_input("Valor mínimo (R$)", min_value=0, value=0)
+        
         with col2:
-            st.metric("Maior Valor", format_currency(dados_filtrados['TOTOR'].max()))
-        with col3:
-            st.metric("Menor Valor", format_currency(dados_filtrados['TOTOR'].min()))
-    else:
-        st.warning("Nenhum registro encontrado com os filtros aplicados.")
+            busca = st.text_input("Buscar por descrição")
+        
+        # Aplicar filtros como máscaras (a busca pelo índice invertido), sem copiar as linhas
+        totor = receitas_orcadas['TOTOR'].to_numpy()
+        mascaras = []
+        
+        if busca:
+            mascaras.append(mascara_posicoes(len(receitas_orcadas), buscar(metricas['busca_receitas'], busca)))
+        
+        if valor_min > 0:
+            mascaras.append(totor >= reais_para_centavos(valor_min))
+        
+        selecao = combinar_mascaras(mascaras, len(receitas_orcadas))
+        total_filtrado = int(selecao.sum())
+        
+        # Mostrar resultados
+        st.subheader(f"📊 Resultados ({total_filtrado} registros)")
+        
+        if total_filtrado:
+            # Uma página por vez, ordenada no servidor: só as linhas dela são formatadas
+            ordens = load_ordens(versao_receitas)
+            paginas = numero_de_paginas(total_filtrado)
+            
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                ordenar_por = st.selectbox("Ordenar por", list(ordens), key="loa_ordenar")
+            with col2:
+                decrescente = st.checkbox("Ordem decrescente", value=True, key="loa_decrescente")
+            with col3:
+                pagina = min(st.number_input(f"Página (de {paginas})", min_value=1, value=1, key="loa_pagina"), paginas)
+            
+            posicoes = posicoes_da_pagina(selecionar_ordem(ordens[ordenar_por], selecao), pagina, decrescente=decrescente)
+            display_data = receitas_orcadas.iloc[posicoes][['CODRE', 'NOME', 'TOTOR']].copy()
+            display_data['TOTOR'] = display_data['TOTOR'].apply(format_currency)
+            display_data.columns = ['Código', 'Descrição', 'Valor Previsto']
+            
+            st.dataframe(display_data, use_container_width=True, hide_index=True)
+            st.caption(f"Página {pagina} de {paginas} - {TAMANHO_PAGINA} registros por página")
+            
+            # Estatísticas dos dados filtrados
+            valores_filtrados = totor[selecao]
+            col1, col2, col3 = st.columns(3)
+            
+            with col1:
+                st.metric("Total Filtrado", format_currency(valores_filtrados.sum()))
+            with col2:
+                st.metric("Maior Valor", format_currency(valores_filtrados.max()))
+            with col3:
+                st.metric("Menor Valor", format_currency(valores_filtrados.min()))
+        else:
+            st.warning("Nenhum registro encontrado com os filtros aplicados.")
+    
+    detalhar_loa()
 
-# Adicionar seção de insights gerais
-st.divider()
-st.header("💡 Insights e Análises")
+# Insights gerais só na Visão Geral: as outras páginas não calculam o índice nem as categorias
+if opcao == "Visão Geral":
+    st.divider()
+    st.header("💡 Insights e Análises")
 
-col1, col2 = st.columns(2)
+    col1, col2 = st.columns(2)
 
-with col1:
-    st.subheader("🎯 Principais Indicadores")
-    
-    # Dependência de transferências
-    dependencia_transf = (transferencias / total_orcamento) * 100
-    if dependencia_transf > 70:
-        cor_dep = "🔴"
-        status_dep = "Alta dependência"
-    elif dependencia_transf > 50:
-        cor_dep = "🟡"
-        status_dep = "Dependência moderada"
-    else:
-        cor_dep = "🟢"
-        status_dep = "Baixa dependência"
-    
-    st.write(f"{cor_dep} **Dependência de Transferências**: {dependencia_transf:.1f}% - {status_dep}")
-    
-    # Autonomia fiscal
-    autonomia_fiscal = (receitas_tributarias / total_orcamento) * 100
-    if autonomia_fiscal > 30:
-        cor_aut = "🟢"
-        status_aut = "Boa autonomia"
-    elif autonomia_fiscal > 15:
-        cor_aut = "🟡"
-        status_aut = "Autonomia moderada"
-    else:
-        cor_aut = "🔴"
-        status_aut = "Baixa autonomia"
-    
-    st.write(f"{cor_aut} **Autonomia Fiscal**: {autonomia_fiscal:.1f}% - {status_aut}")
-    
-    # Receita per capita estimada (assumindo população de ~5.000 hab)
-    pop_estimada = 5000
-    receita_per_capita = total_orcamento / pop_estimada
-    st.write(f"💰 **Receita per capita estimada**: {format_currency(receita_per_capita)}")
+    with col1:
+        st.subheader("🎯 Principais Indicadores")
+        
+        # Dependência de transferências
+        dependencia_transf = (metricas['transferencias'] / metricas['total_orcamento']) * 100
+        if dependencia_transf > 70:
+            cor_dep = "🔴"
+            status_dep = "Alta dependência"
+        elif dependencia_transf > 50:
+            cor_dep = "🟡"
+            status_dep = "Dependência moderada"
+        else:
+            cor_dep = "🟢"
+            status_dep = "Baixa dependência"
+        
+        st.write(f"{cor_dep} **Dependência de Transferências**: {dependencia_transf:.1f}% - {status_dep}")
+        
+        # Autonomia fiscal
+        autonomia_fiscal = (metricas['receitas_tributarias'] / metricas['total_orcamento']) * 100
+        if autonomia_fiscal > 30:
+            cor_aut = "🟢"
+            status_aut = "Boa autonomia"
+        elif autonomia_fiscal > 15:
+            cor_aut = "🟡"
+            status_aut = "Autonomia moderada"
+        else:
+            cor_aut = "🔴"
+            status_aut = "Baixa autonomia"
+        
+        st.write(f"{cor_aut} **Autonomia Fiscal**: {autonomia_fiscal:.1f}% - {status_aut}")
+        
+        # Receita per capita estimada (assumindo população de ~5.000 hab)
+        pop_estimada = 5000
+        receita_per_capita = metricas['total_orcamento'] / pop_estimada
+        st.write(f"💰 **Receita per capita estimada**: {format_currency(receita_per_capita)}")
 
-with col2:
-    st.subheader("📈 Composição Ideal vs Real")
-    
-    # Dados ideais baseados em boas práticas municipais
-    ideal_tributaria = 25  # %
-    ideal_transferencias = 60  # %
-    ideal_outras = 15  # %
-    
-    real_tributaria = (receitas_tributarias/total_orcamento*100)
-    real_transferencias = (transferencias/total_orcamento*100)
-    real_outras = (outras_receitas/total_orcamento*100)
-    
-    comparacao_data = {
-        'Categoria': ['Tributárias', 'Transferências', 'Outras'],
-        'Ideal (%)': [ideal_tributaria, ideal_transferencias, ideal_outras],
-        'Real (%)': [real_tributaria, real_transferencias, real_outras]
-    }
-    
-    df_comparacao = pd.DataFrame(comparacao_data)
-    
-    fig_comparacao = px.bar(
-        df_comparacao,
-        x='Categoria',
-        y=['Ideal (%)', 'Real (%)'],
-        title="Composição Ideal vs Real do Orçamento",
-        barmode='group',
-        color_discrete_map={'Ideal (%)': '#2E8B57', 'Real (%)': '#FF6347'}
-    )
-    
-    fig_comparacao.update_layout(height=300)
-    st.plotly_chart(fig_comparacao, use_container_width=True)
+    with col2:
+        st.subheader("📈 Composição Ideal vs Real")
+        
+        # Dados ideais baseados em boas práticas municipais
+        ideal_tributaria = 25  # %
+        ideal_transferencias = 60  # %
+        ideal_outras = 15  # %
+        
+        real_tributaria = (metricas['receitas_tributarias']/metricas['total_orcamento']*100)
+        real_transferencias = (metricas['transferencias']/metricas['total_orcamento']*100)
+        real_outras = (metricas['outras_receitas']/metricas['total_orcamento']*100)
+        
+        def montar_comparacao():
+            comparacao_data = {
+                'Categoria': ['Tributárias', 'Transferências', 'Outras'],
+                'Ideal (%)': [ideal_tributaria, ideal_transferencias, ideal_outras],
+                'Real (%)': [real_tributaria, real_transferencias, real_outras]
+            }
+            
+            df_comparacao = pd.DataFrame(comparacao_data)
+            
+            fig_comparacao = px.bar(
+                df_comparacao,
+                x='Categoria',
+                y=['Ideal (%)', 'Real (%)'],
+                title="Composição Ideal vs Real do Orçamento",
+                barmode='group',
+                color_discrete_map={'Ideal (%)': '#2E8B57', 'Real (%)': '#FF6347'}
+            )
+            
+            fig_comparacao.update_layout(height=300)
+            return fig_comparacao
+        
+        st.plotly_chart(load_figura('composicao_ideal', versao_loa, (), montar_comparacao), use_container_width=True)
 
-# Análises adicionais
-st.subheader("📊 Análises Complementares")
+    # Análises adicionais
+    st.subheader("📊 Análises Complementares")
 
-col1, col2, col3 = st.columns(3)
+    col1, col2, col3 = st.columns(3)
 
-with col1:
-    st.metric(
-        "🏥 Recursos SUS",
-        format_currency(receitas_orcadas[receitas_orcadas['CODRE'].str.startswith('1713')]['TOTOR'].sum()),
-        help="Transferências do SUS para saúde"
-    )
+    with col1:
+        st.metric(
+            "🏥 Recursos SUS",
+            format_currency(somar_prefixo(metricas['indice_receitas'], '1713', 'TOTOR')),
+            help="Transferências do SUS para saúde"
+        )
 
-with col2:
-    st.metric(
-        "🎓 Recursos Educação",
-        format_currency(receitas_orcadas[receitas_orcadas['CODRE'].str.startswith(('1714', '1751'))]['TOTOR'].sum()),
-        help="FNDE + FUNDEB para educação"
-    )
+    with col2:
+        st.metric(
+            "🎓 Recursos Educação",
+            format_currency(somar_prefixo(metricas['indice_receitas'], ('1714', '1751'), 'TOTOR')),
+            help="FNDE + FUNDEB para educação"
+        )
 
-with col3:
-    st.metric(
-        "🤝 Assistência Social",
-        format_currency(receitas_orcadas[receitas_orcadas['CODRE'].str.startswith('1716')]['TOTOR'].sum()),
-        help="Transferências FNAS para assistência"
-    )
+    with col3:
+        st.metric(
+            "🤝 Assistência Social",
+            format_currency(somar_prefixo(metricas['indice_receitas'], '1716', 'TOTOR')),
+            help="Transferências FNAS para assistência"
+        )
 
 # Rodapé
 st.divider()
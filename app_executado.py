@@ -4,8 +4,26 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import numpy as np
+import threading
 from datetime import datetime
 from scipy.stats import entropy
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from orcamento.arquivos import versao_dados
+from orcamento.artefatos import Artefatos, versao_codigo
+from orcamento.busca import buscar, indexar_textos
+from orcamento.cache_colunar import carregar_tabela
+from orcamento.classificacao import TRANSFERENCIAS, TRIBUTARIAS, indexar_tabela, somar_prefixo
+from orcamento.conversao import CENTAVOS_POR_REAL, colunas_em_reais, em_reais, reais_para_centavos
+from orcamento.esquemas import DESPESAS_EXECUTADAS, DOTACOES, ESQUEMAS, ESTRUTURA_LOA, RECEITAS_EXECUTADAS, RECEITAS_LOA
+from orcamento.filtros import combinar_mascaras, indexar_intervalo, mascara_igual, mascara_minimo, mascara_posicoes, ordem_em_arrays
+from orcamento.hierarquia import conferir_sinteticas, montar_cubo, ramos_do_cubo, separar_folhas
+from orcamento.incremental import atualizar_despesas
+from orcamento.ingestao import consultar_cubo
+from orcamento.leitura import divergencias_rodape, separar_dimensao
+from orcamento.metricas import Metricas
+from orcamento.paginacao import TAMANHO_PAGINA, numero_de_paginas, ordenar_coluna, posicoes_da_pagina, selecionar_ordem
+from orcamento.paralelo import executar_em_paralelo
 
 # Configuração da página
 st.set_page_config(
@@ -14,152 +32,424 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Função para carregar e processar dados
-@st.cache_data
-def load_data():
-    """Carrega e processa os dados de execução orçamentária e LOA"""
-    
-    # Carregar dados de receitas executadas
-    try:
-        receitas_executadas = pd.read_csv("Portal Transparencia Receitas Acumuladas - Exercício 2025 (1).csv", 
-                                        sep=';', encoding='utf-8')
-    except:
-        receitas_executadas = pd.read_csv("Portal Transparencia Receitas Acumuladas - Exercício 2025 (1).csv", 
-                                        sep=';', encoding='latin-1')
-    
-    # Carregar dados de despesas executadas
-    try:
-        despesas_executadas = pd.read_csv("Portal Transparencia Despesas Gerais - Exercício 2025.csv", 
-                                        sep=';', encoding='utf-8')
-    except:
-        despesas_executadas = pd.read_csv("Portal Transparencia Despesas Gerais - Exercício 2025.csv", 
-                                        sep=';', encoding='latin-1')
-    
-    # Carregar dados da LOA (receitas orçadas)
-    try:
-        receitas_orcadas = pd.read_csv("download-123842.557.csv", sep=';', encoding='utf-8')
-    except:
-        receitas_orcadas = pd.read_csv("download-123842.557.csv", sep=';', encoding='latin-1')
-    
-    # Carregar estrutura de receitas da LOA
-    try:
-        estrutura_receitas = pd.read_csv("download-123701.452.csv", sep=';', encoding='utf-8')
-    except:
-        estrutura_receitas = pd.read_csv("download-123701.452.csv", sep=';', encoding='latin-1')
-    
-    return receitas_executadas, despesas_executadas, receitas_orcadas, estrutura_receitas
+# Funções para carregar e processar dados
+# Cada cache é chaveado pela versão (conteúdo) do arquivo que lê: arquivos sem
+# mudança nunca são recarregados e um arquivo alterado invalida só o que depende dele.
+# cache_resource compartilha o mesmo objeto entre todas as sessões, sem cópia: as
+# colunas derivadas já vêm da carga e as páginas nunca alteram os dados carregados
+@st.cache_resource(show_spinner=False)
+def load_tabela(nome, versao):
+    """Carrega uma tabela do registro de esquemas na versão informada do arquivo"""
+    
+    # Cada CSV é lido só com as colunas declaradas no esquema, em tipos compactos, e
+    # convertido uma única vez para Parquet; as cargas seguintes leem o arquivo
+    # colunar enquanto o CSV de origem não mudar. Valores monetários chegam em
+    # centavos (int64) e a linha de totais do Portal já vem separada
+    return carregar_tabela(ESQUEMAS[nome])
 
-def format_currency(value):
-    """Formata valores em moeda brasileira"""
-    if pd.isna(value) or value == 0:
-        return "R$ 0,00"
-    return f"R$ {value:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+# Índices, cubo, ordens e figuras também ficam no armazém em disco, chaveados pela versão
+# dos dados e do código: depois de um reinício, são lidos de lá em vez de montados de novo
+artefatos = Artefatos(versao_codigo(__file__))
 
-def parse_currency(value_str):
-    """Converte string de moeda brasileira para float"""
-    if pd.isna(value_str) or value_str == '' or value_str == 0:
-        return 0.0
-    
-    # Se já for um número, retorna como está
-    if isinstance(value_str, (int, float)):
-        return float(value_str)
-    
-    # Remove pontos de milhares e substitui vírgula por ponto decimal
-    try:
-        cleaned = str(value_str).replace('.', '').replace(',', '.')
-        return float(cleaned)
-    except:
-        return 0.0
+@st.cache_resource(show_spinner=False)
+def load_receitas(versao):
+    """Receitas executadas: só os lançamentos (folhas), com índices de prefixos e de busca e conferência da hierarquia
+    
+    O arquivo do Portal repete, em linhas sem código de aplicação, o total de cada
+    conta sintética (RECEITAS CORRENTES, IMPOSTOS, ...); somar todas as linhas
+    contaria o mesmo valor várias vezes. Todos os agregados usam só as folhas.
+    """
+    def montar():
+        folhas, sinteticas = separar_folhas(load_tabela(RECEITAS_EXECUTADAS.nome, versao), RECEITAS_EXECUTADAS)
+        valores = ['Prev. Atualizada', 'Arrec. Total']
+        indice = indexar_tabela(folhas, 'Código', valores)
+        return {
+            'folhas': folhas,
+            'indice': indice,
+            'busca': indexar_textos(folhas['Especificação'].tolist()),
+            'divergencias': conferir_sinteticas(sinteticas, 'Código', indice, valores),
+        }
+    
+    return artefatos.carregar('receitas', (versao,), montar)
 
-def process_receitas_data(df):
-    """Processa dados de receitas"""
-    df = df.copy()
-    
-    # Converter valores monetários
-    for col in ['Prev. Inicial', 'Prev. Atualizada', 'Arrec. Período', 'Arrec. Total']:
-        if col in df.columns:
-            df[col] = df[col].apply(parse_currency)
+@st.cache_resource(show_spinner=False)
+def load_receitas_por_categoria(versao):
+    """Previsão, arrecadação e execução por categoria das receitas arrecadadas, uma vez por versão do arquivo"""
+    def montar():
+        receitas = load_receitas(versao)['folhas']
+        
+        # Principais categorias de receitas
+        receitas_por_categoria = receitas[receitas['Arrec. Total'] > 0].groupby('nivel_1').agg({
+            'Prev. Atualizada': 'sum',
+            'Arrec. Total': 'sum'
+        }).rename_axis('categoria').reset_index()
+        
+        receitas_por_categoria['execucao_pct'] = (receitas_por_categoria['Arrec. Total'] / 
+                                                receitas_por_categoria['Prev. Atualizada'] * 100)
+        
+        # Mapear códigos para nomes
+        categoria_nomes = {
+            '1112': 'Impostos s/ Patrimônio',
+            '1113': 'Impostos s/ Renda',
+            '1114': 'Impostos s/ Serviços',
+            '1121': 'Taxas Poder Polícia',
+            '1122': 'Taxas por Serviços',
+            '1321': 'Rendimentos Financeiros',
+            '1335': 'Concessões',
+            '1399': 'Outras Patrimoniais',
+            '1699': 'Outros Serviços',
+            '1711': 'Transferências União',
+            '1712': 'Compensações Financeiras',
+            '1713': 'SUS - União',
+            '1714': 'FNDE',
+            '1715': 'FUNDEB - União',
+            '1716': 'FNAS',
+            '1719': 'Outras - União',
+            '1721': 'Transferências Estado',
+            '1722': 'Royalties Estado',
+            '1723': 'SUS - Estado',
+            '1724': 'Convênios Estado',
+            '1729': 'Outras - Estado',
+            '1751': 'FUNDEB',
+            '1911': 'Multas',
+            '1922': 'Restituições',
+            '1999': 'Outras Correntes',
+            '2422': 'Transferências Capital'
+        }
+        
+        receitas_por_categoria['nome_categoria'] = receitas_por_categoria['categoria'].map(categoria_nomes)
+        receitas_por_categoria['nome_categoria'] = receitas_por_categoria['nome_categoria'].fillna(
+            'Outras - ' + receitas_por_categoria['categoria'])
+        return receitas_por_categoria
     
-    return df
+    return artefatos.carregar('receitas_por_categoria', (versao,), montar)
+
+@st.cache_resource(show_spinner=False)
+def load_cubo(versao_loa, versao_receitas, versao_estrutura):
+    """Cubo da LOA e das receitas executadas acumuladas pela árvore da estrutura"""
+    return artefatos.carregar('cubo', (versao_loa, versao_receitas, versao_estrutura), lambda: montar_cubo(
+        load_tabela(ESTRUTURA_LOA.nome, versao_estrutura),
+        [
+            (load_tabela(RECEITAS_LOA.nome, versao_loa), 'CODRE', ['TOTOR']),
+            (load_receitas(versao_receitas)['folhas'], 'Código', ['Prev. Atualizada', 'Arrec. Total']),
+        ],
+    ))
+
+# Figuras montadas uma vez e compartilhadas entre sessões, chaveadas pela visão, pela
+# versão dos dados e pelos parâmetros; passando de FIGURAS_EM_CACHE, saem as usadas
+# há mais tempo. Fica em cache só a especificação (fig.to_dict()), e cada chamada monta
+# uma figura nova, que a sessão pode alterar sem afetar as outras (cada especificação
+# também fica no armazém de artefatos em disco)
+FIGURAS_EM_CACHE = 64
+
+@st.cache_resource(show_spinner=False, max_entries=FIGURAS_EM_CACHE)
+def load_especificacao(visao, versao, parametros, _montar):
+    """Especificação da figura de uma visão, montada por _montar() só se não estiver em cache
+    
+    _montar fica fora da chave: tudo o que ele lê precisa depender só da versão
+    dos dados e dos parâmetros.
+    """
+    return artefatos.carregar('figura', (visao, versao, parametros), lambda: _montar().to_dict())
 
-def process_despesas_data(df):
-    """Processa dados de despesas"""
-    df = df.copy()
+def load_figura(visao, versao, parametros, _montar):
+    """Figura nova da visão, montada a partir da especificação em cache"""
+    return go.Figure(load_especificacao(visao, versao, parametros, _montar))
+
+def load_data(tarefas):
+    """Preenche os caches dos conjuntos de dados em paralelo, um arquivo por thread
+    
+    tarefas: {arquivo: função que carrega o conjunto pelo seu loader em cache}.
+    Retorna o tempo de carga de cada arquivo em segundos; os dados são lidos
+    depois pelos nós do registro de métricas, já sem custo.
+    """
+    # As threads precisam do contexto da execução atual para usar os caches do Streamlit
+    ctx = get_script_run_ctx()
+    _, tempos = executar_em_paralelo(
+        tarefas,
+        inicializador=lambda: add_script_run_ctx(threading.current_thread(), ctx)
+    )
+    return tempos
+
+@st.cache_resource(show_spinner=False)
+def load_despesas_agregadas(versao):
+    """Atualiza os agregados das despesas só com os empenhos novos ou alterados do arquivo
+    
+    As páginas consultam o cubo e as visões dele montadas aqui, uma vez por
+    versão do arquivo; a visão por função já vem com a dotação das fichas.
+    """
+    agregados = atualizar_despesas(DESPESAS_EXECUTADAS)
+    dotacao_por_funcao = agregados['fichas'].groupby(['Função', 'Nome da Função'], observed=True)['Dotação Atual'].sum()
+    return {**agregados, 'funcao': agregados['funcao'].join(dotacao_por_funcao)}
+
+@st.cache_resource(show_spinner=False)
+def load_despesas_detalhadas(versao):
+    """Carrega as despesas linha a linha (apenas para o Detalhamento), sem as colunas de dotação da ficha"""
+    return separar_dimensao(carregar_tabela(DESPESAS_EXECUTADAS), DESPESAS_EXECUTADAS)[0]
+
+@st.cache_resource(show_spinner=False)
+def load_busca_fornecedores(versao):
+    """Índice invertido dos fornecedores das despesas linha a linha (cada nome indexado uma vez)"""
+    return artefatos.carregar(
+        'busca_fornecedores', (versao,),
+        lambda: indexar_textos(load_despesas_detalhadas(versao)['Nome Fornecedor'].tolist()),
+    )
+
+@st.cache_resource(show_spinner=False)
+def load_intervalos_despesas(versao):
+    """Colunas de intervalo do Detalhamento (valor e data) ordenadas uma vez por versão do arquivo"""
+    def montar():
+        despesas = load_despesas_detalhadas(versao)
+        return {coluna: indexar_intervalo(despesas[coluna]) for coluna in ('Empenhado até Hoje', 'Data')}
+    
+    return artefatos.carregar('intervalos_despesas', (versao,), montar)
+
+@st.cache_resource(show_spinner=False, max_entries=256)
+def mascara_despesas(versao, filtro, valor):
+    """Máscara das linhas das despesas que passam em um filtro, em cache por valor do parâmetro
+    
+    Mudar um filtro recalcula só a máscara dele; as demais vêm do cache.
+    """
+    if filtro == 'valor_minimo':
+        return mascara_minimo(load_intervalos_despesas(versao)['Empenhado até Hoje'], valor)
+    if filtro == 'data_inicio':
+        return mascara_minimo(load_intervalos_despesas(versao)['Data'], np.datetime64(valor))
+    despesas = load_despesas_detalhadas(versao)
+    if filtro == 'funcao':
+        return mascara_igual(despesas['Nome da Função'], valor)
+    if filtro == 'fornecedor':
+        return mascara_posicoes(len(despesas), buscar(load_busca_fornecedores(versao), valor))
+    raise ValueError(f"Filtro desconhecido: {filtro}")
+
+def ordenar_colunas(df, colunas):
+    """Ordem de cada coluna ordenável da tabela: {rótulo: OrdemColuna}"""
+    return {rotulo: ordem_em_arrays(ordenar_coluna(df[coluna].tolist())) for rotulo, coluna in colunas.items()}
+
+@st.cache_resource(show_spinner=False)
+def load_ordens_receitas(versao):
+    """Colunas ordenáveis do Detalhamento das receitas, ordenadas uma vez por versão do arquivo"""
+    return artefatos.carregar('ordens_receitas', (versao,), lambda: ordenar_colunas(load_receitas(versao)['folhas'], {
+        'Arrecadado': 'Arrec. Total', 'Previsto': 'Prev. Atualizada', 'Código': 'Código', 'Descrição': 'Especificação',
+    }))
+
+@st.cache_resource(show_spinner=False)
+def load_ordens_despesas(versao):
+    """Colunas ordenáveis do Detalhamento das despesas, ordenadas uma vez por versão do arquivo"""
+    return artefatos.carregar('ordens_despesas', (versao,), lambda: ordenar_colunas(load_despesas_detalhadas(versao), {
+        'Empenhado': 'Empenhado até Hoje', 'Pago': 'Pago até Hoje', 'Data': 'Data',
+        'Empenho': 'Empenho', 'Fornecedor': 'Nome Fornecedor',
+    }))
+
+def mostrar_tabela_paginada(df, selecao, ordens, preparar, chave):
+    """Mostra uma página das linhas selecionadas, ordenada no servidor
     
-    # Converter valores monetários
-    for col in ['Dotação', 'Alteração Dotação', 'Dotação Atual', 'Valor Anulado', 
-                'Reforço', 'Valor Empenhado', 'Valor Liquidado', 'Valor Pago',
-                'Empenhado até Hoje', 'Liquidado até Hoje', 'Pago até Hoje']:
-        if col in df.columns:
-            df[col] = df[col].apply(parse_currency)
+    selecao: máscara das linhas de df que passaram nos filtros; ordens: como em
+    ordenar_colunas; preparar: recebe só as linhas da página e devolve a tabela
+    formatada para exibição.
+    """
+    total = int(selecao.sum())
+    paginas = numero_de_paginas(total)
     
-    # Converter data
-    if 'Data' in df.columns:
-        df['Data'] = pd.to_datetime(df['Data'], format='%d/%m/%Y', errors='coerce')
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        ordenar_por = st.selectbox("Ordenar por", list(ordens), key=f"{chave}_ordenar")
+    with col2:
+        decrescente = st.checkbox("Ordem decrescente", value=True, key=f"{chave}_decrescente")
+    with col3:
+        pagina = min(st.number_input(f"Página (de {paginas})", min_value=1, value=1, key=f"{chave}_pagina"), paginas)
     
-    return df
+    posicoes = posicoes_da_pagina(selecionar_ordem(ordens[ordenar_por], selecao), pagina, decrescente=decrescente)
+    st.dataframe(preparar(df.iloc[posicoes]), use_container_width=True, hide_index=True)
+    st.caption(f"Página {pagina} de {paginas} - {TAMANHO_PAGINA} registros por página")
 
-def process_loa_data(df):
-    """Processa dados da LOA"""
-    df = df.copy()
-    
-    # Converter valores monetários da LOA
-    if 'TOTOR' in df.columns:
-        df['TOTOR'] = pd.to_numeric(df['TOTOR'], errors='coerce').fillna(0)
-    
-    return df
+def format_currency(value):
+    """Formata valores em centavos como moeda brasileira"""
+    if pd.isna(value) or value == 0:
+        return "R$ 0,00"
+    centavos = int(round(value))
+    reais, resto = divmod(abs(centavos), CENTAVOS_POR_REAL)
+    sinal = '-' if centavos < 0 else ''
+    return f"R$ {sinal}{reais:,}".replace(',', '.') + f",{resto:02d}"
 
 # Carregar dados
 st.title("🏛️ Portal Transparência - Município de Rifaina")
 st.markdown("**Análise Completa: LOA vs Execução Orçamentária 2025**")
 
-with st.spinner("Carregando dados de execução orçamentária e LOA..."):
-    receitas_raw, despesas_raw, receitas_loa_raw, estrutura_loa_raw = load_data()
+versao_receitas = versao_dados(RECEITAS_EXECUTADAS.arquivo)
+versao_loa = versao_dados(RECEITAS_LOA.arquivo)
+versao_despesas = versao_dados(DESPESAS_EXECUTADAS.arquivo)
+# Chave das figuras que cruzam mais de um arquivo (receitas, LOA e despesas)
+versao_arquivos = versao_dados(
+    RECEITAS_LOA.arquivo, RECEITAS_EXECUTADAS.arquivo, ESTRUTURA_LOA.arquivo, DESPESAS_EXECUTADAS.arquivo,
+)
+
+# Totais e agregados sob demanda: cada nó é calculado na primeira vez que uma página
+# pede por ele, com as dependências declaradas nos parâmetros
+metricas = Metricas()
+
+# Conjuntos de dados: cada nó lê o seu loader em cache (a estrutura da LOA, por
+# exemplo, só é carregada pelo cubo, na página LOA vs Execução)
+@metricas.metrica
+def receitas():
+    """Receitas executadas como em load_receitas: folhas, índices e conferência da hierarquia"""
+    return load_receitas(versao_receitas)
+
+@metricas.metrica
+def receitas_loa():
+    """Receitas da LOA (orçamento original)"""
+    return load_tabela(RECEITAS_LOA.nome, versao_loa)
 
-# Processar dados
-receitas_df = process_receitas_data(receitas_raw)
-despesas_df = process_despesas_data(despesas_raw)
-receitas_loa_df = process_loa_data(receitas_loa_raw)
-estrutura_loa_df = process_loa_data(estrutura_loa_raw)
+@metricas.metrica
+def despesas():
+    """Agregados das despesas como em load_despesas_agregadas"""
+    return load_despesas_agregadas(versao_despesas)
+
+# As conferências e o resumo da barra lateral, mostrados em todas as páginas, usam
+# esses três conjuntos: os caches deles são preenchidos em paralelo antes
+with st.spinner("Carregando dados de execução orçamentária e LOA..."):
+    tempos_carga = load_data({
+        RECEITAS_EXECUTADAS.arquivo: lambda: load_receitas(versao_receitas),
+        DESPESAS_EXECUTADAS.arquivo: lambda: load_despesas_agregadas(versao_despesas),
+        RECEITAS_LOA.arquivo: lambda: load_tabela(RECEITAS_LOA.nome, versao_loa),
+    })
+    receitas_executadas = metricas['receitas']
+    despesas_agregadas = metricas['despesas']
+    receitas_loa_df = metricas['receitas_loa']
+    # Só os lançamentos; os totais das contas sintéticas ficam fora de todas as somas
+    receitas_df = receitas_executadas['folhas']
 
 # Verificar se os dados foram carregados corretamente
-if receitas_df.empty or despesas_df.empty or receitas_loa_df.empty:
+if receitas_df.empty or despesas_agregadas['totais']['empenhos'] == 0 or receitas_loa_df.empty:
     st.error("Erro ao carregar os dados. Verifique os arquivos CSV.")
     st.stop()
 
-# Calcular totais das receitas (execução)
-total_previsto_receitas = receitas_df['Prev. Atualizada'].sum()
-total_arrecadado_receitas = receitas_df['Arrec. Total'].sum()
-percentual_execucao_receitas = (total_arrecadado_receitas / total_previsto_receitas * 100) if total_previsto_receitas > 0 else 0
+# Avisar sobre valores monetários que não puderam ser convertidos
+celulas_invalidas = pd.DataFrame([
+    {'arquivo': nome, **celula}
+    for nome, celulas in [
+        ('Receitas', receitas_df.attrs.get('celulas_invalidas', [])),
+        ('Despesas', despesas_agregadas['celulas_invalidas']),
+        ('LOA', receitas_loa_df.attrs.get('celulas_invalidas', [])),
+    ]
+    for celula in celulas
+])
+if not celulas_invalidas.empty:
+    st.warning(f"⚠️ {len(celulas_invalidas)} valores monetários inválidos foram considerados como zero.")
+    with st.expander("Ver valores inválidos"):
+        st.dataframe(celulas_invalidas, use_container_width=True)
+
+# Conferir as somas (despesas e folhas das receitas) com a linha de totais exportada pelo Portal
+for nome_tabela, totais, rodape in [
+    ('despesas', pd.concat([despesas_agregadas['totais'], despesas_agregadas['fichas'][DOTACOES].sum()]),
+     despesas_agregadas['rodape']),
+    ('receitas', receitas_df[['Prev. Atualizada', 'Arrec. Total']].sum(), receitas_df.attrs.get('rodape', {})),
+]:
+    divergencias = divergencias_rodape(totais, rodape)
+    if divergencias:
+        st.warning(f"⚠️ Totais das {nome_tabela} não conferem com o rodapé do Portal: " + "; ".join(
+            f"{d['coluna']}: {format_currency(d['calculado'])} (Portal: {format_currency(d['portal'])})"
+            for d in divergencias
+        ))
+
+# Contas sintéticas das receitas cujo total não é a soma dos lançamentos abaixo delas
+if receitas_executadas['divergencias']:
+    with st.expander(f"ℹ️ {len(receitas_executadas['divergencias'])} totais de contas sintéticas das receitas não conferem com os lançamentos"):
+        divergencias_hierarquia = pd.DataFrame(receitas_executadas['divergencias'])
+        for coluna in ('informado', 'calculado'):
+            divergencias_hierarquia[coluna] = divergencias_hierarquia[coluna].apply(format_currency)
+        st.dataframe(divergencias_hierarquia, use_container_width=True)
+
+# Totais das receitas (execução)
+@metricas.metrica
+def total_previsto_receitas(receitas):
+    return receitas['folhas']['Prev. Atualizada'].sum()
+
+@metricas.metrica
+def total_arrecadado_receitas(receitas):
+    return receitas['folhas']['Arrec. Total'].sum()
+
+@metricas.metrica
+def percentual_execucao_receitas(total_arrecadado_receitas, total_previsto_receitas):
+    return (total_arrecadado_receitas / total_previsto_receitas * 100) if total_previsto_receitas > 0 else 0
+
+# Totais da LOA (orçamento original)
+@metricas.metrica
+def total_loa_receitas(receitas_loa):
+    return receitas_loa['TOTOR'].sum()
+
+@metricas.metrica
+def execucao_vs_loa(total_arrecadado_receitas, total_loa_receitas):
+    return (total_arrecadado_receitas / total_loa_receitas * 100) if total_loa_receitas > 0 else 0
+
+@metricas.metrica
+def cubo_receitas():
+    """Cubo da LOA e das receitas executadas (só a página LOA vs Execução usa)"""
+    return load_cubo(versao_loa, versao_receitas, versao_dados(ESTRUTURA_LOA.arquivo))
+
+# Receitas arrecadadas por categoria (autonomia fiscal e dependência de transferências)
+@metricas.metrica
+def receitas_tributarias(receitas):
+    return somar_prefixo(receitas['indice'], TRIBUTARIAS, 'Arrec. Total')
+
+@metricas.metrica
+def transferencias(receitas):
+    return somar_prefixo(receitas['indice'], TRANSFERENCIAS, 'Arrec. Total')
+
+# Totais das despesas (a dotação vem das fichas: o Portal a repete em cada empenho)
+@metricas.metrica
+def total_dotacao_despesas(despesas):
+    return despesas['fichas']['Dotação Atual'].sum()
+
+@metricas.metrica
+def total_empenhado_despesas(despesas):
+    return despesas['totais']['Empenhado até Hoje']
+
+@metricas.metrica
+def total_liquidado_despesas(despesas):
+    return despesas['totais']['Liquidado até Hoje']
+
+@metricas.metrica
+def total_pago_despesas(despesas):
+    return despesas['totais']['Pago até Hoje']
 
-# Calcular totais da LOA (orçamento original)
-total_loa_receitas = receitas_loa_df['TOTOR'].sum()
+@metricas.metrica
+def resultado_orcamentario(total_arrecadado_receitas, total_empenhado_despesas):
+    return total_arrecadado_receitas - total_empenhado_despesas
 
-# Calcular totais das despesas
-total_dotacao_despesas = despesas_df['Dotação Atual'].sum()
-total_empenhado_despesas = despesas_df['Empenhado até Hoje'].sum()
-total_liquidado_despesas = despesas_df['Liquidado até Hoje'].sum()
-total_pago_despesas = despesas_df['Pago até Hoje'].sum()
+@metricas.metrica
+def liquidez(total_pago_despesas, total_empenhado_despesas):
+    """Percentual pago do empenhado"""
+    return (total_pago_despesas / total_empenhado_despesas * 100) if total_empenhado_despesas > 0 else 0
+
+# Agregados das despesas usados por várias páginas
+@metricas.metrica
+def despesas_por_funcao(despesas):
+    return despesas['funcao'].reset_index()
+
+@metricas.metrica
+def despesas_por_fornecedor(despesas):
+    return despesas['fornecedor']
+
+@metricas.metrica
+def despesas_por_natureza(despesas):
+    return despesas['natureza'].reset_index()
 
 # Sidebar com informações gerais
 st.sidebar.header("📊 Resumo Executivo")
 
 # Comparação LOA vs Execução
 st.sidebar.subheader("💰 Receitas")
-st.sidebar.metric("🎯 LOA Original", format_currency(total_loa_receitas))
-st.sidebar.metric("📈 Arrecadado", format_currency(total_arrecadado_receitas))
-execucao_vs_loa = (total_arrecadado_receitas / total_loa_receitas * 100) if total_loa_receitas > 0 else 0
-st.sidebar.metric("📊 Execução vs LOA", f"{execucao_vs_loa:.1f}%")
+st.sidebar.metric("🎯 LOA Original", format_currency(metricas['total_loa_receitas']))
+st.sidebar.metric("📈 Arrecadado", format_currency(metricas['total_arrecadado_receitas']))
+st.sidebar.metric("📊 Execução vs LOA", f"{metricas['execucao_vs_loa']:.1f}%")
 
 st.sidebar.subheader("💳 Despesas") 
-st.sidebar.metric("📉 Empenhado", format_currency(total_empenhado_despesas))
-st.sidebar.metric("✅ Liquidado", format_currency(total_liquidado_despesas))
-st.sidebar.metric("💸 Pago", format_currency(total_pago_despesas))
+st.sidebar.metric("📉 Empenhado", format_currency(metricas['total_empenhado_despesas']))
+st.sidebar.metric("✅ Liquidado", format_currency(metricas['total_liquidado_despesas']))
+st.sidebar.metric("💸 Pago", format_currency(metricas['total_pago_despesas']))
 
 st.sidebar.subheader("🔍 Resultado")
-resultado_orcamentario = total_arrecadado_receitas - total_empenhado_despesas
-cor_resultado = "normal" if resultado_orcamentario >= 0 else "inverse"
-st.sidebar.metric("💰 Saldo Orçamentário", format_currency(resultado_orcamentario), 
+cor_resultado = "normal" if metricas['resultado_orcamentario'] >= 0 else "inverse"
+st.sidebar.metric("💰 Saldo Orçamentário", format_currency(metricas['resultado_orcamentario']), 
                  delta_color=cor_resultado)
 
 # Menu de navegação
@@ -169,6 +459,11 @@ opcao = st.sidebar.selectbox(
      "Comparação Previsto vs Realizado", "Análise por Função", "Detalhamento"]
 )
 
+# Tempo de carga de cada arquivo (carregados em paralelo; em cache, poucos milissegundos)
+with st.sidebar.expander("⏱️ Tempo de carga por arquivo"):
+    for arquivo, tempo in tempos_carga.items():
+        st.write(f"**{arquivo}**: {tempo * 1000:.0f} ms")
+
 # CSS personalizado
 st.markdown("""
 <style>
@@ -205,29 +500,29 @@ if opcao == "Visão Geral":
     with col1:
         st.metric(
             "💰 Total Arrecadado",
-            format_currency(total_arrecadado_receitas),
-            f"{percentual_execucao_receitas:.1f}% do previsto"
+            format_currency(metricas['total_arrecadado_receitas']),
+            f"{metricas['percentual_execucao_receitas']:.1f}% do previsto"
         )
     
     with col2:
         st.metric(
             "📊 Total Empenhado",
-            format_currency(total_empenhado_despesas),
-            f"{(total_empenhado_despesas/total_dotacao_despesas*100):.1f}% da dotação"
+            format_currency(metricas['total_empenhado_despesas']),
+            f"{(metricas['total_empenhado_despesas']/metricas['total_dotacao_despesas']*100):.1f}% da dotação"
         )
     
     with col3:
         st.metric(
             "✅ Total Liquidado",
-            format_currency(total_liquidado_despesas),
-            f"{(total_liquidado_despesas/total_empenhado_despesas*100):.1f}% do empenhado"
+            format_currency(metricas['total_liquidado_despesas']),
+            f"{(metricas['total_liquidado_despesas']/metricas['total_empenhado_despesas']*100):.1f}% do empenhado"
         )
     
     with col4:
         st.metric(
             "💳 Total Pago",
-            format_currency(total_pago_despesas),
-            f"{(total_pago_despesas/total_liquidado_despesas*100):.1f}% do liquidado"
+            format_currency(metricas['total_pago_despesas']),
+            f"{(metricas['total_pago_despesas']/metricas['total_liquidado_despesas']*100):.1f}% do liquidado"
         )
     
     st.divider()
@@ -237,42 +532,46 @@ if opcao == "Visão Geral":
     
     with col1:
         # Comparação Receitas vs Despesas
-        fig_comparacao = go.Figure(data=[
-            go.Bar(name='Receitas', x=['Previsto', 'Realizado'], 
-                  y=[total_previsto_receitas, total_arrecadado_receitas], 
-                  marker_color='#2E8B57'),
-            go.Bar(name='Despesas', x=['Dotado', 'Empenhado'], 
-                  y=[total_dotacao_despesas, total_empenhado_despesas], 
-                  marker_color='#DC143C')
-        ])
-        
-        fig_comparacao.update_layout(
-            title="Receitas vs Despesas - Previsto vs Realizado",
-            barmode='group',
-            height=400
-        )
+        def montar_comparacao():
+            fig_comparacao = go.Figure(data=[
+                go.Bar(name='Receitas', x=['Previsto', 'Realizado'], 
+                      y=[em_reais(metricas['total_previsto_receitas']), em_reais(metricas['total_arrecadado_receitas'])], 
+                      marker_color='#2E8B57'),
+                go.Bar(name='Despesas', x=['Dotado', 'Empenhado'], 
+                      y=[em_reais(metricas['total_dotacao_despesas']), em_reais(metricas['total_empenhado_despesas'])], 
+                      marker_color='#DC143C')
+            ])
+            
+            fig_comparacao.update_layout(
+                title="Receitas vs Despesas - Previsto vs Realizado",
+                barmode='group',
+                height=400
+            )
+            return fig_comparacao
         
-        st.plotly_chart(fig_comparacao, use_container_width=True)
+        st.plotly_chart(load_figura('receitas_despesas', versao_arquivos, (), montar_comparacao), use_container_width=True)
     
     with col2:
         # Execução das Despesas (Funil)
-        fases_despesas = ['Dotado', 'Empenhado', 'Liquidado', 'Pago']
-        valores_despesas = [total_dotacao_despesas, total_empenhado_despesas, 
-                          total_liquidado_despesas, total_pago_despesas]
-        
-        fig_funil = go.Figure(go.Funnel(
-            y=fases_despesas,
-            x=valores_despesas,
-            textinfo="value+percent previous",
-            marker={"color": ["deepskyblue", "lightsalmon", "lightgreen", "gold"]}
-        ))
-        
-        fig_funil.update_layout(
-            title="Funil de Execução das Despesas",
-            height=400
-        )
+        def montar_funil():
+            fases_despesas = ['Dotado', 'Empenhado', 'Liquidado', 'Pago']
+            valores_despesas = [metricas['total_dotacao_despesas'], metricas['total_empenhado_despesas'], 
+                              metricas['total_liquidado_despesas'], metricas['total_pago_despesas']]
+            
+            fig_funil = go.Figure(go.Funnel(
+                y=fases_despesas,
+                x=[em_reais(valor) for valor in valores_despesas],
+                textinfo="value+percent previous",
+                marker={"color": ["deepskyblue", "lightsalmon", "lightgreen", "gold"]}
+            ))
+            
+            fig_funil.update_layout(
+                title="Funil de Execução das Despesas",
+                height=400
+            )
+            return fig_funil
         
-        st.plotly_chart(fig_funil, use_container_width=True)
+        st.plotly_chart(load_figura('funil_despesas', versao_despesas, (), montar_funil), use_container_width=True)
 
 # ==============================================================================
 # MÉTRICAS COMPLETAS
@@ -285,31 +584,29 @@ elif opcao == "🎯 Métricas Completas":
     pop_estimada = 5000  # População estimada de Rifaina
     
     # Métricas básicas
-    receita_per_capita = total_arrecadado_receitas / pop_estimada
-    despesa_per_capita = total_empenhado_despesas / pop_estimada
+    receita_per_capita = metricas['total_arrecadado_receitas'] / pop_estimada
+    despesa_per_capita = metricas['total_empenhado_despesas'] / pop_estimada
     
     # Métricas de execução
-    execucao_financeira = (total_pago_despesas / total_empenhado_despesas * 100) if total_empenhado_despesas > 0 else 0
-    execucao_orcamentaria = (total_empenhado_despesas / total_dotacao_despesas * 100) if total_dotacao_despesas > 0 else 0
+    execucao_financeira = (metricas['total_pago_despesas'] / metricas['total_empenhado_despesas'] * 100) if metricas['total_empenhado_despesas'] > 0 else 0
+    execucao_orcamentaria = (metricas['total_empenhado_despesas'] / metricas['total_dotacao_despesas'] * 100) if metricas['total_dotacao_despesas'] > 0 else 0
     
     # Métricas de liquidez
-    liquidez_geral = (total_arrecadado_receitas / total_empenhado_despesas) if total_empenhado_despesas > 0 else 0
-    resto_a_pagar = total_liquidado_despesas - total_pago_despesas
+    liquidez_geral = (metricas['total_arrecadado_receitas'] / metricas['total_empenhado_despesas']) if metricas['total_empenhado_despesas'] > 0 else 0
+    resto_a_pagar = metricas['total_liquidado_despesas'] - metricas['total_pago_despesas']
     
     # Métricas de autonomia fiscal
-    receitas_tributarias = receitas_df[receitas_df['Código'].str.startswith(('1112', '1113', '1114', '1121', '1122'))]['Arrec. Total'].sum()
-    transferencias = receitas_df[receitas_df['Código'].str.startswith(('1711', '1712', '1713', '1714', '1716', '1721', '1722', '1723', '1724', '1751'))]['Arrec. Total'].sum()
-    
-    autonomia_fiscal = (receitas_tributarias / total_arrecadado_receitas * 100) if total_arrecadado_receitas > 0 else 0
-    dependencia_transferencias = (transferencias / total_arrecadado_receitas * 100) if total_arrecadado_receitas > 0 else 0
+    autonomia_fiscal = (metricas['receitas_tributarias'] / metricas['total_arrecadado_receitas'] * 100) if metricas['total_arrecadado_receitas'] > 0 else 0
+    dependencia_transferencias = (metricas['transferencias'] / metricas['total_arrecadado_receitas'] * 100) if metricas['total_arrecadado_receitas'] > 0 else 0
     
     # Métricas por área (Saúde, Educação, etc.)
-    saude_despesas = despesas_df[despesas_df['Função'] == '10']['Empenhado até Hoje'].sum()
-    educacao_despesas = despesas_df[despesas_df['Função'] == '12']['Empenhado até Hoje'].sum()
-    assistencia_despesas = despesas_df[despesas_df['Função'] == '08']['Empenhado até Hoje'].sum()
+    saude_despesas = metricas['despesas_por_funcao'][metricas['despesas_por_funcao']['Função'] == 10]['Empenhado até Hoje'].sum()
+    educacao_despesas = metricas['despesas_por_funcao'][metricas['despesas_por_funcao']['Função'] == 12]['Empenhado até Hoje'].sum()
+    assistencia_despesas = metricas['despesas_por_funcao'][metricas['despesas_por_funcao']['Função'] == 8]['Empenhado até Hoje'].sum()
+    despesas_por_natureza = metricas['despesas_por_natureza']
     
-    saude_percentual = (saude_despesas / total_empenhado_despesas * 100) if total_empenhado_despesas > 0 else 0
-    educacao_percentual = (educacao_despesas / total_empenhado_despesas * 100) if total_empenhado_despesas > 0 else 0
+    saude_percentual = (saude_despesas / metricas['total_empenhado_despesas'] * 100) if metricas['total_empenhado_despesas'] > 0 else 0
+    educacao_percentual = (educacao_despesas / metricas['total_empenhado_despesas'] * 100) if metricas['total_empenhado_despesas'] > 0 else 0
     
     # ==============================================================================
     # SEÇÃO 1: MÉTRICAS FINANCEIRAS BÁSICAS
@@ -321,22 +618,22 @@ elif opcao == "🎯 Métricas Completas":
     with col1:
         st.metric(
             "💵 Receita Total",
-            format_currency(total_arrecadado_receitas),
+            format_currency(metricas['total_arrecadado_receitas']),
             help="Total de receitas arrecadadas no período"
         )
     
     with col2:
         st.metric(
             "💸 Despesa Total",
-            format_currency(total_empenhado_despesas),
+            format_currency(metricas['total_empenhado_despesas']),
             help="Total de despesas empenhadas no período"
         )
     
     with col3:
         st.metric(
             "⚖️ Saldo Orçamentário",
-            format_currency(resultado_orcamentario),
-            f"{((resultado_orcamentario/total_arrecadado_receitas)*100):.1f}% da receita" if total_arrecadado_receitas > 0 else "0%"
+            format_currency(metricas['resultado_orcamentario']),
+            f"{((metricas['resultado_orcamentario']/metricas['total_arrecadado_receitas'])*100):.1f}% da receita" if metricas['total_arrecadado_receitas'] > 0 else "0%"
         )
     
     with col4:
@@ -363,7 +660,7 @@ elif opcao == "🎯 Métricas Completas":
     with col1:
         st.metric(
             "🎯 Execução LOA",
-            f"{execucao_vs_loa:.1f}%",
+            f"{metricas['execucao_vs_loa']:.1f}%",
             "Arrecadado vs LOA Original",
             help="Percentual da LOA efetivamente arrecadado"
         )
@@ -371,7 +668,7 @@ elif opcao == "🎯 Métricas Completas":
     with col2:
         st.metric(
             "📈 Execução Portal",
-            f"{percentual_execucao_receitas:.1f}%",
+            f"{metricas['percentual_execucao_receitas']:.1f}%",
             "Arrecadado vs Previsto Atualizado",
             help="Execução conforme Portal de Transparência"
         )
@@ -395,7 +692,7 @@ elif opcao == "🎯 Métricas Completas":
     with col5:
         st.metric(
             "📋 Liquidação",
-            f"{(total_liquidado_despesas/total_empenhado_despesas*100):.1f}%" if total_empenhado_despesas > 0 else "0%",
+            f"{(metricas['total_liquidado_despesas']/metricas['total_empenhado_despesas']*100):.1f}%" if metricas['total_empenhado_despesas'] > 0 else "0%",
             "Liquidado vs Empenhado",
             help="Percentual dos empenhos liquidados"
         )
@@ -428,8 +725,8 @@ elif opcao == "🎯 Métricas Completas":
         )
     
     with col3:
-        outras_receitas = total_arrecadado_receitas - receitas_tributarias - transferencias
-        outras_percentual = (outras_receitas / total_arrecadado_receitas * 100) if total_arrecadado_receitas > 0 else 0
+        outras_receitas = metricas['total_arrecadado_receitas'] - metricas['receitas_tributarias'] - metricas['transferencias']
+        outras_percentual = (outras_receitas / metricas['total_arrecadado_receitas'] * 100) if metricas['total_arrecadado_receitas'] > 0 else 0
         st.metric(
             "📊 Outras Receitas",
             f"{outras_percentual:.1f}%",
@@ -476,7 +773,7 @@ elif opcao == "🎯 Métricas Completas":
         )
     
     with col3:
-        assistencia_percentual = (assistencia_despesas / total_empenhado_despesas * 100) if total_empenhado_despesas > 0 else 0
+        assistencia_percentual = (assistencia_despesas / metricas['total_empenhado_despesas'] * 100) if metricas['total_empenhado_despesas'] > 0 else 0
         st.metric(
             "🤝 Assistência Social",
             f"{assistencia_percentual:.1f}%",
@@ -486,8 +783,8 @@ elif opcao == "🎯 Métricas Completas":
     
     with col4:
         # Calcular investimentos (natureza 4.4)
-        investimentos = despesas_df[despesas_df['Natureza'].str.startswith('4.4', na=False)]['Empenhado até Hoje'].sum()
-        investimentos_percentual = (investimentos / total_empenhado_despesas * 100) if total_empenhado_despesas > 0 else 0
+        investimentos = despesas_por_natureza[despesas_por_natureza['Natureza'].str.startswith('4.4', na=False)]['Empenhado até Hoje'].sum()
+        investimentos_percentual = (investimentos / metricas['total_empenhado_despesas'] * 100) if metricas['total_empenhado_despesas'] > 0 else 0
         st.metric(
             "🏗️ Investimentos",
             f"{investimentos_percentual:.1f}%",
@@ -497,8 +794,8 @@ elif opcao == "🎯 Métricas Completas":
     
     with col5:
         # Calcular custeio (natureza 3.3)
-        custeio = despesas_df[despesas_df['Natureza'].str.startswith('3.3', na=False)]['Empenhado até Hoje'].sum()
-        custeio_percentual = (custeio / total_empenhado_despesas * 100) if total_empenhado_despesas > 0 else 0
+        custeio = despesas_por_natureza[despesas_por_natureza['Natureza'].str.startswith('3.3', na=False)]['Empenhado até Hoje'].sum()
+        custeio_percentual = (custeio / metricas['total_empenhado_despesas'] * 100) if metricas['total_empenhado_despesas'] > 0 else 0
         st.metric(
             "🔧 Custeio",
             f"{custeio_percentual:.1f}%",
@@ -527,21 +824,21 @@ elif opcao == "🎯 Métricas Completas":
         st.metric(
             "⏳ Resto a Pagar",
             format_currency(resto_a_pagar),
-            f"{(resto_a_pagar/total_liquidado_despesas*100):.1f}% do liquidado" if total_liquidado_despesas > 0 else "0%",
+            f"{(resto_a_pagar/metricas['total_liquidado_despesas']*100):.1f}% do liquidado" if metricas['total_liquidado_despesas'] > 0 else "0%",
             help="Valor liquidado mas ainda não pago"
         )
     
     with col3:
-        disponibilidade_caixa = total_arrecadado_receitas - total_pago_despesas
+        disponibilidade_caixa = metricas['total_arrecadado_receitas'] - metricas['total_pago_despesas']
         st.metric(
             "💰 Disponibilidade",
             format_currency(disponibilidade_caixa),
-            f"{(disponibilidade_caixa/total_arrecadado_receitas*100):.1f}% da receita" if total_arrecadado_receitas > 0 else "0%",
+            f"{(disponibilidade_caixa/metricas['total_arrecadado_receitas']*100):.1f}% da receita" if metricas['total_arrecadado_receitas'] > 0 else "0%",
             help="Saldo disponível (receita - pago)"
         )
     
     with col4:
-        rotatividade = (total_pago_despesas / total_empenhado_despesas * 100) if total_empenhado_despesas > 0 else 0
+        rotatividade = (metricas['total_pago_despesas'] / metricas['total_empenhado_despesas'] * 100) if metricas['total_empenhado_despesas'] > 0 else 0
         st.metric(
             "🔄 Rotatividade",
             f"{rotatividade:.1f}%",
@@ -558,7 +855,7 @@ elif opcao == "🎯 Métricas Completas":
     
     with col1:
         # Eficiência arrecadatória
-        eficiencia_arrecadacao = (total_arrecadado_receitas / total_loa_receitas * 100) if total_loa_receitas > 0 else 0
+        eficiencia_arrecadacao = (metricas['total_arrecadado_receitas'] / metricas['total_loa_receitas'] * 100) if metricas['total_loa_receitas'] > 0 else 0
         cor_eficiencia = "normal" if eficiencia_arrecadacao >= 90 else "inverse"
         st.metric(
             "📈 Eficiência Arrecadação",
@@ -570,10 +867,9 @@ elif opcao == "🎯 Métricas Completas":
     
     with col2:
         # Concentração de fornecedores
-        total_fornecedores = despesas_df['Nome Fornecedor'].nunique()
-        fornecedor_concentracao = despesas_df.groupby('Nome Fornecedor')['Empenhado até Hoje'].sum()
-        top5_fornecedores = fornecedor_concentracao.nlargest(5).sum()
-        concentracao_pct = (top5_fornecedores / total_empenhado_despesas * 100) if total_empenhado_despesas > 0 else 0
+        total_fornecedores = len(metricas['despesas_por_fornecedor'])
+        top5_fornecedores = metricas['despesas_por_fornecedor']['Empenhado até Hoje'].nlargest(5).sum()
+        concentracao_pct = (top5_fornecedores / metricas['total_empenhado_despesas'] * 100) if metricas['total_empenhado_despesas'] > 0 else 0
         
         st.metric(
             "🏢 Concentração Fornecedores",
@@ -584,7 +880,7 @@ elif opcao == "🎯 Métricas Completas":
     
     with col3:
         # Diversificação de receitas
-        receitas_por_categoria = receitas_df.groupby(receitas_df['Código'].str[:4])['Arrec. Total'].sum()
+        receitas_por_categoria = receitas_df.groupby('nivel_1')['Arrec. Total'].sum()
         
         # Calcular índice de diversificação (entropia normalizada)
         if len(receitas_por_categoria) > 0:
@@ -604,18 +900,14 @@ elif opcao == "🎯 Métricas Completas":
     
     with col4:
         # Tempo médio de pagamento (aproximado)
-        if 'Data' in despesas_df.columns:
-            despesas_com_data = despesas_df.dropna(subset=['Data'])
-            if not despesas_com_data.empty:
-                tempo_medio = (datetime.now() - despesas_com_data['Data'].min()).days
-                st.metric(
-                    "⏱️ Tempo Médio Ciclo",
-                    f"{tempo_medio} dias",
-                    "Empenho até hoje",
-                    help="Tempo médio do ciclo orçamentário"
-                )
-            else:
-                st.metric("⏱️ Tempo Médio Ciclo", "N/A", "Dados indisponíveis")
+        if pd.notna(despesas_agregadas['data_inicial']):
+            tempo_medio = (datetime.now() - despesas_agregadas['data_inicial']).days
+            st.metric(
+                "⏱️ Tempo Médio Ciclo",
+                f"{tempo_medio} dias",
+                "Empenho até hoje",
+                help="Tempo médio do ciclo orçamentário"
+            )
         else:
             st.metric("⏱️ Tempo Médio Ciclo", "N/A", "Dados indisponíveis")
     
@@ -628,7 +920,7 @@ elif opcao == "🎯 Métricas Completas":
     
     with col1:
         # Índice de Qualidade Fiscal (IQF) - criado
-        iqf = (autonomia_fiscal * 0.3 + execucao_vs_loa * 0.3 + 
+        iqf = (autonomia_fiscal * 0.3 + metricas['execucao_vs_loa'] * 0.3 + 
                (100 - dependencia_transferencias) * 0.2 + liquidez_geral * 20 * 0.2)
         iqf = min(100, max(0, iqf))
         
@@ -646,7 +938,7 @@ elif opcao == "🎯 Métricas Completas":
         sustentabilidade = ((saude_percentual >= 15) * 25 + 
                           (educacao_percentual >= 25) * 25 + 
                           (autonomia_fiscal >= 20) * 25 + 
-                          (execucao_vs_loa >= 80) * 25)
+                          (metricas['execucao_vs_loa'] >= 80) * 25)
         
         st.metric(
             "🌱 Sustentabilidade",
@@ -657,7 +949,7 @@ elif opcao == "🎯 Métricas Completas":
     
     with col3:
         # Transparência e controle
-        total_empenhos = len(despesas_df)
+        total_empenhos = int(despesas_agregadas['totais']['empenhos'])
         empenhos_por_habitante = total_empenhos / pop_estimada
         
         st.metric(
@@ -670,7 +962,7 @@ elif opcao == "🎯 Métricas Completas":
     with col4:
         # Efetividade do gasto público
         gasto_social = saude_despesas + educacao_despesas + assistencia_despesas
-        efetividade = (gasto_social / total_empenhado_despesas * 100) if total_empenhado_despesas > 0 else 0
+        efetividade = (gasto_social / metricas['total_empenhado_despesas'] * 100) if metricas['total_empenhado_despesas'] > 0 else 0
         
         cor_efetividade = "normal" if efetividade >= 50 else "inverse"
         st.metric(
@@ -704,8 +996,8 @@ elif opcao == "🎯 Métricas Completas":
         recomendacoes.append("📌 Fortalecer arrecadação própria (IPTU, ISS, taxas)")
     
     # Verificar execução orçamentária
-    if execucao_vs_loa < 70:
-        alertas.append(f"⚠️ **EXECUÇÃO LOA**: {execucao_vs_loa:.1f}% - Baixa execução do orçamento")
+    if metricas['execucao_vs_loa'] < 70:
+        alertas.append(f"⚠️ **EXECUÇÃO LOA**: {metricas['execucao_vs_loa']:.1f}% - Baixa execução do orçamento")
         recomendacoes.append("📌 Revisar projeções orçamentárias e melhorar arrecadação")
     
     # Verificar liquidez
@@ -714,7 +1006,7 @@ elif opcao == "🎯 Métricas Completas":
         recomendacoes.append("📌 Urgente: equilibrar receitas e despesas")
     
     # Verificar resto a pagar
-    if resto_a_pagar > total_arrecadado_receitas * 0.1:  # > 10% da receita
+    if resto_a_pagar > metricas['total_arrecadado_receitas'] * 0.1:  # > 10% da receita
         alertas.append(f"⚠️ **RESTO A PAGAR**: {format_currency(resto_a_pagar)} - Alto valor não pago")
         recomendacoes.append("📌 Priorizar quitação de compromissos liquidados")
     
@@ -748,19 +1040,19 @@ elif opcao == "LOA vs Execução":
     with col1:
         st.metric(
             "💰 LOA - Receitas",
-            format_currency(total_loa_receitas),
+            format_currency(metricas['total_loa_receitas']),
             "Orçamento Original"
         )
     
     with col2:
         st.metric(
             "📈 Receitas Arrecadadas",
-            format_currency(total_arrecadado_receitas),
-            f"{execucao_vs_loa:.1f}% da LOA"
+            format_currency(metricas['total_arrecadado_receitas']),
+            f"{metricas['execucao_vs_loa']:.1f}% da LOA"
         )
     
     with col3:
-        diferenca_loa_execucao = total_arrecadado_receitas - total_loa_receitas
+        diferenca_loa_execucao = metricas['total_arrecadado_receitas'] - metricas['total_loa_receitas']
         st.metric(
             "🔄 Diferença",
             format_currency(diferenca_loa_execucao),
@@ -770,7 +1062,7 @@ elif opcao == "LOA vs Execução":
     with col4:
         st.metric(
             "📊 Performance",
-            f"{execucao_vs_loa:.1f}%",
+            f"{metricas['execucao_vs_loa']:.1f}%",
             "Execução da LOA"
         )
     
@@ -780,12 +1072,16 @@ elif opcao == "LOA vs Execução":
     st.subheader("📈 Análise Detalhada por Categoria")
     
     # Agrupar receitas da LOA por categoria principal
-    receitas_loa_df['categoria_loa'] = receitas_loa_df['CODRE'].str[:4]
-    loa_por_categoria = receitas_loa_df.groupby('categoria_loa')['TOTOR'].sum().reset_index()
+    loa_por_categoria = (
+        receitas_loa_df.groupby('nivel_1')['TOTOR'].sum()
+        .rename_axis('categoria_loa').reset_index()
+    )
     
     # Agrupar receitas executadas por categoria
-    receitas_df['categoria_exec'] = receitas_df['Código'].str[:4]
-    exec_por_categoria = receitas_df.groupby('categoria_exec')['Arrec. Total'].sum().reset_index()
+    exec_por_categoria = (
+        receitas_df.groupby('nivel_1')['Arrec. Total'].sum()
+        .rename_axis('categoria_exec').reset_index()
+    )
     
     # Merge das categorias
     comparacao_categorias = pd.merge(
@@ -794,7 +1090,7 @@ elif opcao == "LOA vs Execução":
         left_on='categoria_loa', 
         right_on='categoria_exec', 
         how='outer'
-    ).fillna(0)
+    ).fillna(0).astype({'TOTOR': 'int64', 'Arrec. Total': 'int64'})
     
     comparacao_categorias['execucao_pct'] = (
         comparacao_categorias['Arrec. Total'] / comparacao_categorias['TOTOR'] * 100
@@ -820,49 +1116,72 @@ elif opcao == "LOA vs Execução":
     
     with col1:
         # Gráfico comparativo LOA vs Execução
-        fig_comparacao_loa = go.Figure()
-        
-        fig_comparacao_loa.add_trace(go.Bar(
-            name='LOA (Previsto)',
-            x=comparacao_categorias['nome_categoria'],
-            y=comparacao_categorias['TOTOR'],
-            marker_color='lightcoral',
-            opacity=0.7
-        ))
-        
-        fig_comparacao_loa.add_trace(go.Bar(
-            name='Executado',
-            x=comparacao_categorias['nome_categoria'],
-            y=comparacao_categorias['Arrec. Total'],
-            marker_color='steelblue'
-        ))
-        
-        fig_comparacao_loa.update_layout(
-            title="LOA vs Execução por Categoria",
-            barmode='group',
-            height=500,
-            xaxis_tickangle=-45
-        )
+        def montar_comparacao_loa():
+            fig_comparacao_loa = go.Figure()
+            
+            fig_comparacao_loa.add_trace(go.Bar(
+                name='LOA (Previsto)',
+                x=comparacao_categorias['nome_categoria'],
+                y=em_reais(comparacao_categorias['TOTOR']),
+                marker_color='lightcoral',
+                opacity=0.7
+            ))
+            
+            fig_comparacao_loa.add_trace(go.Bar(
+                name='Executado',
+                x=comparacao_categorias['nome_categoria'],
+                y=em_reais(comparacao_categorias['Arrec. Total']),
+                marker_color='steelblue'
+            ))
+            
+            fig_comparacao_loa.update_layout(
+                title="LOA vs Execução por Categoria",
+                barmode='group',
+                height=500,
+                xaxis_tickangle=-45
+            )
+            return fig_comparacao_loa
         
-        st.plotly_chart(fig_comparacao_loa, use_container_width=True)
+        st.plotly_chart(load_figura('loa_execucao', versao_arquivos, (), montar_comparacao_loa), use_container_width=True)
     
     with col2:
         # Percentual de execução por categoria
-        top_execucao = comparacao_categorias.nlargest(10, 'execucao_pct')
-        
-        fig_exec_pct = px.bar(
-            top_execucao,
-            x='execucao_pct',
-            y='nome_categoria',
-            orientation='h',
-            title="% Execução da LOA por Categoria",
-            labels={'execucao_pct': 'Execução (%)', 'nome_categoria': 'Categoria'},
-            color='execucao_pct',
-            color_continuous_scale='RdYlGn'
-        )
+        def montar_exec_pct():
+            top_execucao = comparacao_categorias.nlargest(10, 'execucao_pct')
+            
+            fig_exec_pct = px.bar(
+                top_execucao,
+                x='execucao_pct',
+                y='nome_categoria',
+                orientation='h',
+                title="% Execução da LOA por Categoria",
+                labels={'execucao_pct': 'Execução (%)', 'nome_categoria': 'Categoria'},
+                color='execucao_pct',
+                color_continuous_scale='RdYlGn'
+            )
+            
+            fig_exec_pct.update_layout(height=500, yaxis={'categoryorder': 'total ascending'})
+            return fig_exec_pct
         
-        fig_exec_pct.update_layout(height=500, yaxis={'categoryorder': 'total ascending'})
-        st.plotly_chart(fig_exec_pct, use_container_width=True)
+        st.plotly_chart(load_figura('loa_execucao_pct', versao_arquivos, (), montar_exec_pct), use_container_width=True)
+    
+    # Hierarquia da arrecadação, direto do cubo da estrutura (cada conta já soma as descendentes)
+    def montar_hierarquia():
+        ramos = ramos_do_cubo(metricas['cubo_receitas'], 'Arrec. Total')
+        fig_hierarquia = go.Figure(go.Sunburst(
+            ids=ramos.index,
+            labels=ramos['NOMRE'],
+            parents=ramos['pai'],
+            values=em_reais(ramos['Arrec. Total']),
+            customdata=em_reais(ramos['TOTOR']),
+            branchvalues="total",
+            maxdepth=3,
+            hovertemplate='<b>%{label}</b><br>Arrecadado: R$ %{value:,.2f}<br>LOA: R$ %{customdata:,.2f}<extra></extra>'
+        ))
+        fig_hierarquia.update_layout(title="Hierarquia da Arrecadação (clique para detalhar)", height=600)
+        return fig_hierarquia
+    
+    st.plotly_chart(load_figura('hierarquia_arrecadacao', versao_arquivos, (), montar_hierarquia), use_container_width=True)
     
     # Tabela detalhada de comparação
     st.subheader("📋 Tabela Comparativa: LOA vs Execução")
@@ -907,12 +1226,12 @@ elif opcao == "LOA vs Execução":
     
     with col3:
         # Execução geral
-        if execucao_vs_loa > 90:
-            st.success(f"🟢 **Execução Geral**: {execucao_vs_loa:.1f}% - Excelente")
-        elif execucao_vs_loa > 70:
-            st.info(f"🟡 **Execução Geral**: {execucao_vs_loa:.1f}% - Boa")
+        if metricas['execucao_vs_loa'] > 90:
+            st.success(f"🟢 **Execução Geral**: {metricas['execucao_vs_loa']:.1f}% - Excelente")
+        elif metricas['execucao_vs_loa'] > 70:
+            st.info(f"🟡 **Execução Geral**: {metricas['execucao_vs_loa']:.1f}% - Boa")
         else:
-            st.error(f"🔴 **Execução Geral**: {execucao_vs_loa:.1f}% - Baixa")
+            st.error(f"🔴 **Execução Geral**: {metricas['execucao_vs_loa']:.1f}% - Baixa")
 
 # ==============================================================================
 # RECEITAS EXECUTADAS
@@ -921,87 +1240,50 @@ elif opcao == "Receitas Executadas":
     st.header("💰 Análise das Receitas Executadas")
     
     # Filtrar receitas com arrecadação > 0
-    receitas_com_valor = receitas_df[receitas_df['Arrec. Total'] > 0].copy()
-    
-    # Principais categorias de receitas
-    receitas_com_valor['categoria'] = receitas_com_valor['Código'].str[:4]
-    receitas_por_categoria = receitas_com_valor.groupby('categoria').agg({
-        'Prev. Atualizada': 'sum',
-        'Arrec. Total': 'sum'
-    }).reset_index()
-    
-    receitas_por_categoria['execucao_pct'] = (receitas_por_categoria['Arrec. Total'] / 
-                                            receitas_por_categoria['Prev. Atualizada'] * 100)
-    
-    # Mapear códigos para nomes
-    categoria_nomes = {
-        '1112': 'Impostos s/ Patrimônio',
-        '1113': 'Impostos s/ Renda',
-        '1114': 'Impostos s/ Serviços',
-        '1121': 'Taxas Poder Polícia',
-        '1122': 'Taxas por Serviços',
-        '1321': 'Rendimentos Financeiros',
-        '1335': 'Concessões',
-        '1399': 'Outras Patrimoniais',
-        '1699': 'Outros Serviços',
-        '1711': 'Transferências União',
-        '1712': 'Compensações Financeiras',
-        '1713': 'SUS - União',
-        '1714': 'FNDE',
-        '1715': 'FUNDEB - União',
-        '1716': 'FNAS',
-        '1719': 'Outras - União',
-        '1721': 'Transferências Estado',
-        '1722': 'Royalties Estado',
-        '1723': 'SUS - Estado',
-        '1724': 'Convênios Estado',
-        '1729': 'Outras - Estado',
-        '1751': 'FUNDEB',
-        '1911': 'Multas',
-        '1922': 'Restituições',
-        '1999': 'Outras Correntes',
-        '2422': 'Transferências Capital'
-    }
-    
-    receitas_por_categoria['nome_categoria'] = receitas_por_categoria['categoria'].map(categoria_nomes)
-    receitas_por_categoria['nome_categoria'] = receitas_por_categoria['nome_categoria'].fillna(
-        'Outras - ' + receitas_por_categoria['categoria'])
+    receitas_com_valor = receitas_df[receitas_df['Arrec. Total'] > 0]
     
     col1, col2 = st.columns(2)
     
     with col1:
         # Top 10 receitas por arrecadação
-        top_receitas = receitas_por_categoria.nlargest(10, 'Arrec. Total')
-        
-        fig_bar = px.bar(
-            top_receitas,
-            x='Arrec. Total',
-            y='nome_categoria',
-            orientation='h',
-            title="Top 10 Categorias - Arrecadação Realizada",
-            labels={'Arrec. Total': 'Arrecadado (R$)', 'nome_categoria': 'Categoria'}
-        )
+        def montar_top_receitas():
+            top_receitas = load_receitas_por_categoria(versao_receitas).nlargest(10, 'Arrec. Total')
+            
+            fig_bar = px.bar(
+                colunas_em_reais(top_receitas, 'Arrec. Total'),
+                x='Arrec. Total',
+                y='nome_categoria',
+                orientation='h',
+                title="Top 10 Categorias - Arrecadação Realizada",
+                labels={'Arrec. Total': 'Arrecadado (R$)', 'nome_categoria': 'Categoria'}
+            )
+            
+            fig_bar.update_layout(height=400, yaxis={'categoryorder': 'total ascending'})
+            return fig_bar
         
-        fig_bar.update_layout(height=400, yaxis={'categoryorder': 'total ascending'})
-        st.plotly_chart(fig_bar, use_container_width=True)
+        st.plotly_chart(load_figura('top_receitas', versao_receitas, (), montar_top_receitas), use_container_width=True)
     
     with col2:
         # Percentual de execução por categoria
-        receitas_execucao = receitas_por_categoria[receitas_por_categoria['execucao_pct'] > 0]
-        
-        fig_execucao = px.bar(
-            receitas_execucao.nlargest(10, 'execucao_pct'),
-            x='execucao_pct',
-            y='nome_categoria',
-            orientation='h',
-            title="Top 10 - Percentual de Execução das Receitas",
-            labels={'execucao_pct': 'Execução (%)', 'nome_categoria': 'Categoria'},
-            color='execucao_pct',
-            color_continuous_scale='RdYlGn'
-        )
+        def montar_execucao_receitas():
+            receitas_por_categoria = load_receitas_por_categoria(versao_receitas)
+            receitas_execucao = receitas_por_categoria[receitas_por_categoria['execucao_pct'] > 0]
+            
+            fig_execucao = px.bar(
+                receitas_execucao.nlargest(10, 'execucao_pct'),
+                x='execucao_pct',
+                y='nome_categoria',
+                orientation='h',
+                title="Top 10 - Percentual de Execução das Receitas",
+                labels={'execucao_pct': 'Execução (%)', 'nome_categoria': 'Categoria'},
+                color='execucao_pct',
+                color_continuous_scale='RdYlGn'
+            )
+            
+            fig_execucao.update_layout(height=400, yaxis={'categoryorder': 'total ascending'})
+            return fig_execucao
         
-        fig_execucao.update_layout(height=400, yaxis={'categoryorder': 'total ascending'})
-        st.plotly_chart(fig_execucao, use_container_width=True)
+        st.plotly_chart(load_figura('execucao_receitas', versao_receitas, (), montar_execucao_receitas), use_container_width=True)
     
     # Tabela detalhada das principais receitas
     st.subheader("📋 Detalhamento das Principais Receitas Arrecadadas")
@@ -1026,87 +1308,99 @@ elif opcao == "Receitas Executadas":
 elif opcao == "Despesas Executadas":
     st.header("💳 Análise das Despesas Executadas")
     
-    # Análise por função
-    despesas_por_funcao = despesas_df.groupby(['Função', 'Nome da Função']).agg({
-        'Dotação Atual': 'sum',
-        'Empenhado até Hoje': 'sum',
-        'Liquidado até Hoje': 'sum',
-        'Pago até Hoje': 'sum'
-    }).reset_index()
-    
-    despesas_por_funcao['execucao_pct'] = (despesas_por_funcao['Empenhado até Hoje'] / 
-                                         despesas_por_funcao['Dotação Atual'] * 100)
-    
     col1, col2 = st.columns(2)
     
     with col1:
         # Top 10 funções por valor empenhado
-        top_funcoes = despesas_por_funcao.nlargest(10, 'Empenhado até Hoje')
-        
-        fig_funcoes = px.bar(
-            top_funcoes,
-            x='Empenhado até Hoje',
-            y='Nome da Função',
-            orientation='h',
-            title="Top 10 Funções - Valor Empenhado",
-            labels={'Empenhado até Hoje': 'Empenhado (R$)', 'Nome da Função': 'Função'}
-        )
+        def montar_funcoes():
+            # Análise por função
+            execucao_por_funcao = metricas['despesas_por_funcao'].copy()
+            execucao_por_funcao['execucao_pct'] = (execucao_por_funcao['Empenhado até Hoje'] / 
+                                                 execucao_por_funcao['Dotação Atual'] * 100)
+            top_funcoes = execucao_por_funcao.nlargest(10, 'Empenhado até Hoje')
+            
+            fig_funcoes = px.bar(
+                colunas_em_reais(top_funcoes, 'Empenhado até Hoje'),
+                x='Empenhado até Hoje',
+                y='Nome da Função',
+                orientation='h',
+                title="Top 10 Funções - Valor Empenhado",
+                labels={'Empenhado até Hoje': 'Empenhado (R$)', 'Nome da Função': 'Função'}
+            )
+            
+            fig_funcoes.update_layout(height=400, yaxis={'categoryorder': 'total ascending'})
+            return fig_funcoes
         
-        fig_funcoes.update_layout(height=400, yaxis={'categoryorder': 'total ascending'})
-        st.plotly_chart(fig_funcoes, use_container_width=True)
+        st.plotly_chart(load_figura('top_funcoes', versao_despesas, (), montar_funcoes), use_container_width=True)
     
     with col2:
         # Análise por natureza da despesa
-        despesas_por_natureza = despesas_df.groupby('Nome Natureza').agg({
-            'Empenhado até Hoje': 'sum'
-        }).reset_index()
-        
-        top_natureza = despesas_por_natureza.nlargest(8, 'Empenhado até Hoje')
-        
-        fig_natureza = px.pie(
-            top_natureza,
-            values='Empenhado até Hoje',
-            names='Nome Natureza',
-            title="Distribuição por Natureza da Despesa"
-        )
+        def montar_natureza():
+            despesas_por_natureza = consultar_cubo(despesas_agregadas['cubo'], ['Nome Natureza'])[
+                ['Empenhado até Hoje']
+            ].reset_index()
+            
+            top_natureza = despesas_por_natureza.nlargest(8, 'Empenhado até Hoje')
+            
+            fig_natureza = px.pie(
+                colunas_em_reais(top_natureza, 'Empenhado até Hoje'),
+                values='Empenhado até Hoje',
+                names='Nome Natureza',
+                title="Distribuição por Natureza da Despesa"
+            )
+            return fig_natureza
         
-        st.plotly_chart(fig_natureza, use_container_width=True)
+        st.plotly_chart(load_figura('natureza', versao_despesas, (), montar_natureza), use_container_width=True)
     
     # Evolução temporal das despesas
     st.subheader("📈 Evolução Temporal das Despesas")
     
-    if 'Data' in despesas_df.columns:
-        despesas_df['mes_ano'] = despesas_df['Data'].dt.to_period('M')
-        evolucao_mensal = despesas_df.groupby('mes_ano')['Valor Empenhado'].sum().reset_index()
-        evolucao_mensal['mes_ano_str'] = evolucao_mensal['mes_ano'].astype(str)
+    evolucao_mensal = despesas_agregadas['mes']['Valor Empenhado'].reset_index().dropna(subset=['mes'])
+    if not evolucao_mensal.empty:
+        evolucao_mensal = evolucao_mensal.rename(columns={'mes': 'mes_ano_str'})
         
-        fig_evolucao = px.line(
-            evolucao_mensal,
-            x='mes_ano_str',
-            y='Valor Empenhado',
-            title="Evolução Mensal dos Empenhos",
-            labels={'mes_ano_str': 'Mês/Ano', 'Valor Empenhado': 'Valor (R$)'}
-        )
+        def montar_evolucao():
+            fig_evolucao = px.line(
+                colunas_em_reais(evolucao_mensal, 'Valor Empenhado'),
+                x='mes_ano_str',
+                y='Valor Empenhado',
+                title="Evolução Mensal dos Empenhos",
+                labels={'mes_ano_str': 'Mês/Ano', 'Valor Empenhado': 'Valor (R$)'}
+            )
+            return fig_evolucao
         
-        st.plotly_chart(fig_evolucao, use_container_width=True)
+        st.plotly_chart(load_figura('evolucao_mensal', versao_despesas, (), montar_evolucao), use_container_width=True)
     
-    # Tabela dos maiores fornecedores
+    # Tabela dos maiores fornecedores (por CPF/CNPJ ou, agrupados, pela raiz do CNPJ)
     st.subheader("🏢 Maiores Fornecedores")
     
-    fornecedores = despesas_df.groupby('Nome Fornecedor').agg({
-        'Empenhado até Hoje': 'sum',
-        'Liquidado até Hoje': 'sum',
-        'Pago até Hoje': 'sum'
-    }).reset_index()
-    
-    top_fornecedores = fornecedores.nlargest(15, 'Empenhado até Hoje')
-    
-    top_fornecedores['Empenhado até Hoje'] = top_fornecedores['Empenhado até Hoje'].apply(format_currency)
-    top_fornecedores['Liquidado até Hoje'] = top_fornecedores['Liquidado até Hoje'].apply(format_currency)
-    top_fornecedores['Pago até Hoje'] = top_fornecedores['Pago até Hoje'].apply(format_currency)
+    @st.fragment
+    def mostrar_maiores_fornecedores():
+        """Tabela dos maiores fornecedores, por CPF/CNPJ ou pela raiz do CNPJ"""
+        agrupar_raiz = st.checkbox(
+            "Agrupar pela raiz do CNPJ (matriz e filiais)",
+            key="agrupar_raiz_cnpj",
+            help="Soma os fornecedores com os mesmos 8 primeiros dígitos do CNPJ"
+        )
+        if agrupar_raiz:
+            fornecedores = despesas_agregadas['grupo_fornecedor'].reset_index()
+            colunas_documento = ['Nome Fornecedor', 'grupo']
+        else:
+            fornecedores = despesas_agregadas['fornecedor'].reset_index()
+            colunas_documento = ['Nome Fornecedor', 'CPF/CNPJ']
+        
+        top_fornecedores = fornecedores.nlargest(15, 'Empenhado até Hoje')[
+            colunas_documento + ['Empenhado até Hoje', 'Liquidado até Hoje', 'Pago até Hoje']
+        ]
+        
+        top_fornecedores['Empenhado até Hoje'] = top_fornecedores['Empenhado até Hoje'].apply(format_currency)
+        top_fornecedores['Liquidado até Hoje'] = top_fornecedores['Liquidado até Hoje'].apply(format_currency)
+        top_fornecedores['Pago até Hoje'] = top_fornecedores['Pago até Hoje'].apply(format_currency)
+        
+        top_fornecedores.columns = ['Fornecedor', 'CPF/CNPJ' if not agrupar_raiz else 'Raiz do CNPJ', 'Empenhado', 'Liquidado', 'Pago']
+        st.dataframe(top_fornecedores, use_container_width=True)
     
-    top_fornecedores.columns = ['Fornecedor', 'Empenhado', 'Liquidado', 'Pago']
-    st.dataframe(top_fornecedores, use_container_width=True)
+    mostrar_maiores_fornecedores()
 
 # ==============================================================================
 # COMPARAÇÃO PREVISTO VS REALIZADO
@@ -1118,10 +1412,10 @@ elif opcao == "Comparação Previsto vs Realizado":
     st.subheader("💰 Receitas: Previsão vs Arrecadação")
     
     # Principais categorias de receitas
-    receitas_categoria = receitas_df.groupby(receitas_df['Código'].str[:4]).agg({
+    receitas_categoria = receitas_df.groupby('nivel_1').agg({
         'Prev. Atualizada': 'sum',
         'Arrec. Total': 'sum'
-    }).reset_index()
+    }).rename_axis('Código').reset_index()
     
     receitas_categoria['diferenca'] = receitas_categoria['Arrec. Total'] - receitas_categoria['Prev. Atualizada']
     receitas_categoria['execucao_pct'] = (receitas_categoria['Arrec. Total'] / 
@@ -1143,30 +1437,32 @@ elif opcao == "Comparação Previsto vs Realizado":
     receitas_categoria = receitas_categoria.dropna(subset=['nome'])
     
     # Gráfico de comparação
-    fig_comparacao_receitas = go.Figure()
-    
-    fig_comparacao_receitas.add_trace(go.Bar(
-        name='Previsto',
-        x=receitas_categoria['nome'],
-        y=receitas_categoria['Prev. Atualizada'],
-        marker_color='lightblue'
-    ))
-    
-    fig_comparacao_receitas.add_trace(go.Bar(
-        name='Arrecadado',
-        x=receitas_categoria['nome'],
-        y=receitas_categoria['Arrec. Total'],
-        marker_color='darkblue'
-    ))
-    
-    fig_comparacao_receitas.update_layout(
-        title="Receitas: Previsto vs Arrecadado por Categoria",
-        barmode='group',
-        height=500,
-        xaxis_tickangle=-45
-    )
+    def montar_comparacao_receitas():
+        fig_comparacao_receitas = go.Figure()
+        
+        fig_comparacao_receitas.add_trace(go.Bar(
+            name='Previsto',
+            x=receitas_categoria['nome'],
+            y=em_reais(receitas_categoria['Prev. Atualizada']),
+            marker_color='lightblue'
+        ))
+        
+        fig_comparacao_receitas.add_trace(go.Bar(
+            name='Arrecadado',
+            x=receitas_categoria['nome'],
+            y=em_reais(receitas_categoria['Arrec. Total']),
+            marker_color='darkblue'
+        ))
+        
+        fig_comparacao_receitas.update_layout(
+            title="Receitas: Previsto vs Arrecadado por Categoria",
+            barmode='group',
+            height=500,
+            xaxis_tickangle=-45
+        )
+        return fig_comparacao_receitas
     
-    st.plotly_chart(fig_comparacao_receitas, use_container_width=True)
+    st.plotly_chart(load_figura('previsto_arrecadado', versao_arquivos, (), montar_comparacao_receitas), use_container_width=True)
     
     # Tabela de comparação
     st.subheader("📋 Análise Detalhada por Categoria")
@@ -1189,12 +1485,9 @@ elif opcao == "Análise por Função":
     st.header("🏛️ Análise das Despesas por Função de Governo")
     
     # Análise detalhada por função
-    funcoes_detalhadas = despesas_df.groupby(['Função', 'Nome da Função']).agg({
-        'Dotação Atual': 'sum',
-        'Empenhado até Hoje': 'sum',
-        'Liquidado até Hoje': 'sum',
-        'Pago até Hoje': 'sum'
-    }).reset_index()
+    funcoes_detalhadas = metricas['despesas_por_funcao'][[
+        'Função', 'Nome da Função', 'Dotação Atual', 'Empenhado até Hoje', 'Liquidado até Hoje', 'Pago até Hoje'
+    ]].copy()
     
     funcoes_detalhadas['execucao_orcamentaria'] = (funcoes_detalhadas['Empenhado até Hoje'] / 
                                                  funcoes_detalhadas['Dotação Atual'] * 100)
@@ -1202,94 +1495,108 @@ elif opcao == "Análise por Função":
                                                funcoes_detalhadas['Empenhado até Hoje'] * 100)
     
     # Filtrar funções com valores significativos
-    funcoes_principais = funcoes_detalhadas[funcoes_detalhadas['Empenhado até Hoje'] > 10000].copy()
+    funcoes_principais = funcoes_detalhadas[funcoes_detalhadas['Empenhado até Hoje'] > reais_para_centavos(10000)].copy()
     
     col1, col2 = st.columns(2)
     
     with col1:
         # Execução orçamentária por função
-        fig_exec_orc = px.bar(
-            funcoes_principais.sort_values('execucao_orcamentaria', ascending=True).tail(10),
-            x='execucao_orcamentaria',
-            y='Nome da Função',
-            orientation='h',
-            title="Execução Orçamentária por Função (%)",
-            labels={'execucao_orcamentaria': 'Execução (%)', 'Nome da Função': 'Função'},
-            color='execucao_orcamentaria',
-            color_continuous_scale='RdYlGn'
-        )
+        def montar_exec_orc():
+            fig_exec_orc = px.bar(
+                funcoes_principais.sort_values('execucao_orcamentaria', ascending=True).tail(10),
+                x='execucao_orcamentaria',
+                y='Nome da Função',
+                orientation='h',
+                title="Execução Orçamentária por Função (%)",
+                labels={'execucao_orcamentaria': 'Execução (%)', 'Nome da Função': 'Função'},
+                color='execucao_orcamentaria',
+                color_continuous_scale='RdYlGn'
+            )
+            return fig_exec_orc
         
-        st.plotly_chart(fig_exec_orc, use_container_width=True)
+        st.plotly_chart(load_figura('execucao_orcamentaria', versao_despesas, (), montar_exec_orc), use_container_width=True)
     
     with col2:
         # Execução financeira por função
-        fig_exec_fin = px.bar(
-            funcoes_principais.sort_values('execucao_financeira', ascending=True).tail(10),
-            x='execucao_financeira',
-            y='Nome da Função',
-            orientation='h',
-            title="Execução Financeira por Função (%)",
-            labels={'execucao_financeira': 'Pagamento (%)', 'Nome da Função': 'Função'},
-            color='execucao_financeira',
-            color_continuous_scale='Blues'
-        )
+        def montar_exec_fin():
+            fig_exec_fin = px.bar(
+                funcoes_principais.sort_values('execucao_financeira', ascending=True).tail(10),
+                x='execucao_financeira',
+                y='Nome da Função',
+                orientation='h',
+                title="Execução Financeira por Função (%)",
+                labels={'execucao_financeira': 'Pagamento (%)', 'Nome da Função': 'Função'},
+                color='execucao_financeira',
+                color_continuous_scale='Blues'
+            )
+            return fig_exec_fin
         
-        st.plotly_chart(fig_exec_fin, use_container_width=True)
+        st.plotly_chart(load_figura('execucao_financeira', versao_despesas, (), montar_exec_fin), use_container_width=True)
     
     # Análise dos principais gastos por função
     st.subheader("💰 Maiores Gastos por Área")
     
-    # Selecionar função para análise detalhada
-    funcao_selecionada = st.selectbox(
-        "Selecione uma função para análise detalhada:",
-        options=funcoes_principais.sort_values('Empenhado até Hoje', ascending=False)['Nome da Função'].tolist()
-    )
-    
-    if funcao_selecionada:
-        # Filtrar despesas da função selecionada
-        despesas_funcao = despesas_df[despesas_df['Nome da Função'] == funcao_selecionada]
-        
-        # Análise por subfunção
-        subfuncoes = despesas_funcao.groupby(['Subfunção', 'Nome da Subfunção']).agg({
-            'Empenhado até Hoje': 'sum',
-            'Liquidado até Hoje': 'sum',
-            'Pago até Hoje': 'sum'
-        }).reset_index()
+    # Só a análise da função escolhida roda de novo quando a seleção muda
+    @st.fragment
+    def analisar_funcao(opcoes):
+        """Subfunções e principais fornecedores da função selecionada"""
+        # Selecionar função para análise detalhada
+        funcao_selecionada = st.selectbox(
+            "Selecione uma função para análise detalhada:",
+            options=opcoes
+        )
         
-        if not subfuncoes.empty:
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                # Distribuição por subfunção
-                fig_subfuncao = px.pie(
-                    subfuncoes,
-                    values='Empenhado até Hoje',
-                    names='Nome da Subfunção',
-                    title=f"Distribuição de Gastos - {funcao_selecionada}"
-                )
-                st.plotly_chart(fig_subfuncao, use_container_width=True)
+        if funcao_selecionada:
+            # Agregados da função selecionada
+            subfuncoes = despesas_agregadas['subfuncao'].xs(funcao_selecionada, level='Nome da Função')[
+                ['Empenhado até Hoje', 'Liquidado até Hoje', 'Pago até Hoje']
+            ].reset_index()
             
-            with col2:
-                # Principais fornecedores da função
-                fornecedores_funcao = despesas_funcao.groupby('Nome Fornecedor')['Empenhado até Hoje'].sum().reset_index()
-                top_fornecedores = fornecedores_funcao.nlargest(8, 'Empenhado até Hoje')
+            if not subfuncoes.empty:
+                col1, col2 = st.columns(2)
                 
-                fig_fornecedores = px.bar(
-                    top_fornecedores,
-                    x='Empenhado até Hoje',
-                    y='Nome Fornecedor',
-                    orientation='h',
-                    title=f"Principais Fornecedores - {funcao_selecionada}",
-                    labels={'Empenhado até Hoje': 'Valor (R$)', 'Nome Fornecedor': 'Fornecedor'}
-                )
+                with col1:
+                    # Distribuição por subfunção
+                    def montar_subfuncoes():
+                        fig_subfuncao = px.pie(
+                            colunas_em_reais(subfuncoes, 'Empenhado até Hoje'),
+                            values='Empenhado até Hoje',
+                            names='Nome da Subfunção',
+                            title=f"Distribuição de Gastos - {funcao_selecionada}"
+                        )
+                        return fig_subfuncao
+                    
+                    st.plotly_chart(load_figura('subfuncoes', versao_despesas, (funcao_selecionada,), montar_subfuncoes), use_container_width=True)
                 
-                fig_fornecedores.update_layout(yaxis={'categoryorder': 'total ascending'})
-                st.plotly_chart(fig_fornecedores, use_container_width=True)
-    
+                with col2:
+                    # Principais fornecedores da função
+                    def montar_fornecedores():
+                        fornecedores_funcao = despesas_agregadas['funcao_fornecedor'].xs(
+                            funcao_selecionada, level='Nome da Função'
+                        )[['Nome Fornecedor', 'Empenhado até Hoje']]
+                        top_fornecedores = fornecedores_funcao.nlargest(8, 'Empenhado até Hoje')
+                        
+                        fig_fornecedores = px.bar(
+                            colunas_em_reais(top_fornecedores, 'Empenhado até Hoje'),
+                            x='Empenhado até Hoje',
+                            y='Nome Fornecedor',
+                            orientation='h',
+                            title=f"Principais Fornecedores - {funcao_selecionada}",
+                            labels={'Empenhado até Hoje': 'Valor (R$)', 'Nome Fornecedor': 'Fornecedor'}
+                        )
+                        
+                        fig_fornecedores.update_layout(yaxis={'categoryorder': 'total ascending'})
+                        return fig_fornecedores
+                    
+                    st.plotly_chart(load_figura('fornecedores_funcao', versao_despesas, (funcao_selecionada,), montar_fornecedores), use_container_width=True)
+    
+    analisar_funcao(funcoes_principais.sort_values('Empenhado até Hoje', ascending=False)['Nome da Função'].tolist())
+
     # Tabela resumo de todas as funções
     st.subheader("📊 Resumo por Função de Governo")
     
     resumo_funcoes = funcoes_detalhadas.copy()
+    resumo_funcoes['Função'] = resumo_funcoes['Função'].astype(str).str.zfill(2)
     resumo_funcoes['Dotação Atual'] = resumo_funcoes['Dotação Atual'].apply(format_currency)
     resumo_funcoes['Empenhado até Hoje'] = resumo_funcoes['Empenhado até Hoje'].apply(format_currency)
     resumo_funcoes['Liquidado até Hoje'] = resumo_funcoes['Liquidado até Hoje'].apply(format_currency)
@@ -1310,123 +1617,154 @@ elif opcao == "Detalhamento":
     tab1, tab2 = st.tabs(["📈 Receitas Detalhadas", "📉 Despesas Detalhadas"])
     
     with tab1:
-        st.subheader("Receitas - Busca e Filtros")
-        
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            valor_min_rec = st.number_input("Arrecadação mínima (R$)", min_value=0.0, value=0.0, key="rec_min")
-        
-        with col2:
-            busca_rec = st.text_input("Buscar por descrição", key="busca_rec")
-        
-        with col3:
-            apenas_com_arrecadacao = st.checkbox("Apenas com arrecadação", value=True)
-        
-        # Aplicar filtros às receitas
-        receitas_filtradas = receitas_df.copy()
-        
-        if valor_min_rec > 0:
-            receitas_filtradas = receitas_filtradas[receitas_filtradas['Arrec. Total'] >= valor_min_rec]
-        
-        if busca_rec:
-            receitas_filtradas = receitas_filtradas[
-                receitas_filtradas['Especificação'].str.contains(busca_rec, case=False, na=False)
-            ]
-        
-        if apenas_com_arrecadacao:
-            receitas_filtradas = receitas_filtradas[receitas_filtradas['Arrec. Total'] > 0]
-        
-        # Mostrar resultados das receitas
-        st.write(f"**📊 Resultados: {len(receitas_filtradas)} receitas encontradas**")
-        
-        if not receitas_filtradas.empty:
-            display_receitas = receitas_filtradas[['Código', 'Especificação', 'Prev. Atualizada', 'Arrec. Total']].copy()
-            display_receitas['Execução (%)'] = (display_receitas['Arrec. Total'] / 
-                                              display_receitas['Prev. Atualizada'] * 100).round(1)
-            
-            display_receitas['Prev. Atualizada'] = display_receitas['Prev. Atualizada'].apply(format_currency)
-            display_receitas['Arrec. Total'] = display_receitas['Arrec. Total'].apply(format_currency)
-            display_receitas['Execução (%)'] = display_receitas['Execução (%)'].astype(str) + '%'
+        @st.fragment
+        def detalhar_receitas():
+            """Busca, filtros e tabela paginada das receitas (roda de novo sozinho a cada filtro)"""
+            st.subheader("Receitas - Busca e Filtros")
             
-            display_receitas.columns = ['Código', 'Descrição', 'Previsto', 'Arrecadado', 'Execução (%)']
-            st.dataframe(display_receitas, use_container_width=True)
-            
-            # Estatísticas das receitas filtradas
             col1, col2, col3 = st.columns(3)
+            
             with col1:
-                st.metric("Total Filtrado", format_currency(receitas_filtradas['Arrec. Total'].sum()))
+                valor_min_rec = st.number_input("Arrecadação mínima (R$)", min_value=0.0, value=0.0, key="rec_min")
+            
             with col2:
-                st.metric("Maior Arrecadação", format_currency(receitas_filtradas['Arrec. Total'].max()))
+                busca_rec = st.text_input("Buscar por descrição", key="busca_rec")
+            
             with col3:
-                execucao_media = (receitas_filtradas['Arrec. Total'].sum() / 
-                                receitas_filtradas['Prev. Atualizada'].sum() * 100)
-                st.metric("Execução Média", f"{execucao_media:.1f}%")
-    
-    with tab2:
-        st.subheader("Despesas - Busca e Filtros")
-        
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            valor_min_desp = st.number_input("Valor mínimo (R$)", min_value=0.0, value=0.0, key="desp_min")
-        
-        with col2:
-            funcao_filtro = st.selectbox(
-                "Filtrar por função",
-                options=['Todas'] + sorted(despesas_df['Nome da Função'].dropna().unique().tolist()),
-                key="funcao_filtro"
-            )
-        
-        with col3:
-            fornecedor_filtro = st.text_input("Buscar fornecedor", key="fornecedor_filtro")
-        
-        with col4:
-            periodo_inicio = st.date_input("Data início", value=None, key="data_inicio")
-        
-        # Aplicar filtros às despesas
-        despesas_filtradas = despesas_df.copy()
-        
-        if valor_min_desp > 0:
-            despesas_filtradas = despesas_filtradas[despesas_filtradas['Empenhado até Hoje'] >= valor_min_desp]
-        
-        if funcao_filtro and funcao_filtro != 'Todas':
-            despesas_filtradas = despesas_filtradas[despesas_filtradas['Nome da Função'] == funcao_filtro]
-        
-        if fornecedor_filtro:
-            despesas_filtradas = despesas_filtradas[
-                despesas_filtradas['Nome Fornecedor'].str.contains(fornecedor_filtro, case=False, na=False)
-            ]
-        
-        if periodo_inicio:
-            despesas_filtradas = despesas_filtradas[despesas_filtradas['Data'] >= pd.Timestamp(periodo_inicio)]
-        
-        # Mostrar resultados das despesas
-        st.write(f"**📊 Resultados: {len(despesas_filtradas)} empenhos encontrados**")
-        
-        if not despesas_filtradas.empty:
-            display_despesas = despesas_filtradas[[
-                'Empenho', 'Data', 'Nome Fornecedor', 'Nome da Função', 
-                'Empenhado até Hoje', 'Liquidado até Hoje', 'Pago até Hoje'
-            ]].copy()
+                apenas_com_arrecadacao = st.checkbox("Apenas com arrecadação", value=True)
             
-            display_despesas['Empenhado até Hoje'] = display_despesas['Empenhado até Hoje'].apply(format_currency)
-            display_despesas['Liquidado até Hoje'] = display_despesas['Liquidado até Hoje'].apply(format_currency)
-            display_despesas['Pago até Hoje'] = display_despesas['Pago até Hoje'].apply(format_currency)
+            # Aplicar filtros às receitas (a busca pelo índice invertido) como máscaras das linhas
+            mascaras_receitas = []
             
-            display_despesas.columns = ['Empenho', 'Data', 'Fornecedor', 'Função', 'Empenhado', 'Liquidado', 'Pago']
-            st.dataframe(display_despesas, use_container_width=True)
+            if busca_rec:
+                mascaras_receitas.append(mascara_posicoes(len(receitas_df), buscar(receitas_executadas['busca'], busca_rec)))
+            
+            if valor_min_rec > 0:
+                mascaras_receitas.append((receitas_df['Arrec. Total'] >= reais_para_centavos(valor_min_rec)).to_numpy())
+            
+            if apenas_com_arrecadacao:
+                mascaras_receitas.append((receitas_df['Arrec. Total'] > 0).to_numpy())
+            
+            selecao_receitas = combinar_mascaras(mascaras_receitas, len(receitas_df))
+            receitas_filtradas = receitas_df[selecao_receitas]
+            
+            # Mostrar resultados das receitas
+            st.write(f"**📊 Resultados: {len(receitas_filtradas)} receitas encontradas**")
+            
+            if not receitas_filtradas.empty:
+                def preparar_receitas(pagina):
+                    """Formata só as receitas da página"""
+                    display_receitas = pagina[['Código', 'Especificação', 'Prev. Atualizada', 'Arrec. Total']].copy()
+                    display_receitas['Execução (%)'] = (display_receitas['Arrec. Total'] / 
+                                                      display_receitas['Prev. Atualizada'] * 100).round(1)
+                    
+                    display_receitas['Prev. Atualizada'] = display_receitas['Prev. Atualizada'].apply(format_currency)
+                    display_receitas['Arrec. Total'] = display_receitas['Arrec. Total'].apply(format_currency)
+                    display_receitas['Execução (%)'] = display_receitas['Execução (%)'].astype(str) + '%'
+                    
+                    display_receitas.columns = ['Código', 'Descrição', 'Previsto', 'Arrecadado', 'Execução (%)']
+                    return display_receitas
+                
+                mostrar_tabela_paginada(
+                    receitas_df, selecao_receitas, load_ordens_receitas(versao_dados(RECEITAS_EXECUTADAS.arquivo)),
+                    preparar_receitas, chave="receitas"
+                )
+                
+                # Estatísticas das receitas filtradas
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("Total Filtrado", format_currency(receitas_filtradas['Arrec. Total'].sum()))
+                with col2:
+                    st.metric("Maior Arrecadação", format_currency(receitas_filtradas['Arrec. Total'].max()))
+                with col3:
+                    execucao_media = (receitas_filtradas['Arrec. Total'].sum() / 
+                                    receitas_filtradas['Prev. Atualizada'].sum() * 100)
+                    st.metric("Execução Média", f"{execucao_media:.1f}%")
+        
+        detalhar_receitas()
+
+    with tab2:
+        @st.fragment
+        def detalhar_despesas():
+            """Filtros e tabela paginada das despesas (roda de novo sozinho a cada filtro)"""
+            st.subheader("Despesas - Busca e Filtros")
+            
+            col1, col2, col3, col4 = st.columns(4)
             
-            # Estatísticas das despesas filtradas
-            col1, col2, col3 = st.columns(3)
             with col1:
-                st.metric("Total Empenhado", format_currency(despesas_filtradas['Empenhado até Hoje'].sum()))
+                valor_min_desp = st.number_input("Valor mínimo (R$)", min_value=0.0, value=0.0, key="desp_min")
+            
             with col2:
-                st.metric("Total Pago", format_currency(despesas_filtradas['Pago até Hoje'].sum()))
+                funcao_filtro = st.selectbox(
+                    "Filtrar por função",
+                    options=['Todas'] + sorted(metricas['despesas_por_funcao']['Nome da Função'].dropna().unique().tolist()),
+                    key="funcao_filtro"
+                )
+            
             with col3:
-                execucao_pagamento = (despesas_filtradas['Pago até Hoje'].sum() / 
-                                    despesas_filtradas['Empenhado até Hoje'].sum() * 100)
-                st.metric("% Pago", f"{execucao_pagamento:.1f}%")
+                fornecedor_filtro = st.text_input("Buscar fornecedor", key="fornecedor_filtro")
+            
+            with col4:
+                periodo_inicio = st.date_input("Data início", value=None, key="data_inicio")
+            
+            # Aplicar filtros às despesas (única página que precisa das linhas): uma máscara
+            # em cache por filtro ativo, combinadas por E bit a bit
+            despesas_df = load_despesas_detalhadas(versao_despesas)
+            filtros_ativos = []
+            
+            if valor_min_desp > 0:
+                filtros_ativos.append(('valor_minimo', reais_para_centavos(valor_min_desp)))
+            
+            if funcao_filtro and funcao_filtro != 'Todas':
+                filtros_ativos.append(('funcao', funcao_filtro))
+            
+            if fornecedor_filtro:
+                filtros_ativos.append(('fornecedor', fornecedor_filtro))
+            
+            if periodo_inicio:
+                filtros_ativos.append(('data_inicio', periodo_inicio))
+            
+            selecao_despesas = combinar_mascaras(
+                [mascara_despesas(versao_despesas, filtro, valor) for filtro, valor in filtros_ativos],
+                len(despesas_df)
+            )
+            total_filtrado = int(selecao_despesas.sum())
+            
+            # Mostrar resultados das despesas
+            st.write(f"**📊 Resultados: {total_filtrado} empenhos encontrados**")
+            
+            if total_filtrado:
+                def preparar_despesas(pagina):
+                    """Formata só os empenhos da página"""
+                    display_despesas = pagina[[
+                        'Empenho', 'Data', 'Nome Fornecedor', 'Nome da Função', 
+                        'Empenhado até Hoje', 'Liquidado até Hoje', 'Pago até Hoje'
+                    ]].copy()
+                    
+                    display_despesas['Empenhado até Hoje'] = display_despesas['Empenhado até Hoje'].apply(format_currency)
+                    display_despesas['Liquidado até Hoje'] = display_despesas['Liquidado até Hoje'].apply(format_currency)
+                    display_despesas['Pago até Hoje'] = display_despesas['Pago até Hoje'].apply(format_currency)
+                    
+                    display_despesas.columns = ['Empenho', 'Data', 'Fornecedor', 'Função', 'Empenhado', 'Liquidado', 'Pago']
+                    return display_despesas
+                
+                mostrar_tabela_paginada(
+                    despesas_df, selecao_despesas, load_ordens_despesas(versao_despesas), preparar_despesas, chave="despesas"
+                )
+                
+                # Estatísticas das despesas filtradas, somadas pela máscara sem copiar as linhas
+                total_empenhado = despesas_df['Empenhado até Hoje'].to_numpy()[selecao_despesas].sum()
+                total_pago = despesas_df['Pago até Hoje'].to_numpy()[selecao_despesas].sum()
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("Total Empenhado", format_currency(total_empenhado))
+                with col2:
+                    st.metric("Total Pago", format_currency(total_pago))
+                with col3:
+                    execucao_pagamento = total_pago / total_empenhado * 100
+                    st.metric("% Pago", f"{execucao_pagamento:.1f}%")
+        
+        detalhar_despesas()
 
 # Insights finais
 st.divider()
@@ -1438,50 +1776,49 @@ with col1:
     st.subheader("🎯 Indicadores Principais")
     
     # Comparação LOA vs Execução
-    if execucao_vs_loa > 90:
+    if metricas['execucao_vs_loa'] > 90:
         status_loa = "🟢 Excelente execução da LOA"
-    elif execucao_vs_loa > 70:
+    elif metricas['execucao_vs_loa'] > 70:
         status_loa = "🟡 Boa execução da LOA"
     else:
         status_loa = "🔴 Execução baixa da LOA"
     
-    st.write(f"**LOA vs Execução**: {execucao_vs_loa:.1f}% - {status_loa}")
+    st.write(f"**LOA vs Execução**: {metricas['execucao_vs_loa']:.1f}% - {status_loa}")
     
     # Status da execução de receitas (portal transparência)
-    if percentual_execucao_receitas > 90:
+    if metricas['percentual_execucao_receitas'] > 90:
         status_rec = "🟢 Excelente execução"
-    elif percentual_execucao_receitas > 70:
+    elif metricas['percentual_execucao_receitas'] > 70:
         status_rec = "🟡 Boa execução"
     else:
         status_rec = "🔴 Execução baixa"
     
-    st.write(f"**Receitas (Portal)**: {percentual_execucao_receitas:.1f}% - {status_rec}")
+    st.write(f"**Receitas (Portal)**: {metricas['percentual_execucao_receitas']:.1f}% - {status_rec}")
     
     # Status do resultado orçamentário
-    if resultado_orcamentario > 0:
+    if metricas['resultado_orcamentario'] > 0:
         status_resultado = "🟢 Superávit orçamentário"
     else:
         status_resultado = "🔴 Déficit orçamentário"
     
-    st.write(f"**Resultado**: {format_currency(resultado_orcamentario)} - {status_resultado}")
+    st.write(f"**Resultado**: {format_currency(metricas['resultado_orcamentario'])} - {status_resultado}")
     
     # Liquidez dos empenhos
-    liquidez = (total_pago_despesas / total_empenhado_despesas * 100) if total_empenhado_despesas > 0 else 0
-    if liquidez > 80:
+    if metricas['liquidez'] > 80:
         status_liquidez = "🟢 Alta liquidez"
-    elif liquidez > 60:
+    elif metricas['liquidez'] > 60:
         status_liquidez = "🟡 Liquidez moderada"
     else:
         status_liquidez = "🔴 Baixa liquidez"
     
-    st.write(f"**Liquidez**: {liquidez:.1f}% - {status_liquidez}")
+    st.write(f"**Liquidez**: {metricas['liquidez']:.1f}% - {status_liquidez}")
 
 with col2:
     st.subheader("📈 Principais Achados")
     
     # Comparação LOA vs Portal
-    diferenca_loa_portal = total_arrecadado_receitas - total_loa_receitas
-    if abs(diferenca_loa_portal) > total_loa_receitas * 0.1:  # Diferença > 10%
+    diferenca_loa_portal = metricas['total_arrecadado_receitas'] - metricas['total_loa_receitas']
+    if abs(diferenca_loa_portal) > metricas['total_loa_receitas'] * 0.1:  # Diferença > 10%
         if diferenca_loa_portal > 0:
             st.success(f"📈 **Arrecadação superou LOA** em {format_currency(diferenca_loa_portal)}")
         else:
@@ -1494,13 +1831,15 @@ with col2:
     st.write(f"💰 **Maior receita**: {maior_receita['Especificação'][:40]}... - {format_currency(maior_receita['Arrec. Total'])}")
     
     # Função com maior gasto
-    funcao_maior_gasto = despesas_df.groupby('Nome da Função')['Empenhado até Hoje'].sum().idxmax()
-    valor_maior_gasto = despesas_df.groupby('Nome da Função')['Empenhado até Hoje'].sum().max()
+    maior_gasto = metricas['despesas_por_funcao'].loc[metricas['despesas_por_funcao']['Empenhado até Hoje'].idxmax()]
+    funcao_maior_gasto = maior_gasto['Nome da Função']
+    valor_maior_gasto = maior_gasto['Empenhado até Hoje']
     st.write(f"🏛️ **Função com maior gasto**: {funcao_maior_gasto} - {format_currency(valor_maior_gasto)}")
     
     # Maior fornecedor
-    maior_fornecedor = despesas_df.groupby('Nome Fornecedor')['Empenhado até Hoje'].sum().idxmax()
-    valor_maior_fornecedor = despesas_df.groupby('Nome Fornecedor')['Empenhado até Hoje'].sum().max()
+    maior = metricas['despesas_por_fornecedor'].loc[metricas['despesas_por_fornecedor']['Empenhado até Hoje'].idxmax()]
+    maior_fornecedor = maior['Nome Fornecedor']
+    valor_maior_fornecedor = maior['Empenhado até Hoje']
     st.write(f"🏢 **Maior fornecedor**: {maior_fornecedor[:25]}... - {format_currency(valor_maior_fornecedor)}")
 
 # Rodapé
@@ -1,9 +1,28 @@
 import streamlit as st
 import csv
+import heapq
 import json
 from collections import defaultdict
 import math
 
+from orcamento.arquivos import detectar_codificacao, versao_dados
+from orcamento.artefatos import Artefatos, versao_codigo
+from orcamento.busca import buscar, indexar_textos
+from orcamento.classificacao import (
+    FUNDEB,
+    TRANSFERENCIAS,
+    TRANSFERENCIAS_ESTADO,
+    TRANSFERENCIAS_UNIAO,
+    TRIBUTARIAS,
+    indexar_prefixos,
+    posicoes_prefixo,
+)
+from orcamento.colunar import agregar_categorias, montar_colunas
+from orcamento.conversao import CENTAVOS_POR_REAL, numero_br
+from orcamento.esquemas import ESTRUTURA_LOA, NIVEIS_RECEITA, RECEITAS_LOA
+from orcamento.metricas import Metricas
+from orcamento.paginacao import TAMANHO_PAGINA, numero_de_paginas, ordenar_coluna, posicoes_da_pagina, selecionar_ordem
+
 # Importações para gráficos interativos (Plotly)
 try:
     import plotly.express as px
@@ -23,18 +42,11 @@ st.set_page_config(
 # Função para carregar dados CSV sem pandas
 def load_csv_data(filename):
     """Carrega dados CSV usando apenas bibliotecas padrão"""
-    data = []
-    try:
-        with open(filename, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file, delimiter=';')
-            for row in reader:
-                data.append(row)
-    except UnicodeDecodeError:
-        with open(filename, 'r', encoding='latin-1') as file:
-            reader = csv.DictReader(file, delimiter=';')
-            for row in reader:
-                data.append(row)
-    return data
+    # Codificação decidida pelo BOM/amostra de bytes: o arquivo é decodificado uma vez
+    # e 'utf-8-sig' evita que o BOM vá parar no nome da primeira coluna
+    with open(filename, 'r', encoding=detectar_codificacao(filename), newline='') as file:
+        reader = csv.DictReader(file, delimiter=';')
+        return list(reader)
 
 # Função para formatar moeda
 def format_currency(value):
@@ -48,10 +60,8 @@ def format_currency(value):
 # Função para converter string para float
 def safe_float(value):
     """Converte string para float de forma segura"""
-    try:
-        return float(str(value).replace(',', '.'))
-    except:
-        return 0.0
+    valor = numero_br(value)
+    return valor if valor is not None else 0.0
 
 # Função para criar gráfico simples usando Streamlit
 def criar_grafico_simples(labels, values, title):
@@ -347,25 +357,40 @@ def criar_grafico_sunburst_interativo(labels, parents, values, title, colors=Non
     
     return fig
 
+# Tabelas colunares, índices, agregados e figuras também ficam no armazém em disco,
+# chaveados pela versão dos dados e do código: depois de um reinício, são lidos de lá
+artefatos = Artefatos(versao_codigo(__file__))
+
+# Cache chaveado pela versão (conteúdo) do arquivo: só recarrega quando a planilha muda.
+# A planilha vira uma tabela colunar (orcamento/colunar.py), com os valores convertidos
+# para centavos uma única vez; cache_resource compartilha as mesmas colunas entre as
+# sessões, sem cópia, e as páginas só leem as colunas pelas posições das linhas
+@st.cache_resource
+def carregar_planilha(esquema, versao):
+    """Carrega as colunas declaradas no esquema da planilha CSV na versão informada"""
+    return artefatos.carregar(
+        'planilha', (esquema.nome, versao),
+        lambda: montar_colunas(load_csv_data(esquema.arquivo), esquema),
+    )
+
 # Função para carregar dados dinamicamente
-@st.cache_data(ttl=60)  # Cache por 60 segundos para permitir atualizações
 def carregar_dados_dinamicos():
-    """Carrega dados dos arquivos CSV com cache de 60 segundos"""
+    """Carrega dados dos arquivos CSV, relendo apenas os que mudaram"""
     import os
     from datetime import datetime
     
     try:
-        receitas_orcadas = load_csv_data("download-123842.557.csv")
-        estrutura_receitas = load_csv_data("download-123701.452.csv")
+        receitas_orcadas = carregar_planilha(RECEITAS_LOA, versao_dados(RECEITAS_LOA.arquivo))
+        estrutura_receitas = carregar_planilha(ESTRUTURA_LOA, versao_dados(ESTRUTURA_LOA.arquivo))
         
-        if not receitas_orcadas or not estrutura_receitas:
+        if not receitas_orcadas.total or not estrutura_receitas.total:
             st.error("Erro ao carregar os dados. Verifique os arquivos CSV.")
             st.stop()
         
         # Verificar quando os arquivos foram modificados pela última vez
         try:
-            stat_receitas = os.stat("download-123842.557.csv")
-            stat_estrutura = os.stat("download-123701.452.csv")
+            stat_receitas = os.stat(RECEITAS_LOA.arquivo)
+            stat_estrutura = os.stat(ESTRUTURA_LOA.arquivo)
             ultima_modificacao = max(stat_receitas.st_mtime, stat_estrutura.st_mtime)
             data_modificacao = datetime.fromtimestamp(ultima_modificacao).strftime("%d/%m/%Y %H:%M:%S")
         except:
@@ -394,6 +419,12 @@ st.markdown("""
 
 with st.spinner(""):
     receitas_orcadas, estrutura_receitas, data_modificacao = carregar_dados_dinamicos()
+    versao_receitas = versao_dados(RECEITAS_LOA.arquivo)
+
+# Colunas das receitas lidas pelas páginas (TOTOR em centavos)
+codigos_receitas = receitas_orcadas.textos['CODRE']
+nomes_receitas = receitas_orcadas.textos['NOME']
+totor_receitas = receitas_orcadas.valores['TOTOR']
 
 # Indicador de sucesso
 st.markdown("""
@@ -413,55 +444,157 @@ st.markdown("""
 
 
 
-# Função para detectar códigos dinamicamente
-def detectar_codigos_dinamicos():
-    """Detecta automaticamente todos os códigos de receita nas planilhas"""
-    codigos_encontrados = set()
-    for row in receitas_orcadas:
-        codigo = row.get('CODRE', '')
-        if codigo:
-            codigos_encontrados.add(codigo[:4])  # Primeiros 4 dígitos
-    return sorted(list(codigos_encontrados))
+# Índice de prefixos do CODRE, montado uma vez por versão das receitas
+@st.cache_resource
+def indexar_receitas(versao_receitas):
+    """Ordena os códigos das receitas para achar as linhas de um prefixo por busca binária"""
+    return artefatos.carregar('indice', (versao_receitas,), lambda: indexar_prefixos(codigos_receitas))
+
+indice_receitas = indexar_receitas(versao_receitas)
+
+# Índice invertido das descrições (sem acentos e maiúsculas), também por versão
+@st.cache_resource
+def indexar_descricoes(versao_receitas):
+    """Indexa o NOME das receitas por trigramas e palavras para a busca do Detalhamento"""
+    return artefatos.carregar('busca', (versao_receitas,), lambda: indexar_textos(nomes_receitas))
+
+# Colunas ordenáveis do Detalhamento, ordenadas uma vez por versão das receitas
+@st.cache_resource
+def ordenar_receitas(versao_receitas):
+    """Ordem das posições das receitas por valor, código e descrição"""
+    return artefatos.carregar('ordens', (versao_receitas,), lambda: {
+        'Valor': ordenar_coluna(totor_receitas),
+        'Código': ordenar_coluna(codigos_receitas),
+        'Descrição': ordenar_coluna(nomes_receitas),
+    })
+
+# Figuras montadas uma vez e compartilhadas entre sessões, chaveadas pela visão, pela
+# versão das receitas e pelos parâmetros; passando de FIGURAS_EM_CACHE, saem as usadas
+# há mais tempo. Fica em cache só a especificação (fig.to_dict()), e cada chamada monta
+# uma figura nova, que a sessão pode alterar sem afetar as outras (cada especificação
+# também fica no armazém de artefatos em disco)
+FIGURAS_EM_CACHE = 64
+
+@st.cache_resource(show_spinner=False, max_entries=FIGURAS_EM_CACHE)
+def load_especificacao(visao, versao, parametros, _montar):
+    """Especificação da figura de uma visão, montada por _montar() só se não estiver em cache
+    
+    _montar fica fora da chave: tudo o que ele lê precisa depender só da versão
+    das receitas e dos parâmetros.
+    """
+    return artefatos.carregar('figura', (visao, versao, parametros), lambda: _montar().to_dict())
+
+def load_figura(visao, versao, parametros, _montar):
+    """Figura nova da visão, montada a partir da especificação em cache"""
+    return go.Figure(load_especificacao(visao, versao, parametros, _montar))
+
+def filtrar_receitas(prefixos):
+    """Posições das receitas cujo CODRE começa com algum dos prefixos, na ordem da planilha"""
+    return posicoes_prefixo(indice_receitas, prefixos)
+
+# Categorias somadas pelos dashboards: {nome: prefixos do CODRE}
+CATEGORIAS_RECEITA = {
+    'total': '',
+    'tributarias': TRIBUTARIAS,
+    'transferencias': TRANSFERENCIAS,
+    'uniao': TRANSFERENCIAS_UNIAO,
+    'estado': TRANSFERENCIAS_ESTADO,
+    'fundeb': FUNDEB,
+    'IPTU': '1112.5',
+    'ITBI': '1112.53',
+    'IRRF': '1113',
+    'ISSQN': '1114',
+    'Taxas': ('1121', '1122'),
+}
 
 # Função para calcular dados dinamicamente
-def calcular_dados_dinamicos():
-    """Calcula todos os dados dinamicamente baseado nos arquivos CSV"""
-    # Total do orçamento
-    total_orcamento = sum(safe_float(row.get('TOTOR', 0)) for row in receitas_orcadas)
-    
-    # Detectar códigos dinamicamente
-    codigos_tributarios = ['1112', '1113', '1114', '1121', '1122']
-    codigos_transferencias = ['1711', '1712', '1713', '1714', '1716', '1721', '1722', '1723', '1724', '1751']
-    
-    # Calcular categorias principais dinamicamente
-    receitas_tributarias = sum(
-        safe_float(row.get('TOTOR', 0)) 
-        for row in receitas_orcadas 
-        if row.get('CODRE', '').startswith(tuple(codigos_tributarios))
-    )
-    
-    transferencias = sum(
-        safe_float(row.get('TOTOR', 0)) 
-        for row in receitas_orcadas 
-        if row.get('CODRE', '').startswith(tuple(codigos_transferencias))
-    )
-    
-    outras_receitas = total_orcamento - receitas_tributarias - transferencias
-    
-    return {
-        'total_orcamento': total_orcamento,
-        'receitas_tributarias': receitas_tributarias,
-        'transferencias': transferencias,
-        'outras_receitas': outras_receitas,
-        'codigos_detectados': detectar_codigos_dinamicos()
-    }
-
-# Calcular dados dinamicamente
-dados = calcular_dados_dinamicos()
-total_orcamento = dados['total_orcamento']
-receitas_tributarias = dados['receitas_tributarias']
-transferencias = dados['transferencias']
-outras_receitas = dados['outras_receitas']
+@st.cache_data
+def calcular_dados_dinamicos(versao_receitas, _receitas):
+    """Somas em centavos por categoria e por grupo de código das receitas (em cache por versão das receitas)"""
+    def montar():
+        # Todas as categorias e os grupos de 4 dígitos numa única passada pelas colunas (em centavos)
+        somas, grupos = agregar_categorias(
+            _receitas.textos['CODRE'], _receitas.valores['TOTOR'], CATEGORIAS_RECEITA, NIVEIS_RECEITA['nivel_1']
+        )
+        return {'categorias': somas, 'grupos': grupos}
+    
+    return artefatos.carregar('dados_dinamicos', (versao_receitas,), montar)
+
+# Métricas sob demanda: cada nó é calculado na primeira vez que uma página pede por
+# ele, com as dependências declaradas nos parâmetros; a planilha é o nó de partida e
+# calcular_dados_dinamicos roda (ou sai do cache) uma única vez por execução. Os
+# valores ficam em centavos (somas e diferenças exatas); as páginas só dividem por
+# CENTAVOS_POR_REAL ao formatar ou montar os gráficos
+metricas = Metricas()
+
+@metricas.metrica
+def receitas():
+    """Receitas da LOA em colunas, como em carregar_planilha"""
+    return carregar_planilha(RECEITAS_LOA, versao_receitas)
+
+@metricas.metrica
+def dados_dinamicos(receitas):
+    return calcular_dados_dinamicos(versao_receitas, receitas)
+
+@metricas.metrica
+def categorias(dados_dinamicos):
+    """Soma de cada categoria de CATEGORIAS_RECEITA, em centavos"""
+    return dados_dinamicos['categorias']
+
+@metricas.metrica
+def grupos(dados_dinamicos):
+    """Soma de cada grupo de 4 dígitos do CODRE, em centavos"""
+    return dados_dinamicos['grupos']
+
+@metricas.metrica
+def total_orcamento(categorias):
+    return categorias['total']
+
+@metricas.metrica
+def receitas_tributarias(categorias):
+    return categorias['tributarias']
+
+@metricas.metrica
+def transferencias(categorias):
+    return categorias['transferencias']
+
+@metricas.metrica
+def outras_receitas(total_orcamento, receitas_tributarias, transferencias):
+    return total_orcamento - receitas_tributarias - transferencias
+
+@metricas.metrica
+def codigos_detectados(grupos):
+    return sorted(grupos)
+
+# Nomes legíveis dos grupos de código (Análise por Categoria e Códigos Detectados)
+codigo_nomes = {
+    '1112': 'Impostos sobre Patrimônio',
+    '1113': 'Impostos sobre Renda',
+    '1114': 'Impostos sobre Serviços',
+    '1121': 'Taxas pelo Poder de Polícia',
+    '1122': 'Taxas pelos Serviços',
+    '1241': 'Contribuições de Melhoria',
+    '1311': 'Exploração do Patrimônio',
+    '1321': 'Remuneração de Depósitos',
+    '1611': 'Serviços Administrativos',
+    '1699': 'Outros Serviços',
+    '1711': 'Transferências da União',
+    '1712': 'Transferências da União - Outras',
+    '1713': 'Transferências da União - SUS',
+    '1714': 'Transferências da União - Educação',
+    '1716': 'Transferências da União - Assistência',
+    '1719': 'Outras Transferências da União',
+    '1721': 'Transferências do Estado',
+    '1722': 'Transferências do Estado - Outras',
+    '1723': 'Transferências do Estado - SUS',
+    '1724': 'Transferências do Estado - Educação',
+    '1729': 'Outras Transferências do Estado',
+    '1751': 'FUNDEB',
+    '1911': 'Multas Administrativas',
+    '1922': 'Restituições',
+    '1999': 'Outras Receitas Correntes',
+    '2213': 'Alienação de Bens'
+}
 
 # Sidebar moderna
 st.sidebar.markdown("""
@@ -478,9 +611,9 @@ st.sidebar.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-# Botão para forçar atualização dos dados
-if st.sidebar.button("🔄 Atualizar Dados", help="Força a atualização dos dados das planilhas"):
-    st.cache_data.clear()
+# Botão para verificar atualizações: as versões dos arquivos são conferidas a cada
+# execução, então basta executar de novo (só planilhas alteradas são relidas)
+if st.sidebar.button("🔄 Atualizar Dados", help="Relê as planilhas que foram alteradas"):
     st.rerun()
 
 # Informações sobre os dados com cards modernos
@@ -493,18 +626,18 @@ st.sidebar.markdown("""
 # Métricas da sidebar
 col1, col2 = st.sidebar.columns(2)
 with col1:
-    st.metric("📊 Receitas", len(receitas_orcadas))
+    st.metric("📊 Receitas", receitas_orcadas.total)
 with col2:
-    st.metric("📋 Categorias", len(estrutura_receitas))
+    st.metric("📋 Categorias", estrutura_receitas.total)
 
-st.sidebar.metric("💰 Orçamento Total", format_currency(total_orcamento))
+st.sidebar.metric("💰 Orçamento Total", format_currency(metricas['total_orcamento'] / CENTAVOS_POR_REAL))
 
 # Mostrar quando os dados foram carregados
 st.sidebar.markdown(f"""
 <div class="info-box" style="margin: 1rem 0;">
     <div style="font-weight: 600; margin-bottom: 0.5rem;">📅 Dados Carregados</div>
-    <div style="font-size: 0.9rem;">{len(receitas_orcadas)} receitas orçadas</div>
-    <div style="font-size: 0.9rem;">{len(estrutura_receitas)} categorias</div>
+    <div style="font-size: 0.9rem;">{receitas_orcadas.total} receitas orçadas</div>
+    <div style="font-size: 0.9rem;">{estrutura_receitas.total} categorias</div>
 </div>
 """, unsafe_allow_html=True)
 
@@ -517,11 +650,10 @@ st.sidebar.markdown(f"""
 """, unsafe_allow_html=True)
 
 # Mostrar códigos detectados dinamicamente
-dados_atualizados = calcular_dados_dinamicos()
 st.sidebar.markdown(f"""
 <div class="info-box" style="margin: 1rem 0;">
     <div style="font-weight: 600; margin-bottom: 0.5rem;">🔍 Códigos Detectados</div>
-    <div style="font-size: 0.9rem;">{len(dados_atualizados['codigos_detectados'])} categorias únicas</div>
+    <div style="font-size: 0.9rem;">{len(metricas['codigos_detectados'])} categorias únicas</div>
 </div>
 """, unsafe_allow_html=True)
 
@@ -747,9 +879,6 @@ if opcao == "Visão Geral":
     </div>
     """, unsafe_allow_html=True)
     
-    # Recalcular dados dinamicamente
-    dados_atualizados = calcular_dados_dinamicos()
-    
     # Métricas principais com cards modernos
     st.markdown("""
     <div style="margin: 2rem 0;">
@@ -766,40 +895,40 @@ if opcao == "Visão Geral":
         <div class="metric-card" style="text-align: center;">
             <div style="font-size: 2rem; margin-bottom: 0.5rem;">💰</div>
             <div style="font-size: 1.2rem; font-weight: 600; margin-bottom: 0.5rem;">Orçamento Total</div>
-            <div style="font-size: 1.5rem; font-weight: 700; margin-bottom: 0.5rem;">{format_currency(dados_atualizados['total_orcamento'])}</div>
+            <div style="font-size: 1.5rem; font-weight: 700; margin-bottom: 0.5rem;">{format_currency(metricas['total_orcamento'] / CENTAVOS_POR_REAL)}</div>
             <div style="font-size: 0.9rem; opacity: 0.9;">Valor total previsto</div>
         </div>
         """, unsafe_allow_html=True)
     
     with col2:
-        percent_trib = (dados_atualizados['receitas_tributarias']/dados_atualizados['total_orcamento']*100) if dados_atualizados['total_orcamento'] > 0 else 0
+        percent_trib = (metricas['receitas_tributarias']/metricas['total_orcamento']*100) if metricas['total_orcamento'] > 0 else 0
         st.markdown(f"""
         <div class="metric-card" style="text-align: center;">
             <div style="font-size: 2rem; margin-bottom: 0.5rem;">🏛️</div>
             <div style="font-size: 1.2rem; font-weight: 600; margin-bottom: 0.5rem;">Receitas Tributárias</div>
-            <div style="font-size: 1.5rem; font-weight: 700; margin-bottom: 0.5rem;">{format_currency(dados_atualizados['receitas_tributarias'])}</div>
+            <div style="font-size: 1.5rem; font-weight: 700; margin-bottom: 0.5rem;">{format_currency(metricas['receitas_tributarias'] / CENTAVOS_POR_REAL)}</div>
             <div style="font-size: 0.9rem; opacity: 0.9;">{percent_trib:.1f}% do total</div>
         </div>
         """, unsafe_allow_html=True)
     
     with col3:
-        percent_transf = (dados_atualizados['transferencias']/dados_atualizados['total_orcamento']*100) if dados_atualizados['total_orcamento'] > 0 else 0
+        percent_transf = (metricas['transferencias']/metricas['total_orcamento']*100) if metricas['total_orcamento'] > 0 else 0
         st.markdown(f"""
         <div class="metric-card" style="text-align: center;">
             <div style="font-size: 2rem; margin-bottom: 0.5rem;">🔄</div>
             <div style="font-size: 1.2rem; font-weight: 600; margin-bottom: 0.5rem;">Transferências</div>
-            <div style="font-size: 1.5rem; font-weight: 700; margin-bottom: 0.5rem;">{format_currency(dados_atualizados['transferencias'])}</div>
+            <div style="font-size: 1.5rem; font-weight: 700; margin-bottom: 0.5rem;">{format_currency(metricas['transferencias'] / CENTAVOS_POR_REAL)}</div>
             <div style="font-size: 0.9rem; opacity: 0.9;">{percent_transf:.1f}% do total</div>
         </div>
         """, unsafe_allow_html=True)
     
     with col4:
-        percent_outras = (dados_atualizados['outras_receitas']/dados_atualizados['total_orcamento']*100) if dados_atualizados['total_orcamento'] > 0 else 0
+        percent_outras = (metricas['outras_receitas']/metricas['total_orcamento']*100) if metricas['total_orcamento'] > 0 else 0
         st.markdown(f"""
         <div class="metric-card" style="text-align: center;">
             <div style="font-size: 2rem; margin-bottom: 0.5rem;">📋</div>
             <div style="font-size: 1.2rem; font-weight: 600; margin-bottom: 0.5rem;">Outras Receitas</div>
-            <div style="font-size: 1.5rem; font-weight: 700; margin-bottom: 0.5rem;">{format_currency(dados_atualizados['outras_receitas'])}</div>
+            <div style="font-size: 1.5rem; font-weight: 700; margin-bottom: 0.5rem;">{format_currency(metricas['outras_receitas'] / CENTAVOS_POR_REAL)}</div>
             <div style="font-size: 0.9rem; opacity: 0.9;">{percent_outras:.1f}% do total</div>
         </div>
         """, unsafe_allow_html=True)
@@ -829,15 +958,18 @@ if opcao == "Visão Geral":
         
         # Criar dados para o gráfico
         labels = ['Receitas Tributárias', 'Transferências', 'Outras Receitas']
-        values = [dados_atualizados['receitas_tributarias'], dados_atualizados['transferencias'], dados_atualizados['outras_receitas']]
+        values = [metricas['receitas_tributarias'], metricas['transferencias'], metricas['outras_receitas']]
+        values_reais = [value / CENTAVOS_POR_REAL for value in values]
         
         # Gráfico de pizza interativo
-        fig_pizza = criar_grafico_pizza_interativo(
-            labels, values, 
-            "🍰 Composição do Orçamento por Categoria",
-            colors=['#667eea', '#764ba2', '#f093fb']
-        )
-        st.plotly_chart(fig_pizza, use_container_width=True)
+        def montar_pizza():
+            return criar_grafico_pizza_interativo(
+                labels, values_reais, 
+                "🍰 Composição do Orçamento por Categoria",
+                colors=['#667eea', '#764ba2', '#f093fb']
+            )
+        
+        st.plotly_chart(load_figura('composicao', versao_receitas, (), montar_pizza), use_container_width=True)
         
         # Mostrar dados em formato de tabela com badges
         st.markdown("""
@@ -847,7 +979,7 @@ if opcao == "Visão Geral":
         """, unsafe_allow_html=True)
         
         for i, (label, value) in enumerate(zip(labels, values)):
-            percent = (value / dados_atualizados['total_orcamento'] * 100) if dados_atualizados['total_orcamento'] > 0 else 0
+            percent = (value / metricas['total_orcamento'] * 100) if metricas['total_orcamento'] > 0 else 0
             st.markdown(f"""
             <div style="
                 background: linear-gradient(135deg, #f8f9fa 0%, #e9ecef 100%);
@@ -857,7 +989,7 @@ if opcao == "Visão Geral":
                 border-left: 4px solid #667eea;
             ">
                 <div style="font-weight: 600; color: #2c3e50; margin-bottom: 0.5rem;">{label}</div>
-                <div style="font-size: 1.1rem; font-weight: 700; color: #667eea; margin-bottom: 0.5rem;">{format_currency(value)}</div>
+                <div style="font-size: 1.1rem; font-weight: 700; color: #667eea; margin-bottom: 0.5rem;">{format_currency(value / CENTAVOS_POR_REAL)}</div>
                 <span class="badge">{percent:.1f}% do total</span>
             </div>
             """, unsafe_allow_html=True)
@@ -873,12 +1005,14 @@ if opcao == "Visão Geral":
         """, unsafe_allow_html=True)
         
         # Gráfico de barras interativo
-        fig_barras = criar_grafico_barras_interativo(
-            labels, values, 
-            "📊 Comparação por Categoria",
-            colors=['#667eea', '#764ba2', '#f093fb']
-        )
-        st.plotly_chart(fig_barras, use_container_width=True)
+        def montar_barras():
+            return criar_grafico_barras_interativo(
+                labels, values_reais, 
+                "📊 Comparação por Categoria",
+                colors=['#667eea', '#764ba2', '#f093fb']
+            )
+        
+        st.plotly_chart(load_figura('comparacao_categorias', versao_receitas, (), montar_barras), use_container_width=True)
     
     # Gráfico de área cumulativa com card moderno
     st.markdown("""
@@ -894,15 +1028,17 @@ if opcao == "Visão Geral":
     
     # Criar dados para gráfico de área
     categorias_area = ['Receitas Tributárias', 'Transferências', 'Outras Receitas']
-    valores_area = [dados_atualizados['receitas_tributarias'], dados_atualizados['transferencias'], dados_atualizados['outras_receitas']]
+    valores_area = [metricas[nome] / CENTAVOS_POR_REAL for nome in ('receitas_tributarias', 'transferencias', 'outras_receitas')]
     
     # Gráfico de área interativo
-    fig_area = criar_grafico_area_interativo(
-        categorias_area, valores_area, 
-        "📊 Composição Cumulativa do Orçamento",
-        colors='#667eea'
-    )
-    st.plotly_chart(fig_area, use_container_width=True)
+    def montar_area():
+        return criar_grafico_area_interativo(
+            categorias_area, valores_area, 
+            "📊 Composição Cumulativa do Orçamento",
+            colors='#667eea'
+        )
+    
+    st.plotly_chart(load_figura('composicao_cumulativa', versao_receitas, (), montar_area), use_container_width=True)
     
     # Medidores de composição com progress bars modernos
     st.markdown("""
@@ -916,53 +1052,59 @@ if opcao == "Visão Geral":
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        percent_tributarias = (dados_atualizados['receitas_tributarias'] / dados_atualizados['total_orcamento'] * 100) if dados_atualizados['total_orcamento'] > 0 else 0
+        percent_tributarias = (metricas['receitas_tributarias'] / metricas['total_orcamento'] * 100) if metricas['total_orcamento'] > 0 else 0
         
         # Gráfico gauge interativo
-        fig_gauge_trib = criar_grafico_gauge_interativo(
-            percent_tributarias, 100, 
-            "🏛️ Receitas Tributárias",
-            colors='#667eea'
-        )
-        st.plotly_chart(fig_gauge_trib, use_container_width=True)
+        def montar_gauge_trib():
+            return criar_grafico_gauge_interativo(
+                percent_tributarias, 100, 
+                "🏛️ Receitas Tributárias",
+                colors='#667eea'
+            )
+        
+        st.plotly_chart(load_figura('medidor_tributarias', versao_receitas, (), montar_gauge_trib), use_container_width=True)
         
         st.markdown(f"""
         <div style="text-align: center; margin-top: 1rem;">
-            <div style="font-size: 1.1rem; font-weight: 700; color: #667eea;">{format_currency(dados_atualizados['receitas_tributarias'])}</div>
+            <div style="font-size: 1.1rem; font-weight: 700; color: #667eea;">{format_currency(metricas['receitas_tributarias'] / CENTAVOS_POR_REAL)}</div>
         </div>
         """, unsafe_allow_html=True)
     
     with col2:
-        percent_transf = (dados_atualizados['transferencias'] / dados_atualizados['total_orcamento'] * 100) if dados_atualizados['total_orcamento'] > 0 else 0
+        percent_transf = (metricas['transferencias'] / metricas['total_orcamento'] * 100) if metricas['total_orcamento'] > 0 else 0
         
         # Gráfico gauge interativo
-        fig_gauge_transf = criar_grafico_gauge_interativo(
-            percent_transf, 100, 
-            "🔄 Transferências",
-            colors='#764ba2'
-        )
-        st.plotly_chart(fig_gauge_transf, use_container_width=True)
+        def montar_gauge_transf():
+            return criar_grafico_gauge_interativo(
+                percent_transf, 100, 
+                "🔄 Transferências",
+                colors='#764ba2'
+            )
+        
+        st.plotly_chart(load_figura('medidor_transferencias', versao_receitas, (), montar_gauge_transf), use_container_width=True)
         
         st.markdown(f"""
         <div style="text-align: center; margin-top: 1rem;">
-            <div style="font-size: 1.1rem; font-weight: 700; color: #764ba2;">{format_currency(dados_atualizados['transferencias'])}</div>
+            <div style="font-size: 1.1rem; font-weight: 700; color: #764ba2;">{format_currency(metricas['transferencias'] / CENTAVOS_POR_REAL)}</div>
         </div>
         """, unsafe_allow_html=True)
     
     with col3:
-        percent_outras = (dados_atualizados['outras_receitas'] / dados_atualizados['total_orcamento'] * 100) if dados_atualizados['total_orcamento'] > 0 else 0
+        percent_outras = (metricas['outras_receitas'] / metricas['total_orcamento'] * 100) if metricas['total_orcamento'] > 0 else 0
         
         # Gráfico gauge interativo
-        fig_gauge_outras = criar_grafico_gauge_interativo(
-            percent_outras, 100, 
-            "📋 Outras Receitas",
-            colors='#f093fb'
-        )
-        st.plotly_chart(fig_gauge_outras, use_container_width=True)
+        def montar_gauge_outras():
+            return criar_grafico_gauge_interativo(
+                percent_outras, 100, 
+                "📋 Outras Receitas",
+                colors='#f093fb'
+            )
+        
+        st.plotly_chart(load_figura('medidor_outras', versao_receitas, (), montar_gauge_outras), use_container_width=True)
         
         st.markdown(f"""
         <div style="text-align: center; margin-top: 1rem;">
-            <div style="font-size: 1.1rem; font-weight: 700; color: #f093fb;">{format_currency(dados_atualizados['outras_receitas'])}</div>
+            <div style="font-size: 1.1rem; font-weight: 700; color: #f093fb;">{format_currency(metricas['outras_receitas'] / CENTAVOS_POR_REAL)}</div>
         </div>
         """, unsafe_allow_html=True)
     
@@ -987,33 +1129,29 @@ if opcao == "Visão Geral":
     # Criar dados para o funil
     labels_funil = ['Total Orçamento', 'Receitas Tributárias', 'Transferências', 'Outras Receitas']
     values_funil = [
-        dados_atualizados['total_orcamento'],
-        dados_atualizados['receitas_tributarias'],
-        dados_atualizados['transferencias'],
-        dados_atualizados['outras_receitas']
+        metricas[nome] / CENTAVOS_POR_REAL
+        for nome in ('total_orcamento', 'receitas_tributarias', 'transferencias', 'outras_receitas')
     ]
     
-    fig_funil = criar_grafico_funnel_interativo(
-        labels_funil, values_funil,
-        "🗜️ Fluxo de Receitas Orçamentárias",
-        colors=['#667eea', '#764ba2', '#f093fb', '#4facfe']
-    )
-    st.plotly_chart(fig_funil, use_container_width=True)
+    def montar_funil():
+        return criar_grafico_funnel_interativo(
+            labels_funil, values_funil,
+            "🗜️ Fluxo de Receitas Orçamentárias",
+            colors=['#667eea', '#764ba2', '#f093fb', '#4facfe']
+        )
+    
+    st.plotly_chart(load_figura('funil_receitas', versao_receitas, (), montar_funil), use_container_width=True)
     
-    # Ordenar receitas por valor
-    sorted_receitas = sorted(
-        receitas_orcadas, 
-        key=lambda x: safe_float(x.get('TOTOR', 0)), 
-        reverse=True
-    )[:10]
+    # Posições das 10 maiores receitas por valor
+    sorted_receitas = heapq.nlargest(10, range(receitas_orcadas.total), key=totor_receitas.__getitem__)
     
     col1, col2 = st.columns([2, 1])
     
     with col1:
         # Criar gráfico de barras para Top 10 usando Streamlit
         if sorted_receitas:
-            nomes_top10 = [receita.get('NOME', 'Sem descrição')[:20] + '...' if len(receita.get('NOME', 'Sem descrição')) > 20 else receita.get('NOME', 'Sem descrição') for receita in sorted_receitas]
-            valores_top10 = [safe_float(receita.get('TOTOR', 0)) for receita in sorted_receitas]
+            nomes_top10 = [nomes_receitas[posicao][:20] + '...' if len(nomes_receitas[posicao]) > 20 else nomes_receitas[posicao] for posicao in sorted_receitas]
+            valores_top10 = [totor_receitas[posicao] / CENTAVOS_POR_REAL for posicao in sorted_receitas]
             
             # Gráfico de barras usando Streamlit
             chart_data_top10 = {}
@@ -1021,13 +1159,15 @@ if opcao == "Visão Geral":
                 chart_data_top10[nome] = valores_top10[i]
             
             # Gráfico de barras horizontal interativo para Top 10
-            fig_top10 = criar_grafico_barras_interativo(
-                nomes_top10, valores_top10, 
-                "🔝 Top 10 Maiores Receitas",
-                colors=px.colors.qualitative.Set3,
-                orientation='h'
-            )
-            st.plotly_chart(fig_top10, use_container_width=True)
+            def montar_top10():
+                return criar_grafico_barras_interativo(
+                    nomes_top10, valores_top10, 
+                    "🔝 Top 10 Maiores Receitas",
+                    colors=px.colors.qualitative.Set3,
+                    orientation='h'
+                )
+            
+            st.plotly_chart(load_figura('top_receitas', versao_receitas, (), montar_top10), use_container_width=True)
     
     with col2:
         # Lista detalhada com cards modernos
@@ -1039,10 +1179,10 @@ if opcao == "Visão Geral":
         </div>
         """, unsafe_allow_html=True)
         
-        for i, receita in enumerate(sorted_receitas, 1):
-            nome = receita.get('NOME', 'Sem descrição')
-            valor = safe_float(receita.get('TOTOR', 0))
-            percent = (valor / dados_atualizados['total_orcamento'] * 100) if dados_atualizados['total_orcamento'] > 0 else 0
+        for i, posicao in enumerate(sorted_receitas, 1):
+            nome = nomes_receitas[posicao]
+            valor = totor_receitas[posicao] / CENTAVOS_POR_REAL
+            percent = (totor_receitas[posicao] / metricas['total_orcamento'] * 100) if metricas['total_orcamento'] > 0 else 0
             
             # Cor baseada na posição
             if i == 1:
@@ -1081,52 +1221,12 @@ if opcao == "Visão Geral":
 elif opcao == "Análise por Categoria":
     st.header("📊 Análise por Categoria de Receita")
     
-    # Agrupar receitas por nível hierárquico
-    nivel1_data = defaultdict(float)
-    
-    for row in receitas_orcadas:
-        codigo = row.get('CODRE', '')
-        valor = safe_float(row.get('TOTOR', 0))
-        if codigo:
-            nivel1 = codigo[:4]
-            nivel1_data[nivel1] += valor
-    
-    # Mapear códigos para nomes mais legíveis
-    codigo_nomes = {
-        '1112': 'Impostos sobre Patrimônio',
-        '1113': 'Impostos sobre Renda',
-        '1114': 'Impostos sobre Serviços',
-        '1121': 'Taxas pelo Poder de Polícia',
-        '1122': 'Taxas pelos Serviços',
-        '1241': 'Contribuições de Melhoria',
-        '1311': 'Exploração do Patrimônio',
-        '1321': 'Remuneração de Depósitos',
-        '1611': 'Serviços Administrativos',
-        '1699': 'Outros Serviços',
-        '1711': 'Transferências da União',
-        '1712': 'Transferências da União - Outras',
-        '1713': 'Transferências da União - SUS',
-        '1714': 'Transferências da União - Educação',
-        '1716': 'Transferências da União - Assistência',
-        '1719': 'Outras Transferências da União',
-        '1721': 'Transferências do Estado',
-        '1722': 'Transferências do Estado - Outras',
-        '1723': 'Transferências do Estado - SUS',
-        '1724': 'Transferências do Estado - Educação',
-        '1729': 'Outras Transferências do Estado',
-        '1751': 'FUNDEB',
-        '1911': 'Multas Administrativas',
-        '1922': 'Restituições',
-        '1999': 'Outras Receitas Correntes',
-        '2213': 'Alienação de Bens'
-    }
+    # Receitas por nível hierárquico (primeiros 4 dígitos), somadas junto com as categorias
+    nivel1_data = metricas['grupos']
     
     # Mostrar distribuição hierárquica
     st.subheader("🌳 Distribuição Hierárquica das Receitas")
     
-    # Recalcular dados dinamicamente
-    dados_atualizados = calcular_dados_dinamicos()
-    
     # Ordenar por valor
     sorted_nivel1 = sorted(nivel1_data.items(), key=lambda x: x[1], reverse=True)
     
@@ -1139,7 +1239,7 @@ elif opcao == "Análise por Categoria":
         nome = codigo_nomes.get(codigo, f"Código {codigo}")
         treemap_labels.append(nome)
         treemap_parents.append("Orçamento Total")
-        treemap_values.append(valor)
+        treemap_values.append(valor / CENTAVOS_POR_REAL)
     
     # Gráfico treemap interativo para distribuição hierárquica
     if treemap_values:
@@ -1152,12 +1252,14 @@ elif opcao == "Análise por Categoria":
         """, unsafe_allow_html=True)
         
         # Criar gráfico treemap interativo
-        fig_treemap = criar_grafico_treemap_interativo(
-            treemap_labels, treemap_parents, treemap_values,
-            "🌳 Distribuição Hierárquica das Receitas",
-            colors=px.colors.qualitative.Set3
-        )
-        st.plotly_chart(fig_treemap, use_container_width=True)
+        def montar_treemap():
+            return criar_grafico_treemap_interativo(
+                treemap_labels, treemap_parents, treemap_values,
+                "🌳 Distribuição Hierárquica das Receitas",
+                colors=px.colors.qualitative.Set3
+            )
+        
+        st.plotly_chart(load_figura('treemap', versao_receitas, (), montar_treemap), use_container_width=True)
         
         # Gráfico sunburst interativo
         st.markdown("""
@@ -1168,19 +1270,21 @@ elif opcao == "Análise por Categoria":
         </div>
         """, unsafe_allow_html=True)
         
-        fig_sunburst = criar_grafico_sunburst_interativo(
-            treemap_labels, treemap_parents, treemap_values,
-            "☀️ Visualização Hierárquica Sunburst",
-            colors=px.colors.qualitative.Set3
-        )
-        st.plotly_chart(fig_sunburst, use_container_width=True)
+        def montar_sunburst():
+            return criar_grafico_sunburst_interativo(
+                treemap_labels, treemap_parents, treemap_values,
+                "☀️ Visualização Hierárquica Sunburst",
+                colors=px.colors.qualitative.Set3
+            )
+        
+        st.plotly_chart(load_figura('sunburst', versao_receitas, (), montar_sunburst), use_container_width=True)
     
     # Lista detalhada
     st.subheader("📋 Detalhamento por Categoria")
     for codigo, valor in sorted_nivel1:
         nome = codigo_nomes.get(codigo, f"Código {codigo}")
-        percent = (valor / dados_atualizados['total_orcamento'] * 100) if dados_atualizados['total_orcamento'] > 0 else 0
-        st.write(f"• **{nome}**: {format_currency(valor)} ({percent:.1f}%)")
+        percent = (valor / metricas['total_orcamento'] * 100) if metricas['total_orcamento'] > 0 else 0
+        st.write(f"• **{nome}**: {format_currency(valor / CENTAVOS_POR_REAL)} ({percent:.1f}%)")
     
     # Tabela detalhada
     st.subheader("📋 Detalhamento por Categoria")
@@ -1188,11 +1292,11 @@ elif opcao == "Análise por Categoria":
     categoria_detalhes = []
     for codigo, valor in sorted_nivel1:
         nome = codigo_nomes.get(codigo, f"Código {codigo}")
-        participacao = (valor / dados_atualizados['total_orcamento']) * 100
+        participacao = (valor / metricas['total_orcamento']) * 100
         categoria_detalhes.append({
             'Código': codigo,
             'Categoria': nome,
-            'Valor (R$)': format_currency(valor),
+            'Valor (R$)': format_currency(valor / CENTAVOS_POR_REAL),
             'Participação (%)': f"{participacao:.2f}%"
         })
     
@@ -1210,10 +1314,7 @@ elif opcao == "Receitas Tributárias":
     st.header("🏛️ Análise das Receitas Tributárias")
     
     # Filtrar apenas receitas tributárias
-    tributarias = [
-        row for row in receitas_orcadas
-        if row.get('CODRE', '').startswith(('1112', '1113', '1114', '1121', '1122'))
-    ]
+    tributarias = filtrar_receitas(TRIBUTARIAS)
     
     if tributarias:
         col1, col2 = st.columns(2)
@@ -1221,53 +1322,52 @@ elif opcao == "Receitas Tributárias":
         with col1:
             # Análise por tipo de tributo
             tributos_tipo = {
-                'IPTU': sum(safe_float(row.get('TOTOR', 0)) for row in tributarias if row.get('CODRE', '').startswith('1112.5')),
-                'ITBI': sum(safe_float(row.get('TOTOR', 0)) for row in tributarias if row.get('CODRE', '').startswith('1112.53')),
-                'IRRF': sum(safe_float(row.get('TOTOR', 0)) for row in tributarias if row.get('CODRE', '').startswith('1113')),
-                'ISSQN': sum(safe_float(row.get('TOTOR', 0)) for row in tributarias if row.get('CODRE', '').startswith('1114')),
-                'Taxas': sum(safe_float(row.get('TOTOR', 0)) for row in tributarias if row.get('CODRE', '').startswith(('1121', '1122')))
+                'IPTU': metricas['categorias']['IPTU'],
+                'ITBI': metricas['categorias']['ITBI'],
+                'IRRF': metricas['categorias']['IRRF'],
+                'ISSQN': metricas['categorias']['ISSQN'],
+                'Taxas': metricas['categorias']['Taxas']
             }
             
-            # Recalcular dados dinamicamente
-            dados_atualizados = calcular_dados_dinamicos()
-            
             st.subheader("📊 Receitas por Tipo de Tributo")
             
             # Criar gráfico de pizza interativo para tributos
             if tributos_tipo:
                 labels_tributos = list(tributos_tipo.keys())
-                values_tributos = list(tributos_tipo.values())
+                values_tributos = [valor / CENTAVOS_POR_REAL for valor in tributos_tipo.values()]
                 
                 # Gráfico de pizza interativo
-                fig_tributos = criar_grafico_pizza_interativo(
-                    labels_tributos, values_tributos,
-                    "🏛️ Distribuição por Tipo de Tributo",
-                    colors=['#667eea', '#764ba2', '#f093fb', '#4facfe', '#43e97b']
-                )
-                st.plotly_chart(fig_tributos, use_container_width=True)
+                def montar_tributos():
+                    return criar_grafico_pizza_interativo(
+                        labels_tributos, values_tributos,
+                        "🏛️ Distribuição por Tipo de Tributo",
+                        colors=['#667eea', '#764ba2', '#f093fb', '#4facfe', '#43e97b']
+                    )
+                
+                st.plotly_chart(load_figura('tributos', versao_receitas, (), montar_tributos), use_container_width=True)
             
             # Lista detalhada
             for tipo, valor in tributos_tipo.items():
-                percent = (valor / dados_atualizados['receitas_tributarias'] * 100) if dados_atualizados['receitas_tributarias'] > 0 else 0
-                st.write(f"• **{tipo}**: {format_currency(valor)} ({percent:.1f}%)")
+                percent = (valor / metricas['receitas_tributarias'] * 100) if metricas['receitas_tributarias'] > 0 else 0
+                st.write(f"• **{tipo}**: {format_currency(valor / CENTAVOS_POR_REAL)} ({percent:.1f}%)")
         
         with col2:
             # Distribuição IPTU
-            iptu_detalhes = [row for row in tributarias if row.get('CODRE', '').startswith('1112.5')]
+            iptu_detalhes = filtrar_receitas('1112.5')
             
             if iptu_detalhes:
                 st.subheader("🏠 Detalhamento do IPTU")
-                for receita in iptu_detalhes:
-                    nome = receita.get('NOME', 'Sem descrição')
-                    valor = safe_float(receita.get('TOTOR', 0))
+                for posicao in iptu_detalhes:
+                    nome = nomes_receitas[posicao]
+                    valor = totor_receitas[posicao] / CENTAVOS_POR_REAL
                     st.write(f"• **{nome}**: {format_currency(valor)}")
         
         # Tabela de tributárias
         st.subheader("📋 Detalhamento das Receitas Tributárias")
         
-        for receita in tributarias:
-            nome = receita.get('NOME', 'Sem descrição')
-            valor = safe_float(receita.get('TOTOR', 0))
+        for posicao in tributarias:
+            nome = nomes_receitas[posicao]
+            valor = totor_receitas[posicao] / CENTAVOS_POR_REAL
             st.write(f"• **{nome}**: {format_currency(valor)}")
     else:
         st.warning("Nenhuma receita tributária encontrada nos dados.")
@@ -1279,28 +1379,13 @@ elif opcao == "Transferências":
     st.header("🔄 Análise das Transferências")
     
     # Filtrar transferências
-    transf = [
-        row for row in receitas_orcadas
-        if row.get('CODRE', '').startswith(('1711', '1712', '1713', '1714', '1716', '1721', '1722', '1723', '1724', '1751'))
-    ]
+    transf = filtrar_receitas(TRANSFERENCIAS)
     
     if transf:
-        # Separar por origem
-        transf_uniao = sum(
-            safe_float(row.get('TOTOR', 0)) 
-            for row in transf 
-            if row.get('CODRE', '').startswith(('1711', '1712', '1713', '1714', '1716', '1719'))
-        )
-        transf_estado = sum(
-            safe_float(row.get('TOTOR', 0)) 
-            for row in transf 
-            if row.get('CODRE', '').startswith(('1721', '1722', '1723', '1724', '1729'))
-        )
-        fundeb = sum(
-            safe_float(row.get('TOTOR', 0)) 
-            for row in transf 
-            if row.get('CODRE', '').startswith('1751')
-        )
+        # Separar por origem (em reais, só para exibição)
+        transf_uniao = metricas['categorias']['uniao'] / CENTAVOS_POR_REAL
+        transf_estado = metricas['categorias']['estado'] / CENTAVOS_POR_REAL
+        fundeb = metricas['categorias']['fundeb'] / CENTAVOS_POR_REAL
         
         col1, col2, col3 = st.columns(3)
         
@@ -1319,21 +1404,25 @@ elif opcao == "Transferências":
             labels_transf = ['União', 'Estado', 'FUNDEB']
             values_transf = [transf_uniao, transf_estado, fundeb]
             
-            fig_pizza_transf = criar_grafico_pizza_interativo(
-                labels_transf, values_transf,
-                "🔄 Transferências por Origem",
-                colors=['#667eea', '#764ba2', '#f093fb']
-            )
-            st.plotly_chart(fig_pizza_transf, use_container_width=True)
+            def montar_pizza_transf():
+                return criar_grafico_pizza_interativo(
+                    labels_transf, values_transf,
+                    "🔄 Transferências por Origem",
+                    colors=['#667eea', '#764ba2', '#f093fb']
+                )
+            
+            st.plotly_chart(load_figura('transferencias_origem', versao_receitas, (), montar_pizza_transf), use_container_width=True)
         
         with col2:
             # Gráfico de barras interativo para transferências
-            fig_barras_transf = criar_grafico_barras_interativo(
-                labels_transf, values_transf,
-                "📊 Comparação de Transferências",
-                colors=['#667eea', '#764ba2', '#f093fb']
-            )
-            st.plotly_chart(fig_barras_transf, use_container_width=True)
+            def montar_barras_transf():
+                return criar_grafico_barras_interativo(
+                    labels_transf, values_transf,
+                    "📊 Comparação de Transferências",
+                    colors=['#667eea', '#764ba2', '#f093fb']
+                )
+            
+            st.plotly_chart(load_figura('transferencias_comparacao', versao_receitas, (), montar_barras_transf), use_container_width=True)
         
         # Lista detalhada
         st.write(f"• **União**: {format_currency(transf_uniao)}")
@@ -1344,26 +1433,28 @@ elif opcao == "Transferências":
         st.subheader("🔝 Principais Transferências")
         
         # Ordenar por valor
-        sorted_transf = sorted(transf, key=lambda x: safe_float(x.get('TOTOR', 0)), reverse=True)[:15]
+        sorted_transf = heapq.nlargest(15, transf, key=totor_receitas.__getitem__)
         
         # Gráfico interativo para principais transferências
         if sorted_transf:
-            nomes_transf = [receita.get('NOME', 'Sem descrição')[:30] + '...' if len(receita.get('NOME', 'Sem descrição')) > 30 else receita.get('NOME', 'Sem descrição') for receita in sorted_transf]
-            valores_transf = [safe_float(receita.get('TOTOR', 0)) for receita in sorted_transf]
+            nomes_transf = [nomes_receitas[posicao][:30] + '...' if len(nomes_receitas[posicao]) > 30 else nomes_receitas[posicao] for posicao in sorted_transf]
+            valores_transf = [totor_receitas[posicao] / CENTAVOS_POR_REAL for posicao in sorted_transf]
             
             # Gráfico de barras horizontal interativo
-            fig_transf_principais = criar_grafico_barras_interativo(
-                nomes_transf, valores_transf,
-                "🔝 Top 15 Principais Transferências",
-                colors=px.colors.qualitative.Set3,
-                orientation='h'
-            )
-            st.plotly_chart(fig_transf_principais, use_container_width=True)
+            def montar_transf_principais():
+                return criar_grafico_barras_interativo(
+                    nomes_transf, valores_transf,
+                    "🔝 Top 15 Principais Transferências",
+                    colors=px.colors.qualitative.Set3,
+                    orientation='h'
+                )
+            
+            st.plotly_chart(load_figura('principais_transferencias', versao_receitas, (), montar_transf_principais), use_container_width=True)
         
         # Lista detalhada
-        for i, receita in enumerate(sorted_transf, 1):
-            nome = receita.get('NOME', 'Sem descrição')
-            valor = safe_float(receita.get('TOTOR', 0))
+        for i, posicao in enumerate(sorted_transf, 1):
+            nome = nomes_receitas[posicao]
+            valor = totor_receitas[posicao] / CENTAVOS_POR_REAL
             st.write(f"{i}. **{nome}**: {format_currency(valor)}")
     else:
         st.warning("Nenhuma transferência encontrada nos dados.")
@@ -1374,95 +1465,115 @@ elif opcao == "Transferências":
 elif opcao == "Detalhamento":
     st.header("🔍 Detalhamento Completo")
     
-    # Filtros
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        valor_min = st.number_input("Valor mínimo (R$)", min_value=0, value=0)
-    
-    with col2:
-        busca = st.text_input("Buscar por descrição")
-    
-    # Aplicar filtros
-    dados_filtrados = receitas_orcadas.copy()
-    
-    if valor_min > 0:
-        dados_filtrados = [
-            row for row in dados_filtrados 
-            if safe_float(row.get('TOTOR', 0)) >= valor_min
-        ]
-    
-    if busca:
-        dados_filtrados = [
-            row for row in dados_filtrados
-            if busca.lower() in row.get('NOME', '').lower()
-        ]
-    
-    # Mostrar resultados
-    st.subheader(f"📊 Resultados ({len(dados_filtrados)} registros)")
-    
-    if dados_filtrados:
-        # Ordenar por valor
-        dados_filtrados.sort(key=lambda x: safe_float(x.get('TOTOR', 0)), reverse=True)
+    # Filtros e resultados num fragmento: mudar um filtro roda de novo só esta seção
+    @st.fragment
+    def detalhar_receitas():
+        """Busca e filtros das receitas, com a tabela paginada e as estatísticas do que foi filtrado"""
+        # Filtros
+        col1, col2 = st.columns(2)
         
-        # Gráfico interativo para dados filtrados (top 20)
-        if len(dados_filtrados) > 0:
-            top_20 = dados_filtrados[:20]
-            nomes_filtrados = [receita.get('NOME', 'Sem descrição')[:25] + '...' if len(receita.get('NOME', 'Sem descrição')) > 25 else receita.get('NOME', 'Sem descrição') for receita in top_20]
-            valores_filtrados = [safe_float(receita.get('TOTOR', 0)) for receita in top_20]
-            
-            # Gráfico de barras horizontal interativo
-            fig_filtrados = criar_grafico_barras_interativo(
-                nomes_filtrados, valores_filtrados,
-                f"📊 Top 20 Maiores Valores ({len(dados_filtrados)} registros filtrados)",
-                colors=px.colors.qualitative.Set3,
-                orientation='h'
-            )
-            st.plotly_chart(fig_filtrados, use_container_width=True)
+        with col1:
+            valor_min = st.number_input("Valor mínimo (R$)", min_value=0, value=0)
         
-        # Mostrar dados em formato de tabela
-        st.subheader("📋 Lista Detalhada")
-        for receita in dados_filtrados:
-            codigo = receita.get('CODRE', '')
-            nome = receita.get('NOME', 'Sem descrição')
-            valor = safe_float(receita.get('TOTOR', 0))
-            st.write(f"• **{codigo} - {nome}**: {format_currency(valor)}")
+        with col2:
+            busca = st.text_input("Buscar por descrição")
         
-        # Estatísticas dos dados filtrados
-        total_filtrado = sum(safe_float(row.get('TOTOR', 0)) for row in dados_filtrados)
-        valores = [safe_float(row.get('TOTOR', 0)) for row in dados_filtrados if safe_float(row.get('TOTOR', 0)) > 0]
+        # Aplicar filtros (a busca pelo índice invertido, antes dos demais)
+        posicoes_filtradas = range(receitas_orcadas.total)
         
-        col1, col2, col3 = st.columns(3)
+        if busca:
+            posicoes_filtradas = buscar(indexar_descricoes(versao_receitas), busca)
         
-        with col1:
-            st.metric("Total Filtrado", format_currency(total_filtrado))
-        with col2:
-            if valores:
-                st.metric("Maior Valor", format_currency(max(valores)))
-        with col3:
-            if valores:
-                st.metric("Menor Valor", format_currency(min(valores)))
+        if valor_min > 0:
+            posicoes_filtradas = [
+                posicao for posicao in posicoes_filtradas
+                if totor_receitas[posicao] >= valor_min * CENTAVOS_POR_REAL
+            ]
         
-        # Gráfico de linha interativo para distribuição dos valores
-        if valores and len(valores) > 1:
-            st.markdown("""
-            <div style="margin: 2rem 0;">
-                <h3 style="text-align: center; color: #2c3e50; margin-bottom: 1rem;">
-                    📈 Distribuição dos Valores
-                </h3>
-            </div>
-            """, unsafe_allow_html=True)
+        selecao = [False] * receitas_orcadas.total
+        for posicao in posicoes_filtradas:
+            selecao[posicao] = True
+        ordens = ordenar_receitas(versao_receitas)
+        
+        # Mostrar resultados
+        st.subheader(f"📊 Resultados ({len(posicoes_filtradas)} registros)")
+        
+        if posicoes_filtradas:
+            # Gráfico interativo para dados filtrados (top 20, pela ordem por valor)
+            top_20 = posicoes_da_pagina(selecionar_ordem(ordens['Valor'], selecao), 1, 20, decrescente=True)
+            if top_20:
+                nomes_filtrados = [nomes_receitas[posicao][:25] + '...' if len(nomes_receitas[posicao]) > 25 else nomes_receitas[posicao] for posicao in top_20]
+                valores_filtrados = [totor_receitas[posicao] / CENTAVOS_POR_REAL for posicao in top_20]
+                
+                # Gráfico de barras horizontal interativo (depende da busca, então não vai para o cache)
+                fig_filtrados = criar_grafico_barras_interativo(
+                    nomes_filtrados, valores_filtrados,
+                    f"📊 Top 20 Maiores Valores ({len(posicoes_filtradas)} registros filtrados)",
+                    colors=px.colors.qualitative.Set3,
+                    orientation='h'
+                )
+                
+                st.plotly_chart(fig_filtrados, use_container_width=True)
             
-            # Criar gráfico de linha interativo
-            x_values = [f"Item {i+1}" for i in range(len(valores))]
-            fig_distribuicao = criar_grafico_linha_interativo(
-                x_values, valores,
-                "📈 Distribuição dos Valores Filtrados",
-                colors='#667eea'
-            )
-            st.plotly_chart(fig_distribuicao, use_container_width=True)
-    else:
-        st.warning("Nenhum registro encontrado com os filtros aplicados.")
+            # Tabela paginada, ordenada no servidor: só a página visível é formatada
+            st.subheader("📋 Lista Detalhada")
+            paginas = numero_de_paginas(len(posicoes_filtradas))
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                ordenar_por = st.selectbox("Ordenar por", list(ordens), key="detalhe_ordenar")
+            with col2:
+                decrescente = st.checkbox("Ordem decrescente", value=True, key="detalhe_decrescente")
+            with col3:
+                pagina = min(st.number_input(f"Página (de {paginas})", min_value=1, value=1, key="detalhe_pagina"), paginas)
+            
+            st.dataframe([
+                {
+                    'Código': codigos_receitas[posicao],
+                    'Descrição': nomes_receitas[posicao],
+                    'Valor Previsto': format_currency(totor_receitas[posicao] / CENTAVOS_POR_REAL),
+                }
+                for posicao in posicoes_da_pagina(selecionar_ordem(ordens[ordenar_por], selecao), pagina, decrescente=decrescente)
+            ], use_container_width=True, hide_index=True)
+            st.caption(f"Página {pagina} de {paginas} - {TAMANHO_PAGINA} registros por página")
+            
+            # Estatísticas dos dados filtrados
+            total_filtrado = sum(totor_receitas[posicao] for posicao in posicoes_filtradas) / CENTAVOS_POR_REAL
+            valores = sorted((totor_receitas[posicao] / CENTAVOS_POR_REAL for posicao in posicoes_filtradas if totor_receitas[posicao] > 0), reverse=True)
+            
+            col1, col2, col3 = st.columns(3)
+            
+            with col1:
+                st.metric("Total Filtrado", format_currency(total_filtrado))
+            with col2:
+                if valores:
+                    st.metric("Maior Valor", format_currency(max(valores)))
+            with col3:
+                if valores:
+                    st.metric("Menor Valor", format_currency(min(valores)))
+            
+            # Gráfico de linha interativo para distribuição dos valores
+            if valores and len(valores) > 1:
+                st.markdown("""
+                <div style="margin: 2rem 0;">
+                    <h3 style="text-align: center; color: #2c3e50; margin-bottom: 1rem;">
+                        📈 Distribuição dos Valores
+                    </h3>
+                </div>
+                """, unsafe_allow_html=True)
+                
+                # Criar gráfico de linha interativo (depende da busca, então não vai para o cache)
+                x_values = [f"Item {i+1}" for i in range(len(valores))]
+                fig_distribuicao = criar_grafico_linha_interativo(
+                    x_values, valores,
+                    "📈 Distribuição dos Valores Filtrados",
+                    colors='#667eea'
+                )
+                
+                st.plotly_chart(fig_distribuicao, use_container_width=True)
+        else:
+            st.warning("Nenhum registro encontrado com os filtros aplicados.")
+    
+    detalhar_receitas()
 
 # ==============================================================================
 # ESTRUTURA DE RECEITAS
@@ -1475,10 +1586,9 @@ elif opcao == "Estrutura de Receitas":
     # Mostrar primeiros registros da estrutura
     st.subheader("Primeiros 20 registros da estrutura:")
     
-    for i, row in enumerate(estrutura_receitas[:20], 1):
-        codigo = row.get('CODRE', '')
-        nome = row.get('NOMRE', '')
-        nivel = row.get('NIVEL', '')
+    codigos_estrutura = estrutura_receitas.textos['CODRE']
+    niveis_estrutura = estrutura_receitas.textos['NIVEL']
+    for i, (codigo, nome, nivel) in enumerate(zip(codigos_estrutura[:20], estrutura_receitas.textos['NOMRE'][:20], niveis_estrutura[:20]), 1):
         st.write(f"{i}. **{codigo}** - {nome} (Nível: {nivel})")
     
     # Estatísticas da estrutura
@@ -1486,8 +1596,7 @@ elif opcao == "Estrutura de Receitas":
     
     # Contar por nível
     niveis = defaultdict(int)
-    for row in estrutura_receitas:
-        nivel = row.get('NIVEL', '')
+    for nivel in niveis_estrutura:
         if nivel:
             niveis[nivel] += 1
     
@@ -1510,8 +1619,7 @@ elif opcao == "Estrutura de Receitas":
     
     # Mostrar códigos únicos
     codigos_unicos = set()
-    for row in estrutura_receitas:
-        codigo = row.get('CODRE', '')
+    for codigo in codigos_estrutura:
         if codigo:
             codigos_unicos.add(codigo[:4])  # Primeiros 4 dígitos
     
@@ -1528,9 +1636,7 @@ elif opcao == "Estrutura de Receitas":
 elif opcao == "Códigos Detectados":
     st.header("🔍 Códigos Detectados Dinamicamente")
     
-    # Recalcular dados dinamicamente
-    dados_atualizados = calcular_dados_dinamicos()
-    codigos_detectados = dados_atualizados['codigos_detectados']
+    codigos_detectados = metricas['codigos_detectados']
     
     st.info(f"📊 **Total de códigos únicos detectados:** {len(codigos_detectados)}")
     
@@ -1542,18 +1648,18 @@ elif opcao == "Códigos Detectados":
     with col1:
         st.write("**Códigos Tributários:**")
         for codigo in codigos_detectados:
-            if codigo.startswith(('1112', '1113', '1114', '1121', '1122')):
+            if codigo.startswith(TRIBUTARIAS):
                 st.write(f"• **{codigo}** - {codigo_nomes.get(codigo, 'Código tributário')}")
     
     with col2:
         st.write("**Códigos de Transferências:**")
         for codigo in codigos_detectados:
-            if codigo.startswith(('1711', '1712', '1713', '1714', '1716', '1721', '1722', '1723', '1724', '1751')):
+            if codigo.startswith(TRANSFERENCIAS):
                 st.write(f"• **{codigo}** - {codigo_nomes.get(codigo, 'Código de transferência')}")
     
     # Outros códigos
     outros_codigos = [codigo for codigo in codigos_detectados 
-                     if not codigo.startswith(('1112', '1113', '1114', '1121', '1122', '1711', '1712', '1713', '1714', '1716', '1721', '1722', '1723', '1724', '1751'))]
+                     if not codigo.startswith(TRIBUTARIAS + TRANSFERENCIAS)]
     
     if outros_codigos:
         st.subheader("🔍 Outros Códigos Detectados")
@@ -1566,11 +1672,11 @@ elif opcao == "Códigos Detectados":
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        tributarios = len([c for c in codigos_detectados if c.startswith(('1112', '1113', '1114', '1121', '1122'))])
+        tributarios = len([c for c in codigos_detectados if c.startswith(TRIBUTARIAS)])
         st.metric("Códigos Tributários", tributarios)
     
     with col2:
-        transferencias = len([c for c in codigos_detectados if c.startswith(('1711', '1712', '1713', '1714', '1716', '1721', '1722', '1723', '1724', '1751'))])
+        transferencias = len([c for c in codigos_detectados if c.startswith(TRANSFERENCIAS)])
         st.metric("Códigos de Transferências", transferencias)
     
     with col3:
@@ -0,0 +1,6 @@
+"""Rotinas compartilhadas de carga e processamento dos dados orçamentários de Rifaina
+
+Os módulos deste pacote são usados pelos três dashboards (app.py, app_executado.py
+e app_simple.py). Módulos que dependem de pandas só são importados pelos apps que
+já usam pandas, para que app_simple.py continue funcionando sem ele.
+"""
@@ -0,0 +1,115 @@
+"""Utilitários de arquivo usando apenas a biblioteca padrão"""
+import codecs
+import functools
+import hashlib
+import os
+
+# Pasta dos caches em disco (colunar, incremental e artefatos)
+DIRETORIO_CACHE = os.environ.get('ORCAMENTO_CACHE_DIR', '.cache')
+
+TAMANHO_BLOCO_HASH = 1024 * 1024
+
+# Bytes lidos de cada trecho (início, meio e fim) para decidir a codificação
+TAMANHO_AMOSTRA = 64 * 1024
+
+# Exportações que não são UTF-8 vêm do Portal em latin-1
+CODIFICACAO_ALTERNATIVA = 'latin-1'
+
+
+def hash_conteudo(caminho):
+    """Calcula um hash rápido (BLAKE2b) do conteúdo do arquivo"""
+    h = hashlib.blake2b(digest_size=16)
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(TAMANHO_BLOCO_HASH), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def impressao_digital(caminho, com_hash=True):
+    """Retorna tamanho, data de modificação e (opcionalmente) hash do arquivo"""
+    stat = os.stat(caminho)
+    impressao = {'tamanho': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if com_hash:
+        impressao['hash'] = hash_conteudo(caminho)
+    return impressao
+
+
+@functools.lru_cache(maxsize=64)
+def _hash_versao(caminho, tamanho, mtime_ns):
+    return hash_conteudo(caminho)
+
+
+def hash_rapido(caminho):
+    """Hash do conteúdo, recalculado só quando tamanho ou data de modificação mudam"""
+    impressao = impressao_digital(caminho, com_hash=False)
+    return _hash_versao(os.path.abspath(caminho), impressao['tamanho'], impressao['mtime_ns'])
+
+
+def versao_dados(*caminhos):
+    """Identificador de versão de um conjunto de arquivos, derivado do conteúdo
+
+    Usado como chave dos caches do Streamlit: arquivo sem mudança mantém a versão
+    (mesmo se só a data de modificação mudar) e cada carregador depende apenas
+    dos arquivos que lê.
+    """
+    h = hashlib.blake2b(digest_size=8)
+    for caminho in caminhos:
+        h.update(os.path.basename(caminho).encode('utf-8'))
+        h.update(hash_rapido(caminho).encode('ascii'))
+    return h.hexdigest()
+
+
+def gravar_atomico(destino, escrever):
+    """Grava via arquivo temporário e os.replace, para nunca deixar arquivo pela metade"""
+    temporario = destino + '.tmp'
+    escrever(temporario)
+    os.replace(temporario, destino)
+
+
+def _amostras(caminho, tamanho):
+    """Lê trechos limitados do início, do meio e do fim do arquivo"""
+    with open(caminho, 'rb') as arquivo:
+        inicio = arquivo.read(TAMANHO_AMOSTRA)
+        if tamanho <= TAMANHO_AMOSTRA:
+            return inicio, []
+        outras = []
+        for posicao in (tamanho // 2, max(tamanho - TAMANHO_AMOSTRA, TAMANHO_AMOSTRA)):
+            arquivo.seek(posicao)
+            outras.append(arquivo.read(TAMANHO_AMOSTRA))
+        return inicio, outras
+
+
+def _utf8_valido(amostra, meio_de_arquivo):
+    """Confere se a amostra decodifica como UTF-8, tolerando caracteres cortados nas bordas"""
+    if meio_de_arquivo:
+        # Descartar bytes de continuação de um caractere iniciado antes da amostra
+        descartar = 0
+        while descartar < 3 and descartar < len(amostra) and 0x80 <= amostra[descartar] <= 0xBF:
+            descartar += 1
+        amostra = amostra[descartar:]
+    decodificador = codecs.getincrementaldecoder('utf-8')()
+    try:
+        decodificador.decode(amostra, final=False)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+@functools.lru_cache(maxsize=64)
+def _detectar_codificacao(caminho, tamanho, mtime_ns):
+    inicio, outras = _amostras(caminho, tamanho)
+    if inicio.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if _utf8_valido(inicio, False) and all(_utf8_valido(amostra, True) for amostra in outras):
+        return 'utf-8'
+    return CODIFICACAO_ALTERNATIVA
+
+
+def detectar_codificacao(caminho):
+    """Decide a codificação pelo BOM e por uma amostra limitada de bytes
+
+    A decisão fica em cache por arquivo (caminho, tamanho e data de modificação).
+    Arquivos com BOM UTF-8 usam 'utf-8-sig', que remove o BOM do nome da primeira coluna.
+    """
+    impressao = impressao_digital(caminho, com_hash=False)
+    return _detectar_codificacao(os.path.abspath(caminho), impressao['tamanho'], impressao['mtime_ns'])
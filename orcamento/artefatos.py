@@ -0,0 +1,156 @@
+"""Armazém em disco dos artefatos derivados (cubos, índices, agregados e figuras)
+
+Os caches do Streamlit vivem na memória do processo e se perdem a cada
+reinício; este armazém guarda em disco (pasta .cache/artefatos/) o resultado de
+cada montagem, para que um servidor novo já comece com tudo pronto. Cada
+artefato é chaveado pelo nome, pela chave informada (versões dos dados e
+parâmetros) e pela versão do código (hash dos arquivos que o montam): mudar um
+CSV ou o código só faz ler outra entrada, e as antigas deixam de ser usadas.
+
+O armazém tem um limite de bytes (ORCAMENTO_ARTEFATOS_BYTES). A cada leitura a
+data de modificação do arquivo é renovada; quando uma gravação passa do limite,
+saem os artefatos usados há mais tempo. O total de bytes é mantido em memória
+por processo e só é conferido no disco quando parece ter passado do limite.
+
+Os artefatos são gravados com pickle, e ler um pickle executa código: a pasta
+.cache/ precisa ser confiável, escrita só pelos próprios dashboards e sem
+permissão de escrita para outros usuários. Nunca copie para ela artefatos de
+outra origem. Só usa a biblioteca padrão para servir também ao app_simple.py.
+"""
+import glob
+import hashlib
+import logging
+import os
+import pickle
+import threading
+
+from orcamento.arquivos import DIRETORIO_CACHE, gravar_atomico, versao_dados
+
+DIRETORIO_ARTEFATOS = os.path.join(DIRETORIO_CACHE, 'artefatos')
+
+LIMITE_BYTES = int(os.environ.get('ORCAMENTO_ARTEFATOS_BYTES', 512 * 1024 * 1024))
+
+# Incrementar quando o formato gravado mudar de forma incompatível
+VERSAO_FORMATO = 1
+
+EXTENSAO = '.pkl'
+
+# Erros de um artefato ausente, pela metade ou corrompido
+ERROS_LEITURA = (OSError, EOFError, pickle.UnpicklingError)
+
+# Erros de um artefato gravado por outra versão de uma biblioteca (classe movida ou removida)
+ERROS_VERSAO = (ImportError, AttributeError)
+
+logger = logging.getLogger(__name__)
+
+
+def versao_codigo(*caminhos):
+    """Versão do código que monta os artefatos: os arquivos informados e os módulos do pacote"""
+    pacote = sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*.py')))
+    return versao_dados(*caminhos, *pacote)
+
+
+class Artefatos:
+    """Artefatos em disco de uma versão do código, com limite de bytes e descarte LRU"""
+
+    def __init__(self, versao_codigo, diretorio=DIRETORIO_ARTEFATOS, limite=LIMITE_BYTES):
+        self.versao_codigo = versao_codigo
+        self.diretorio = diretorio
+        self.limite = limite
+        self.ocupados = None
+        self.trava = threading.Lock()
+
+    def caminho(self, nome, chave):
+        """Arquivo do artefato: pasta pelo nome e arquivo pelo hash da chave e das versões"""
+        h = hashlib.blake2b(digest_size=16)
+        h.update(repr((VERSAO_FORMATO, self.versao_codigo, nome, chave)).encode('utf-8'))
+        return os.path.join(self.diretorio, nome, h.hexdigest() + EXTENSAO)
+
+    def carregar(self, nome, chave, montar):
+        """Artefato lido do disco; se ausente ou ilegível, montado por montar() e gravado
+
+        chave: tupla de textos e números que, com o nome, determina o resultado de
+        montar (versões dos dados e parâmetros). Falhas ao gravar não impedem o uso
+        do artefato montado.
+        """
+        caminho = self.caminho(nome, chave)
+        try:
+            with open(caminho, 'rb') as arquivo:
+                artefato = pickle.load(arquivo)
+        except Exception as erro:
+            if isinstance(erro, ERROS_VERSAO):
+                logger.info("artefato %s de outra versão das bibliotecas, remontando: %s", caminho, erro)
+            elif not isinstance(erro, ERROS_LEITURA):
+                logger.exception("erro inesperado ao ler o artefato %s, remontando", caminho)
+            artefato = montar()
+            try:
+                self.gravar(caminho, artefato)
+            except (OSError, pickle.PicklingError):
+                pass
+            return artefato
+
+        # Marca o uso para o descarte LRU
+        try:
+            os.utime(caminho)
+        except OSError:
+            pass
+        return artefato
+
+    def gravar(self, caminho, artefato):
+        """Grava o artefato e descarta os mais antigos se o armazém passar do limite
+
+        Só a primeira gravação do processo percorre a pasta; as seguintes somam o
+        tamanho gravado ao total em memória e só podam quando ele passa do limite.
+        """
+        dados = pickle.dumps(artefato, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(dados) > self.limite:
+            return
+
+        def escrever(temporario):
+            with open(temporario, 'wb') as arquivo:
+                arquivo.write(dados)
+
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        try:
+            substituido = os.path.getsize(caminho)
+        except OSError:
+            substituido = 0
+        gravar_atomico(caminho, escrever)
+        with self.trava:
+            if self.ocupados is None:
+                self.ocupados = self.tamanho()
+            else:
+                self.ocupados += len(dados) - substituido
+            if self.ocupados > self.limite:
+                self.ocupados = self.podar(preservar=caminho)
+
+    def arquivos(self):
+        """(data de uso, tamanho, caminho) de cada artefato gravado"""
+        encontrados = []
+        for caminho in glob.glob(os.path.join(self.diretorio, '*', '*' + EXTENSAO)):
+            try:
+                stat = os.stat(caminho)
+            except OSError:
+                continue
+            encontrados.append((stat.st_mtime_ns, stat.st_size, caminho))
+        return encontrados
+
+    def tamanho(self):
+        """Bytes ocupados pelos artefatos gravados"""
+        return sum(tamanho for _, tamanho, _ in self.arquivos())
+
+    def podar(self, preservar=None):
+        """Remove os artefatos usados há mais tempo até o armazém caber no limite; devolve os bytes que restam"""
+        arquivos = sorted(self.arquivos())
+        ocupados = sum(tamanho for _, tamanho, _ in arquivos)
+        for _, tamanho, caminho in arquivos:
+            if ocupados <= self.limite:
+                break
+            if caminho == preservar:
+                continue
+            try:
+                os.remove(caminho)
+            except OSError:
+                continue
+            ocupados -= tamanho
+        return ocupados
@@ -0,0 +1,90 @@
+"""Índice invertido para as buscas textuais (descrições e fornecedores)
+
+Os textos são normalizados uma vez na carga (sem acentos e sem diferença entre
+maiúsculas e minúsculas, então "saude" encontra "SAÚDE") e indexados por
+trigramas e por palavras. Textos repetidos (o mesmo fornecedor em vários
+empenhos) entram uma única vez, com a lista das linhas onde aparecem. Cada termo
+da consulta precisa aparecer no texto (E entre os termos): termos com três ou
+mais letras são procurados em qualquer posição pela interseção das listas dos
+seus trigramas; termos mais curtos, como início de palavra, por duas buscas
+binárias nas palavras ordenadas. Só usa a biblioteca padrão para servir também
+ao app_simple.py.
+"""
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict, namedtuple
+
+TAMANHO_TRIGRAMA = 3
+
+# textos: textos normalizados distintos; linhas: posições de cada texto na tabela;
+# trigramas: {trigrama: ids dos textos}; palavras: palavras ordenadas, com os ids
+# dos textos de cada uma em textos_palavras
+IndiceTexto = namedtuple('IndiceTexto', ['textos', 'linhas', 'trigramas', 'palavras', 'textos_palavras', 'total'])
+
+
+def normalizar(texto):
+    """Texto sem acentos, em minúsculas (casefold)"""
+    decomposto = unicodedata.normalize('NFKD', texto)
+    return ''.join(caractere for caractere in decomposto if not unicodedata.combining(caractere)).casefold()
+
+
+def _trigramas(texto):
+    return {texto[inicio:inicio + TAMANHO_TRIGRAMA] for inicio in range(len(texto) - TAMANHO_TRIGRAMA + 1)}
+
+
+def indexar_textos(textos):
+    """Monta o índice de uma lista de textos (uma posição por linha da tabela)
+
+    Valores ausentes ou que não são texto ficam fora do índice.
+    """
+    ids = {}
+    linhas = []
+    for posicao, texto in enumerate(textos):
+        if not isinstance(texto, str):
+            continue
+        normalizado = normalizar(texto)
+        if normalizado not in ids:
+            ids[normalizado] = len(linhas)
+            linhas.append([])
+        linhas[ids[normalizado]].append(posicao)
+
+    trigramas = defaultdict(set)
+    por_palavra = defaultdict(set)
+    for normalizado, id_texto in ids.items():
+        for trigrama in _trigramas(normalizado):
+            trigramas[trigrama].add(id_texto)
+        for palavra in normalizado.split():
+            por_palavra[palavra].add(id_texto)
+
+    palavras = sorted(por_palavra)
+    return IndiceTexto(
+        list(ids), linhas, dict(trigramas), palavras, [por_palavra[palavra] for palavra in palavras], len(textos),
+    )
+
+
+def _textos_do_termo(indice, termo):
+    if len(termo) >= TAMANHO_TRIGRAMA:
+        listas = sorted((indice.trigramas.get(trigrama, set()) for trigrama in _trigramas(termo)), key=len)
+        candidatos = listas[0].intersection(*listas[1:])
+        # Trigramas em comum não garantem a sequência inteira: confirmar no texto
+        return {id_texto for id_texto in candidatos if termo in indice.textos[id_texto]}
+    inicio = bisect_left(indice.palavras, termo)
+    fim = bisect_left(indice.palavras, termo[:-1] + chr(ord(termo[-1]) + 1), inicio)
+    return set().union(*indice.textos_palavras[inicio:fim])
+
+
+def buscar(indice, consulta):
+    """Posições (em ordem crescente) das linhas cujo texto contém todos os termos da consulta
+
+    Consulta sem nenhum termo não filtra: retorna todas as posições.
+    """
+    termos = sorted(set(normalizar(consulta).split()), key=len, reverse=True)
+    if not termos:
+        return list(range(indice.total))
+    encontrados = None
+    for termo in termos:
+        do_termo = _textos_do_termo(indice, termo)
+        encontrados = do_termo if encontrados is None else encontrados & do_termo
+        if not encontrados:
+            return []
+    return sorted(posicao for id_texto in encontrados for posicao in indice.linhas[id_texto])
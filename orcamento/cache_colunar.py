@@ -0,0 +1,109 @@
+"""Cache colunar (Parquet) dos CSVs já tipados e limpos
+
+Cada CSV é tokenizado e convertido uma única vez por versão do arquivo. As cargas
+seguintes leem o Parquet enquanto tamanho/data de modificação ou o hash do CSV de
+origem continuarem iguais aos registrados no manifesto. Os metadados do DataFrame
+(df.attrs, ex.: células inválidas e totais do rodapé) são guardados no manifesto, que é JSON.
+"""
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from orcamento.arquivos import DIRETORIO_CACHE, gravar_atomico, impressao_digital
+from orcamento.leitura import ler_tabela
+
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_DISPONIVEL = True
+except ImportError:
+    PARQUET_DISPONIVEL = False
+
+# Incrementar quando o formato gravado mudar de forma incompatível
+VERSAO_FORMATO = 4
+
+
+def assinatura_esquema(esquema):
+    """Identifica o esquema para invalidar o cache quando colunas ou tipos mudarem"""
+    h = hashlib.blake2b(digest_size=8)
+    h.update(repr(esquema).encode('utf-8'))
+    return f"{esquema.nome}-{h.hexdigest()}"
+
+
+def _caminhos_cache(esquema, diretorio):
+    base = os.path.join(diretorio, 'colunar', esquema.nome)
+    return base + '.parquet', base + '.json'
+
+
+def ler_manifesto(arquivo_manifesto):
+    """Lê um manifesto JSON; retorna None se ausente ou corrompido"""
+    try:
+        with open(arquivo_manifesto, 'r', encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except (OSError, ValueError):
+        return None
+
+
+def gravar_manifesto(arquivo_manifesto, manifesto):
+    def escrever(temporario):
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump(manifesto, arquivo)
+    gravar_atomico(arquivo_manifesto, escrever)
+
+
+def conferir_origem(caminho, origem):
+    """Compara o arquivo com a impressão digital registrada
+
+    Retorna (inalterado, impressao). Tamanho e data de modificação iguais bastam;
+    se a data mudou (ex.: novo checkout), o conteúdo é conferido pelo hash. A
+    impressão retornada sempre inclui o hash.
+    """
+    impressao = impressao_digital(caminho, com_hash=False)
+    if origem and origem['tamanho'] == impressao['tamanho'] and origem['mtime_ns'] == impressao['mtime_ns']:
+        return True, origem
+    impressao = impressao_digital(caminho)
+    inalterado = bool(origem) and origem['tamanho'] == impressao['tamanho'] and origem.get('hash') == impressao['hash']
+    return inalterado, impressao
+
+
+def _ler_parquet(arquivo_parquet, manifesto):
+    df = pd.read_parquet(arquivo_parquet)
+    df.attrs = manifesto.get('attrs', {})
+    return df
+
+
+def carregar_tabela(esquema, diretorio=DIRETORIO_CACHE):
+    """Carrega a tabela do esquema, usando o Parquet em cache quando o CSV não mudou"""
+    if not PARQUET_DISPONIVEL:
+        return ler_tabela(esquema)
+
+    arquivo_parquet, arquivo_manifesto = _caminhos_cache(esquema, diretorio)
+    assinatura = assinatura_esquema(esquema)
+    manifesto = ler_manifesto(arquivo_manifesto)
+
+    valido = (
+        manifesto is not None
+        and manifesto.get('versao_formato') == VERSAO_FORMATO
+        and manifesto.get('esquema') == assinatura
+        and os.path.exists(arquivo_parquet)
+    )
+
+    inalterado, impressao = conferir_origem(esquema.arquivo, manifesto['origem'] if valido else None)
+    if inalterado:
+        if impressao is not manifesto['origem']:
+            manifesto['origem'] = impressao
+            gravar_manifesto(arquivo_manifesto, manifesto)
+        return _ler_parquet(arquivo_parquet, manifesto)
+
+    df = ler_tabela(esquema)
+
+    os.makedirs(os.path.dirname(arquivo_parquet), exist_ok=True)
+    gravar_atomico(arquivo_parquet, lambda temporario: df.to_parquet(temporario, index=False))
+    gravar_manifesto(arquivo_manifesto, {
+        'versao_formato': VERSAO_FORMATO,
+        'esquema': assinatura,
+        'origem': impressao,
+        'attrs': df.attrs,
+    })
+    return df
@@ -0,0 +1,110 @@
+"""Índice de prefixos sobre os códigos de classificação da receita (CODRE/Código)
+
+Os códigos são ordenados uma única vez por versão do arquivo; como todos os
+códigos com um mesmo prefixo ficam contíguos na ordem lexicográfica, cada
+consulta por prefixo vira duas buscas binárias (bisect) e a soma de um intervalo
+sai das somas acumuladas, sem percorrer as linhas. Só usa a biblioteca padrão
+para servir também ao app_simple.py.
+"""
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from itertools import accumulate
+
+# Categorias (4 primeiros dígitos) usadas pelos dashboards
+TRIBUTARIAS = ('1112', '1113', '1114', '1121', '1122')
+TRANSFERENCIAS_UNIAO = ('1711', '1712', '1713', '1714', '1716')
+TRANSFERENCIAS_ESTADO = ('1721', '1722', '1723', '1724')
+FUNDEB = ('1751',)
+TRANSFERENCIAS = TRANSFERENCIAS_UNIAO + TRANSFERENCIAS_ESTADO + FUNDEB
+
+# codigos: códigos ordenados; posicoes: linha original de cada código ordenado;
+# somas: {coluna: somas acumuladas na mesma ordem, com zero na frente}
+IndicePrefixos = namedtuple('IndicePrefixos', ['codigos', 'posicoes', 'somas'])
+
+
+def indexar_prefixos(codigos, valores=None):
+    """Monta o índice a partir da lista de códigos e de {coluna: lista de valores}
+
+    Códigos vazios ou ausentes ficam fora do índice (nenhum prefixo os alcança).
+    Com valores inteiros (centavos) as somas são exatas.
+    """
+    posicoes = sorted(
+        (posicao for posicao, codigo in enumerate(codigos) if isinstance(codigo, str) and codigo),
+        key=codigos.__getitem__,
+    )
+    somas = {
+        coluna: list(accumulate((lista[posicao] for posicao in posicoes), initial=0))
+        for coluna, lista in (valores or {}).items()
+    }
+    return IndicePrefixos([codigos[posicao] for posicao in posicoes], posicoes, somas)
+
+
+def indexar_tabela(df, coluna, valores=()):
+    """Índice de prefixos de uma coluna de códigos de um DataFrame, com somas das colunas de valores"""
+    return indexar_prefixos(
+        df[coluna].tolist(),
+        {valor: df[valor].tolist() for valor in valores},
+    )
+
+
+def _limite_superior(prefixo):
+    # Menor texto maior que todos os que começam com o prefixo
+    return prefixo[:-1] + chr(ord(prefixo[-1]) + 1)
+
+
+def prefixo_da_conta(codigo):
+    """Prefixo comum a todos os códigos abaixo de uma conta sintética
+
+    Segmentos zerados à direita não restringem. No primeiro segmento cada dígito é
+    um nível (1000 > 1100 > 1110 > 1112); nos demais, o segmento vale inteiro
+    (1321.01.0.1.90.00 cobre 1321.01.0.1.90.*, mas não 1321.01.0.1.09.*).
+    """
+    segmentos = codigo.split('.')
+    significativos = len(segmentos)
+    while significativos > 1 and not segmentos[significativos - 1].strip('0'):
+        significativos -= 1
+    if significativos == len(segmentos):
+        return codigo
+    if significativos > 1:
+        return '.'.join(segmentos[:significativos]) + '.'
+    return segmentos[0].rstrip('0')
+
+
+def intervalos_prefixo(indice, prefixos):
+    """Intervalos [inicio, fim) do índice cobertos por um prefixo ou tupla de prefixos
+
+    Prefixos sobrepostos (ex.: '1112' e '1112.5') são unidos, então cada
+    código entra uma única vez.
+    """
+    if isinstance(prefixos, str):
+        prefixos = (prefixos,)
+    intervalos = []
+    for prefixo in sorted(prefixos):
+        inicio = bisect_left(indice.codigos, prefixo)
+        fim = bisect_left(indice.codigos, _limite_superior(prefixo), inicio) if prefixo else len(indice.codigos)
+        if intervalos and inicio <= intervalos[-1][1]:
+            intervalos[-1] = (intervalos[-1][0], max(fim, intervalos[-1][1]))
+        elif inicio < fim:
+            intervalos.append((inicio, fim))
+    return intervalos
+
+
+def posicoes_prefixo(indice, prefixos):
+    """Linhas originais (em ordem crescente) cujos códigos começam com algum dos prefixos"""
+    return sorted(
+        posicao
+        for inicio, fim in intervalos_prefixo(indice, prefixos)
+        for posicao in indice.posicoes[inicio:fim]
+    )
+
+
+def somar_prefixo(indice, prefixos, coluna):
+    """Soma da coluna nas linhas cujos códigos começam com algum dos prefixos"""
+    somas = indice.somas[coluna]
+    return sum(somas[fim] - somas[inicio] for inicio, fim in intervalos_prefixo(indice, prefixos))
+
+
+def intervalo_codigo(indice, codigo):
+    """Intervalo [inicio, fim) do índice com exatamente o código informado"""
+    inicio = bisect_left(indice.codigos, codigo)
+    return inicio, bisect_right(indice.codigos, codigo, inicio)
@@ -0,0 +1,88 @@
+"""Tabela colunar e agregação numa única passada, sem pandas (para o app_simple.py)
+
+As linhas do CSV viram colunas na carga: cada coluna de texto é uma lista de
+strings internadas (os códigos se repetem entre linhas e anos e passam a ocupar
+uma única string cada) e cada coluna monetária é um array('q') de centavos,
+convertido do formato brasileiro uma única vez. As páginas leem as colunas pela
+posição da linha, sem reconverter valores.
+
+agregar_categorias soma todas as categorias (tuplas de prefixos do código) e os
+grupos de código numa única varredura das colunas. As categorias que cada
+código alcança são resolvidas uma vez por código distinto.
+"""
+import sys
+from array import array
+from collections import defaultdict, namedtuple
+
+from orcamento.conversao import CENTAVOS_POR_REAL, numerico, numero_br
+from orcamento.esquemas import MONETARIO
+
+# textos: {coluna: lista de strings}; valores: {coluna: array('q') em centavos}; total: linhas
+TabelaColunar = namedtuple('TabelaColunar', ['textos', 'valores', 'total'])
+
+
+def centavos(valor):
+    """Valor no formato brasileiro em centavos (inteiro); inválido ou vazio vale zero"""
+    if numerico(valor):
+        # Células já numéricas: direto, sem passar por texto (NaN vale zero)
+        return round(valor * CENTAVOS_POR_REAL) if valor == valor else 0
+    numero = numero_br(valor)
+    return round(numero * CENTAVOS_POR_REAL) if numero is not None else 0
+
+
+def montar_colunas(linhas, esquema):
+    """Tabela colunar com as colunas declaradas no esquema, numa única leitura das linhas
+
+    Colunas MONETARIO viram centavos; as demais ficam como texto ('' quando
+    ausentes). Aceita qualquer iterável de dicionários (ex.: csv.DictReader).
+    """
+    monetarias = [coluna for coluna, tipo in esquema.colunas.items() if tipo == MONETARIO]
+    textuais = [coluna for coluna in esquema.colunas if coluna not in monetarias]
+    textos = {coluna: [] for coluna in textuais}
+    valores = {coluna: array('q') for coluna in monetarias}
+    total = 0
+    for linha in linhas:
+        for coluna in textuais:
+            textos[coluna].append(sys.intern(linha.get(coluna) or ''))
+        for coluna in monetarias:
+            valores[coluna].append(centavos(linha.get(coluna)))
+        total += 1
+    return TabelaColunar(textos, valores, total)
+
+
+def _destinos(codigo, por_prefixo, tamanhos):
+    # Categorias alcançadas pelo código, cada uma uma única vez
+    destinos = set()
+    for tamanho in tamanhos:
+        if tamanho > len(codigo):
+            break
+        destinos.update(por_prefixo.get(codigo[:tamanho], ()))
+    return tuple(destinos)
+
+
+def agregar_categorias(codigos, valores, categorias, tamanho_grupo):
+    """Soma dos valores por categoria e por grupo de código, numa única passada
+
+    categorias: {nome: prefixo ou tupla de prefixos}. Prefixos sobrepostos de uma
+    mesma categoria (ex.: '1112' e '1112.5') contam a linha uma única vez; o
+    prefixo '' alcança todas as linhas, inclusive as sem código. Os grupos são os
+    primeiros tamanho_grupo caracteres dos códigos não vazios. Retorna
+    ({categoria: soma}, {grupo: soma}).
+    """
+    por_prefixo = defaultdict(set)
+    for nome, prefixos in categorias.items():
+        for prefixo in (prefixos,) if isinstance(prefixos, str) else prefixos:
+            por_prefixo[prefixo].add(nome)
+    tamanhos = sorted({len(prefixo) for prefixo in por_prefixo})
+    somas = dict.fromkeys(categorias, 0)
+    grupos = defaultdict(int)
+    resolvidos = {}
+    for codigo, valor in zip(codigos, valores):
+        destinos = resolvidos.get(codigo)
+        if destinos is None:
+            destinos = resolvidos[codigo] = _destinos(codigo, por_prefixo, tamanhos)
+        for nome in destinos:
+            somas[nome] += valor
+        if codigo:
+            grupos[codigo[:tamanho_grupo]] += valor
+    return somas, dict(grupos)
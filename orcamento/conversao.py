@@ -0,0 +1,158 @@
+"""Conversão de números no formato brasileiro ("1.234.567,89")
+
+O conversor escalar usa apenas a biblioteca padrão (usado por app_simple.py); as
+versões vetorizadas trabalham com colunas inteiras do pandas e só importam pandas
+quando chamadas. Valores monetários dos dashboards ficam em centavos (int64), de
+modo que as somas são exatas; a conversão para reais só acontece na exibição.
+
+Também são aceitos o ponto decimal com uma ou duas casas ("1234.56", como sai de
+planilhas exportadas) e células que já são numéricas, convertidas diretamente.
+"""
+import numbers
+import re
+
+# Inteiro com ou sem separador de milhares, vírgula decimal opcional
+PADRAO_NUMERO_BR = r'-?(?:\d{1,3}(?:\.\d{3})+|\d+)(?:,\d+)?'
+_REGEX_NUMERO_BR = re.compile(PADRAO_NUMERO_BR)
+
+# Ponto decimal com uma ou duas casas e sem vírgula; com três dígitos depois do
+# ponto ele continua sendo separador de milhares ("1.234" é mil duzentos e trinta e quatro)
+PADRAO_NUMERO_PONTO = r'-?\d+\.\d{1,2}'
+_REGEX_NUMERO_PONTO = re.compile(PADRAO_NUMERO_PONTO)
+
+COLUNAS_INVALIDAS = ['coluna', 'linha', 'valor']
+
+CENTAVOS_POR_REAL = 100
+
+
+def numerico(valor):
+    """Indica se o valor já é um número (int, float ou escalar do numpy), e não um texto"""
+    return isinstance(valor, numbers.Real) and not isinstance(valor, bool)
+
+
+def numero_br(valor):
+    """Converte um valor no formato brasileiro para float; retorna None se inválido"""
+    if numerico(valor):
+        return float(valor)
+    if valor is None:
+        return None
+    texto = str(valor).strip()
+    if _REGEX_NUMERO_PONTO.fullmatch(texto):
+        return float(texto)
+    if not _REGEX_NUMERO_BR.fullmatch(texto):
+        return None
+    return float(texto.replace('.', '').replace(',', '.'))
+
+
+def _validar_coluna(serie):
+    """Retorna (texto, valido, invalido, numeros) para uma coluna de textos no formato brasileiro
+
+    texto vem com o ponto decimal já trocado por vírgula; numeros tem as células
+    que já eram numéricas (NaN nas demais), que ficam fora de texto.
+    """
+    import pandas as pd
+
+    ja_numerico = serie.map(numerico).astype(bool)
+    numeros = pd.to_numeric(serie.where(ja_numerico), errors='coerce').astype('float64')
+    texto = serie.where(~ja_numerico).astype('string').str.strip()
+    ponto = texto.str.fullmatch(PADRAO_NUMERO_PONTO).fillna(False).astype(bool)
+    texto = texto.where(~ponto, texto.str.replace('.', ',', regex=False))
+    vazio = texto.isna() | (texto == '')
+    valido = texto.str.fullmatch(PADRAO_NUMERO_BR).fillna(False).astype(bool)
+    return texto, valido, ~vazio & ~valido, numeros
+
+
+def converter_coluna_br(serie):
+    """Converte uma coluna inteira de textos no formato brasileiro
+
+    Retorna (valores, invalidos): valores em float64, com células vazias e
+    inválidas como 0.0, e a série com os textos originais das células inválidas.
+    """
+    import pandas as pd
+
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype('float64').fillna(0.0), serie.iloc[0:0]
+
+    texto, valido, invalido, numeros = _validar_coluna(serie)
+    limpo = (
+        texto.where(valido)
+        .str.replace('.', '', regex=False)
+        .str.replace(',', '.', regex=False)
+    )
+    valores = numeros.fillna(pd.to_numeric(limpo, errors='coerce')).fillna(0.0).astype('float64')
+    return valores, serie[invalido]
+
+
+def converter_coluna_centavos(serie):
+    """Converte uma coluna de textos no formato brasileiro para centavos (int64)
+
+    Retorna (centavos, invalidos) como converter_coluna_br. A conversão trabalha
+    sobre os dígitos, sem passar por float; casas além dos centavos são
+    arredondadas (meio para cima).
+    """
+    import pandas as pd
+
+    if pd.api.types.is_integer_dtype(serie):
+        return serie.fillna(0).astype('int64') * CENTAVOS_POR_REAL, serie.iloc[0:0]
+    if pd.api.types.is_numeric_dtype(serie):
+        return (serie.fillna(0.0) * CENTAVOS_POR_REAL).round().astype('int64'), serie.iloc[0:0]
+
+    texto, valido, invalido, numeros = _validar_coluna(serie)
+    numero = texto.where(valido, '0').str.replace('.', '', regex=False)
+    negativo = numero.str.startswith('-').astype(bool)
+    partes = numero.str.lstrip('-').str.partition(',')
+    decimais = partes[2].str.pad(3, side='right', fillchar='0')
+
+    centavos = (
+        partes[0].astype('int64') * CENTAVOS_POR_REAL
+        + decimais.str[:2].astype('int64')
+        + (decimais.str[2] >= '5').astype('int64')
+    )
+    centavos = centavos.where(~negativo, -centavos)
+    # Células que já eram numéricas: direto, sem passar por texto
+    centavos = centavos.where(numeros.isna(), (numeros * CENTAVOS_POR_REAL).round()).astype('int64')
+    return centavos, serie[invalido]
+
+
+def em_reais(centavos):
+    """Converte centavos (escalar ou série) para reais, apenas para exibição"""
+    return centavos / CENTAVOS_POR_REAL
+
+
+def reais_para_centavos(reais):
+    """Converte um valor em reais digitado pelo usuário para centavos"""
+    return int(round(reais * CENTAVOS_POR_REAL))
+
+
+def colunas_em_reais(df, *colunas):
+    """Cópia do DataFrame com as colunas em centavos convertidas para reais (gráficos)"""
+    return df.assign(**{coluna: em_reais(df[coluna]) for coluna in colunas})
+
+
+def converter_colunas_br(df, colunas, conversor=converter_coluna_br):
+    """Converte as colunas monetárias de um DataFrame
+
+    Retorna (df, invalidas): uma cópia com as colunas convertidas pelo conversor
+    (float por padrão, ou converter_coluna_centavos) e uma tabela com as colunas
+    'coluna', 'linha' e 'valor' das células rejeitadas.
+    """
+    import pandas as pd
+
+    df = df.copy()
+    partes = []
+    for col in colunas:
+        if col not in df.columns:
+            continue
+        df[col], invalidos = conversor(df[col])
+        if not invalidos.empty:
+            partes.append(pd.DataFrame({
+                'coluna': col,
+                'linha': invalidos.index,
+                'valor': invalidos.astype(str).values,
+            }))
+
+    if partes:
+        invalidas = pd.concat(partes, ignore_index=True)
+    else:
+        invalidas = pd.DataFrame(columns=COLUNAS_INVALIDAS)
+    return df, invalidas
@@ -0,0 +1,134 @@
+"""Registro dos esquemas de cada conjunto de dados
+
+Cada esquema declara o arquivo de origem, as colunas que os dashboards usam e o
+tipo de cada uma. As demais colunas do CSV não são lidas. Os tipos são dtypes
+do pandas (categorias para textos repetitivos, inteiros pequenos para códigos)
+ou os conversores MONETARIO (centavos em int64) e DATA, aplicados na leitura por
+orcamento.leitura.ler_tabela. Quando o Portal exporta uma linha de totais no fim
+do arquivo, 'rodape' indica a coluna que fica vazia nessa linha. Quando o
+arquivo mistura lançamentos com linhas de totais das contas sintéticas, 'folha'
+indica a coluna preenchida só nos lançamentos. 'derivadas'
+declara colunas calculadas uma única vez na carga, como prefixos dos códigos de
+classificação ({nova coluna: (coluna de origem, tamanho do prefixo)}), para que
+os dashboards nunca precisem alterar a tabela compartilhada. 'dimensao' declara
+colunas que dependem só de uma chave e se repetem em todas as linhas dela (a
+dotação de cada ficha aparece em todos os seus empenhos): (chave, colunas). Elas
+ficam uma vez por chave numa tabela à parte, onde são somadas, e os valores
+monetários entre elas saem da tabela de fatos. Este módulo só usa a biblioteca
+padrão para que app_simple.py também possa consultar as colunas declaradas.
+"""
+from collections import namedtuple
+
+# Conversores especiais (lidos como texto e convertidos após a leitura)
+MONETARIO = 'monetario'
+DATA = 'data'
+
+FORMATO_DATA = '%d/%m/%Y'
+
+Esquema = namedtuple(
+    'Esquema',
+    ['nome', 'arquivo', 'colunas', 'rodape', 'folha', 'derivadas', 'dimensao'],
+    defaults=(None, None, None, None),
+)
+
+# Prefixos da classificação da receita: categoria (ex.: 1112) e subcategoria (ex.: 1112.50)
+NIVEIS_RECEITA = {'nivel_1': 4, 'nivel_2': 7}
+
+# Valores da ficha (dotação orçamentária), repetidos pelo Portal em cada empenho
+DOTACOES = ['Dotação', 'Alteração Dotação', 'Dotação Atual']
+
+
+def colunas_do_tipo(esquema, tipo):
+    """Lista as colunas do esquema declaradas com o tipo informado"""
+    return [coluna for coluna, tipo_coluna in esquema.colunas.items() if tipo_coluna == tipo]
+
+
+def valores_da_dimensao(esquema):
+    """Colunas monetárias da dimensão do esquema, que não entram nas somas dos fatos"""
+    if esquema.dimensao is None:
+        return []
+    return [coluna for coluna in esquema.dimensao[1] if esquema.colunas[coluna] == MONETARIO]
+
+
+def valores_dos_fatos(esquema):
+    """Colunas monetárias somadas linha a linha (todas menos as da dimensão)"""
+    dimensao = valores_da_dimensao(esquema)
+    return [coluna for coluna in colunas_do_tipo(esquema, MONETARIO) if coluna not in dimensao]
+
+
+RECEITAS_EXECUTADAS = Esquema(
+    nome='receitas_executadas',
+    arquivo="Portal Transparencia Receitas Acumuladas - Exercício 2025 (1).csv",
+    colunas={
+        'Código': 'string',
+        'Especificação': 'string',
+        'Cod. Aplicação': 'category',
+        'Fonte de Recurso': 'category',
+        'Prev. Atualizada': MONETARIO,
+        'Arrec. Total': MONETARIO,
+    },
+    rodape='Código',
+    folha='Cod. Aplicação',
+    derivadas={nome: ('Código', tamanho) for nome, tamanho in NIVEIS_RECEITA.items()},
+)
+
+DESPESAS_EXECUTADAS = Esquema(
+    nome='despesas_executadas',
+    arquivo="Portal Transparencia Despesas Gerais - Exercício 2025.csv",
+    colunas={
+        'Empenho': 'Int32',
+        'Tipo': 'category',
+        'N° Ficha': 'Int32',
+        'Data': DATA,
+        'Cód. Forn.': 'Int32',
+        'Nome Fornecedor': 'category',
+        'CPF/CNPJ': 'string',
+        'Dotação': MONETARIO,
+        'Alteração Dotação': MONETARIO,
+        'Dotação Atual': MONETARIO,
+        'Valor Empenhado': MONETARIO,
+        'Empenhado até Hoje': MONETARIO,
+        'Liquidado até Hoje': MONETARIO,
+        'Pago até Hoje': MONETARIO,
+        'Função': 'Int8',
+        'Nome da Função': 'category',
+        'Subfunção': 'Int16',
+        'Nome da Subfunção': 'category',
+        'Natureza': 'category',
+        'Nome Natureza': 'category',
+        'Fonte de Recurso': 'category',
+        'Modalidade': 'category',
+    },
+    rodape='Empenho',
+    dimensao=('N° Ficha', ['Função', 'Nome da Função', 'Subfunção', 'Nome da Subfunção', *DOTACOES]),
+)
+
+RECEITAS_LOA = Esquema(
+    nome='receitas_loa',
+    arquivo="download-123842.557.csv",
+    colunas={
+        'NOME': 'string',
+        'FICHA': 'Int32',
+        'CODRE': 'string',
+        'TOTOR': MONETARIO,
+        'NIVEL': 'Int8',
+        'FONTE': 'category',
+    },
+    derivadas={nome: ('CODRE', tamanho) for nome, tamanho in NIVEIS_RECEITA.items()},
+)
+
+ESTRUTURA_LOA = Esquema(
+    nome='estrutura_loa',
+    arquivo="download-123701.452.csv",
+    colunas={
+        'CODRE': 'string',
+        'NOMRE': 'string',
+        'NIVEL': 'Int8',
+        **{f'N{nivel}': 'string' for nivel in range(1, 11)},
+    },
+)
+
+ESQUEMAS = {
+    esquema.nome: esquema
+    for esquema in (RECEITAS_EXECUTADAS, DESPESAS_EXECUTADAS, RECEITAS_LOA, ESTRUTURA_LOA)
+}
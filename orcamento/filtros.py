@@ -0,0 +1,62 @@
+"""Filtros por máscara de linhas (bitmaps) para as tabelas linha a linha
+
+Cada filtro vira uma máscara booleana do tamanho da tabela, que pode ficar em
+cache pelo valor do parâmetro; aplicar vários filtros é só um E bit a bit entre
+as máscaras. Filtros de intervalo (valor mínimo, data inicial) usam a coluna
+ordenada uma única vez: o limite é encontrado por busca binária (searchsorted) e
+as linhas acima dele já estão contíguas na ordem. As máscaras retornadas são
+somente leitura, para poderem ser compartilhadas entre sessões.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from orcamento.paginacao import OrdemColuna
+
+# ordem: posições das linhas com valor, ordenadas pelo valor; valores: os valores nessa ordem
+IndiceIntervalo = namedtuple('IndiceIntervalo', ['ordem', 'valores', 'total'])
+
+
+def _somente_leitura(mascara):
+    mascara.setflags(write=False)
+    return mascara
+
+
+def indexar_intervalo(serie):
+    """Ordena uma coluna (numérica ou de datas) para filtros de intervalo; valores ausentes ficam fora"""
+    validas = np.flatnonzero(serie.notna().to_numpy())
+    valores = serie.iloc[validas].to_numpy()
+    ordem = np.argsort(valores, kind='stable')
+    return IndiceIntervalo(validas[ordem], valores[ordem], len(serie))
+
+
+def mascara_minimo(indice, minimo):
+    """Linhas com valor maior ou igual ao mínimo"""
+    inicio = np.searchsorted(indice.valores, minimo, side='left')
+    mascara = np.zeros(indice.total, dtype=bool)
+    mascara[indice.ordem[inicio:]] = True
+    return _somente_leitura(mascara)
+
+
+def mascara_igual(serie, valor):
+    """Linhas em que a coluna é igual ao valor (ausentes nunca são iguais)"""
+    return _somente_leitura((serie == valor).fillna(False).to_numpy(dtype=bool))
+
+
+def mascara_posicoes(total, posicoes):
+    """Máscara a partir das posições das linhas (ex.: resultado de orcamento.busca.buscar)"""
+    mascara = np.zeros(total, dtype=bool)
+    mascara[posicoes] = True
+    return _somente_leitura(mascara)
+
+
+def combinar_mascaras(mascaras, total):
+    """E bit a bit entre as máscaras; sem nenhuma, todas as linhas passam"""
+    if not mascaras:
+        return np.ones(total, dtype=bool)
+    return np.logical_and.reduce(mascaras)
+
+
+def ordem_em_arrays(ordem):
+    """OrdemColuna com as posições em arrays do numpy, restrita às máscaras sem laço em Python"""
+    return OrdemColuna(*(_somente_leitura(np.asarray(posicoes, dtype=np.intp)) for posicoes in ordem))
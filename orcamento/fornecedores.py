@@ -0,0 +1,86 @@
+"""Dimensão dos fornecedores das despesas, chaveada pelo CPF/CNPJ e pelo código
+
+O nome do fornecedor é texto livre: a mesma empresa pode vir com grafias
+diferentes e empresas diferentes com o mesmo nome (a CAIXA tem dois CNPJs). A
+chave de cada fornecedor é um hash (uint64) do CPF/CNPJ normalizado com o Cód.
+Forn., estável entre lotes e versões do arquivo, e os agregados agrupam por
+esse inteiro. O nome canônico é o mais frequente entre os empenhos da chave.
+
+O Portal mascara os CPFs (268.XXX.XXX-96); a normalização mantém os X para não
+juntar pessoas diferentes. O grupo de um fornecedor é a raiz do CNPJ (8
+primeiros dígitos: a empresa com todas as filiais); para CPF, o próprio
+documento.
+"""
+import pandas as pd
+
+COLUNA_CHAVE = 'id_fornecedor'
+COLUNA_GRUPO = 'grupo'
+
+TAMANHO_CNPJ = 14
+TAMANHO_RAIZ_CNPJ = 8
+
+
+def normalizar_documento(documentos):
+    """CPF/CNPJ só com dígitos (e os X da máscara), sem pontuação"""
+    return documentos.astype('string').str.upper().str.replace(r'[^0-9X]', '', regex=True)
+
+
+def chave_fornecedor(df):
+    """Chave inteira de cada linha: hash do documento normalizado com o código do fornecedor"""
+    documento = normalizar_documento(df['CPF/CNPJ']).fillna('')
+    codigo = df['Cód. Forn.'].astype('string').fillna('')
+    chave = pd.util.hash_array((documento + '|' + codigo).to_numpy(dtype=object))
+    return pd.Series(chave, index=df.index, name=COLUNA_CHAVE)
+
+
+def raiz_cnpj(documentos):
+    """Raiz (8 primeiros dígitos) dos CNPJs; outros documentos ficam inteiros"""
+    documentos = normalizar_documento(documentos)
+    eh_cnpj = documentos.str.len().eq(TAMANHO_CNPJ) & documentos.str.isdigit()
+    return documentos.where(~eh_cnpj, documentos.str[:TAMANHO_RAIZ_CNPJ])
+
+
+def contar_nomes(lote):
+    """Empenhos por (chave, CPF/CNPJ, código, nome) de um lote, para montar a dimensão"""
+    colunas = ['CPF/CNPJ', 'Cód. Forn.', 'Nome Fornecedor']
+    return (
+        lote[colunas].astype('string')
+        .assign(**{COLUNA_CHAVE: chave_fornecedor(lote)})
+        .groupby([COLUNA_CHAVE, *colunas], dropna=False)
+        .size()
+    )
+
+
+def montar_fornecedores(contagens):
+    """Dimensão dos fornecedores a partir das contagens de contar_nomes de todos os lotes
+
+    Retorna um DataFrame indexado pela chave com o nome canônico, o CPF/CNPJ e o
+    código como exportados, o grupo (raiz do CNPJ) e o total de empenhos. Em
+    empate de frequência, vale o primeiro nome em ordem alfabética.
+    """
+    contagem = (
+        pd.concat(contagens)
+        .groupby(level=list(range(contagens[0].index.nlevels)), dropna=False).sum()
+        .rename('empenhos').reset_index()
+        .sort_values(['empenhos', 'Nome Fornecedor'], ascending=[False, True])
+    )
+    fornecedores = contagem.drop_duplicates(COLUNA_CHAVE).set_index(COLUNA_CHAVE)
+    return fornecedores.assign(
+        empenhos=contagem.groupby(COLUNA_CHAVE)['empenhos'].sum(),
+        **{COLUNA_GRUPO: raiz_cnpj(fornecedores['CPF/CNPJ'])},
+    ).sort_index()
+
+
+def nomear_fornecedores(visao, fornecedores):
+    """Acrescenta nome canônico e CPF/CNPJ a uma visão que tem a chave do fornecedor no índice"""
+    return visao.join(fornecedores[['Nome Fornecedor', 'CPF/CNPJ']], on=COLUNA_CHAVE)
+
+
+def agrupar_por_raiz(visao, fornecedores):
+    """Soma uma visão por fornecedor pelos grupos (raiz do CNPJ)
+
+    O nome do grupo é o do fornecedor com mais empenhos entre os do grupo.
+    """
+    grupos = fornecedores.sort_values('empenhos', ascending=False).drop_duplicates(COLUNA_GRUPO)
+    somado = visao.groupby(fornecedores[COLUNA_GRUPO].reindex(visao.index).to_numpy()).sum()
+    return somado.rename_axis(COLUNA_GRUPO).join(grupos.set_index(COLUNA_GRUPO)[['Nome Fornecedor']])
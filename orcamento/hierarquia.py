@@ -0,0 +1,133 @@
+"""Cubo de totais sobre a árvore da classificação da receita (estrutura da LOA)
+
+A estrutura traz em N1..N10 a linhagem completa de cada conta; nos níveis abaixo
+do seu, a conta repete o próprio código. Os valores de cada tabela (TOTOR da LOA,
+previsão e arrecadação executadas) são presos à conta de cada linha e somados
+de baixo para cima de uma vez: a linhagem vira pares (conta, ancestral) e um
+único groupby pelo ancestral dá a cada conta a soma dela e de todas as
+descendentes. Treemaps, sunbursts e tabelas por nível saem direto do cubo.
+
+O arquivo de receitas executadas traz, além dos lançamentos (folhas), as linhas
+de totais de cada conta sintética, às vezes repetidas. Somas e agregados usam só
+as folhas; as sintéticas servem apenas para conferir que cada total informado é
+a soma das folhas abaixo dele.
+"""
+import pandas as pd
+
+from orcamento.classificacao import intervalo_codigo, prefixo_da_conta, somar_prefixo
+
+NIVEIS_ESTRUTURA = [f'N{nivel}' for nivel in range(1, 11)]
+
+# Pai das contas do primeiro nível (convenção do Plotly para a raiz)
+RAIZ = ''
+
+
+def conta_na_estrutura(codigos, contas):
+    """Conta da estrutura de cada código: o próprio código ou o ancestral mais próximo
+
+    Códigos mais detalhados que a estrutura (ex.: 1113.03.4.1.10.05) sobem zerando
+    segmentos da direita até chegar a uma conta conhecida; sem nenhuma, ficam NA.
+    """
+    codigos = pd.Series(codigos, dtype='string').reset_index(drop=True)
+    segmentos = codigos.str.split('.', expand=True)
+    zerados = segmentos.apply(lambda segmento: segmento.str.replace(r'\d', '0', regex=True))
+    conta = codigos.where(codigos.isin(contas))
+    for mantidos in range(segmentos.shape[1] - 1, 0, -1):
+        faltando = conta.isna() & codigos.notna()
+        if not faltando.any():
+            break
+        partes = pd.concat([segmentos.iloc[:, :mantidos], zerados.iloc[:, mantidos:]], axis=1)[faltando]
+        candidato = partes.iloc[:, 0].str.cat([partes[coluna] for coluna in partes.columns[1:]], sep='.')
+        conta[faltando] = candidato.where(candidato.isin(contas))
+    return conta
+
+
+def montar_cubo(estrutura, fatos):
+    """Monta o cubo com os valores de cada tabela acumulados pela árvore da estrutura
+
+    fatos: lista de (df, coluna do código, colunas de valor), com uma linha por
+    lançamento folha (sem linhas de totais). Retorna um DataFrame indexado por
+    CODRE com NOMRE, NIVEL, 'pai' e as colunas de valor em centavos, com as contas
+    que têm valor e todos os seus ancestrais. Códigos que não se ligam a nenhuma
+    conta ficam listados em cubo.attrs['sem_conta'].
+    """
+    contas = estrutura.drop_duplicates('CODRE').set_index('CODRE')
+    proprios = []
+    sem_conta = []
+    for df, coluna, valores in fatos:
+        conta = conta_na_estrutura(df[coluna], contas.index)
+        sem_conta.extend(df.loc[conta.isna().to_numpy(), coluna].dropna().tolist())
+        proprios.append(df[valores].groupby(conta.to_numpy()).sum())
+    proprios = pd.concat(proprios, axis=1).fillna(0).astype('int64')
+    valores = list(proprios.columns)
+
+    linhagem = (
+        contas.loc[contas.index.isin(proprios.index), NIVEIS_ESTRUTURA]
+        .rename_axis('conta').reset_index()
+        .melt(id_vars='conta', value_name='ancestral')
+        .dropna(subset=['ancestral'])
+        .drop_duplicates(['conta', 'ancestral'])
+    )
+    acumulado = linhagem.join(proprios, on='conta').groupby('ancestral')[valores].sum()
+
+    # Pai: o último ancestral da linhagem diferente da própria conta
+    ancestrais = contas[NIVEIS_ESTRUTURA]
+    ancestrais = ancestrais.where(ancestrais.ne(contas.index.to_series(), axis=0))
+    pai = ancestrais.ffill(axis=1).iloc[:, -1].fillna(RAIZ)
+
+    cubo = contas[['NOMRE', 'NIVEL']].assign(pai=pai).join(acumulado, how='inner')
+    cubo.attrs['sem_conta'] = sem_conta
+    return cubo
+
+
+def ramos_do_cubo(cubo, coluna):
+    """Contas com valor positivo na coluna, ligadas à raiz, prontas para treemap/sunburst
+
+    Sub-árvores com total não positivo (ex.: deduções) ficam de fora inteiras, para
+    que cada pai continue maior ou igual à soma dos filhos (branchvalues='total').
+    """
+    positivos = cubo[cubo[coluna] > 0]
+    mantidos = {RAIZ}
+    for nivel in sorted(positivos['NIVEL'].dropna().unique()):
+        do_nivel = positivos[(positivos['NIVEL'] == nivel) & positivos['pai'].isin(mantidos)]
+        mantidos.update(do_nivel.index)
+    return positivos[positivos.index.isin(mantidos)].sort_values('NIVEL')
+
+
+
+def separar_folhas(df, esquema):
+    """Divide a tabela em (folhas, sintéticas) pela coluna 'folha' do esquema
+
+    Sintéticas repetidas (ex.: 9510, exportada mais de uma vez) entram uma única vez.
+    Sem 'folha' no esquema, todas as linhas são folhas.
+    """
+    if esquema.folha is None:
+        return df, df.iloc[0:0]
+    eh_folha = df[esquema.folha].notna()
+    return df[eh_folha], df[~eh_folha].drop_duplicates()
+
+
+def conferir_sinteticas(sinteticas, coluna, indice_folhas, valores):
+    """Compara o total de cada conta sintética com a soma das folhas abaixo dela
+
+    indice_folhas é o índice de prefixos (orcamento.classificacao) das folhas, com
+    as somas das colunas de valores; cada conta custa quatro buscas binárias. As
+    folhas com o mesmo código da sintética (a conta repartida por código de
+    aplicação) ora entram no total do Portal, ora não (1321.01.0.1.90.00 traz só
+    os desdobramentos .90.55, .90.57, ...): o total confere se for igual a uma das
+    duas somas. Retorna [{codigo, coluna, informado, calculado}] só com as
+    divergências, com a soma que inclui o mesmo código.
+    """
+    divergencias = []
+    for codigo, *informados in sinteticas[[coluna, *valores]].itertuples(index=False):
+        prefixo = prefixo_da_conta(codigo)
+        inicio, fim = intervalo_codigo(indice_folhas, codigo)
+        for valor, informado in zip(valores, informados):
+            calculado = somar_prefixo(indice_folhas, prefixo, valor)
+            somas = indice_folhas.somas[valor]
+            sem_mesmo_codigo = calculado - (somas[fim] - somas[inicio])
+            if informado not in (calculado, sem_mesmo_codigo):
+                divergencias.append({
+                    'codigo': codigo, 'coluna': valor, 'informado': int(informado), 'calculado': int(calculado),
+                })
+    return divergencias
@@ -0,0 +1,319 @@
+"""Ingestão incremental das despesas, com chave (Empenho, Tipo)
+
+A exportação de despesas do Portal é cumulativa: cada download repete os
+empenhos anteriores (com liquidado/pago atualizados) e acrescenta os novos. O
+armazém guarda as linhas já tipadas, com um hash por linha, em segmentos
+Parquet, além do cubo e dos totais de orcamento.ingestao. Quando chega um
+arquivo novo, as linhas são comparadas pelo hash e só as novas, alteradas ou
+removidas entram como diferença no cubo e são gravadas em um novo segmento.
+Linhas removidas são gravadas como marcadores (hash zero). A comparação lê dos
+segmentos só a chave e o hash; linhas inteiras são lidas apenas para as chaves
+alteradas ou removidas, cuja versão anterior sai dos agregados. Os segmentos
+são compactados em um só quando passam de LIMITE_SEGMENTOS, um segmento por
+vez. As dimensões das fichas e dos fornecedores não são aditivas: são
+remontadas a cada atualização com as fichas de todas as linhas lidas, que já
+passam pela memória para a comparação dos hashes.
+"""
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    # Sem pyarrow não há armazém: atualizar_despesas recalcula tudo
+    pa = pq = None
+
+from orcamento.cache_colunar import (
+    DIRETORIO_CACHE,
+    PARQUET_DISPONIVEL,
+    assinatura_esquema,
+    conferir_origem,
+    gravar_atomico,
+    gravar_manifesto,
+    ler_manifesto,
+)
+from orcamento.esquemas import MONETARIO, colunas_do_tipo, valores_dos_fatos
+from orcamento.fornecedores import contar_nomes, montar_fornecedores
+from orcamento.ingestao import (
+    agregados_vazios,
+    agregar_despesas,
+    agregar_lote,
+    combinar_agregados,
+    ler_lotes,
+    montar_visoes,
+)
+from orcamento.leitura import juntar_dimensoes, separar_dimensao
+
+CHAVE_DESPESAS = ['Empenho', 'Tipo']
+COLUNA_HASH = 'hash_linha'
+HASH_REMOVIDO = 0
+
+# Posição, na lista de segmentos, do segmento com a última versão de cada chave
+COLUNA_SEGMENTO = 'segmento'
+
+LIMITE_SEGMENTOS = 8
+
+# Incrementar quando o formato gravado mudar de forma incompatível
+VERSAO_ARMAZEM = 4
+
+
+def hash_linhas(df, colunas):
+    """Hash de cada linha sobre os valores já convertidos das colunas"""
+    return pd.util.hash_pandas_object(df[colunas], index=False).astype('uint64')
+
+
+def _indice_chave(df):
+    # Normaliza os tipos da chave: segmentos diferentes podem ter categorias diferentes
+    return pd.MultiIndex.from_arrays(
+        [df['Empenho'].astype('int64'), df['Tipo'].astype(str)],
+        names=CHAVE_DESPESAS,
+    )
+
+
+def _pasta_armazem(esquema, diretorio):
+    return os.path.join(diretorio, 'incremental', esquema.nome)
+
+
+def _ler_estado(pasta, segmentos):
+    """Hash e segmento da última versão de cada chave, indexados pela chave
+
+    Lê só a chave e o hash de cada segmento; chaves removidas ficam fora.
+    """
+    if not segmentos:
+        return None
+    partes = []
+    for numero, segmento in enumerate(segmentos):
+        parte = pd.read_parquet(os.path.join(pasta, segmento), columns=[*CHAVE_DESPESAS, COLUNA_HASH])
+        partes.append(pd.DataFrame(
+            {COLUNA_HASH: parte[COLUNA_HASH].to_numpy(), COLUNA_SEGMENTO: numero},
+            index=_indice_chave(parte),
+        ))
+    estado = pd.concat(partes)
+    estado = estado[~estado.index.duplicated(keep='last')]
+    return estado[estado[COLUNA_HASH] != HASH_REMOVIDO]
+
+
+def _ultimas_do_segmento(parte, estado, numero):
+    # Linhas do segmento que são a última versão da sua chave, indexadas pela chave
+    chave = _indice_chave(parte)
+    atual = (estado[COLUNA_SEGMENTO].reindex(chave).to_numpy() == numero) & ~chave.duplicated(keep='last')
+    parte = parte[atual]
+    parte.index = chave[atual]
+    return parte
+
+
+def _ler_linhas(pasta, segmentos, estado, chaves):
+    """Linhas inteiras, na última versão, só das chaves informadas (que precisam estar no estado)
+
+    Cada segmento é lido filtrado pelos empenhos que ele guarda entre essas chaves.
+    """
+    partes = []
+    for numero, grupo in estado.loc[chaves].groupby(COLUNA_SEGMENTO):
+        empenhos = grupo.index.get_level_values('Empenho').unique().tolist()
+        parte = pd.read_parquet(os.path.join(pasta, segmentos[numero]), filters=[('Empenho', 'in', empenhos)])
+        parte = _ultimas_do_segmento(parte, estado, numero)
+        partes.append(parte[parte.index.isin(grupo.index)])
+    return pd.concat(partes)
+
+
+def _esquema_compactado(esquema):
+    # Segmentos diferentes podem ter dicionários (categorias) com índices de larguras diferentes
+    return pa.schema(
+        [
+            pa.field(campo.name, pa.dictionary(pa.int32(), campo.type.value_type))
+            if pa.types.is_dictionary(campo.type) else campo
+            for campo in esquema
+        ],
+        metadata=esquema.metadata,
+    )
+
+
+def _compactar(pasta, segmentos, destino):
+    """Grava num só segmento a última versão de cada chave, lendo um segmento por vez"""
+    estado = _ler_estado(pasta, segmentos)
+
+    def escrever(temporario):
+        gravador = None
+        try:
+            for numero, segmento in enumerate(segmentos):
+                parte = _ultimas_do_segmento(pd.read_parquet(os.path.join(pasta, segmento)), estado, numero)
+                tabela = pa.Table.from_pandas(parte, preserve_index=False)
+                if gravador is None:
+                    esquema = _esquema_compactado(tabela.schema)
+                    gravador = pq.ParquetWriter(temporario, esquema)
+                gravador.write_table(tabela.cast(esquema))
+        finally:
+            if gravador is not None:
+                gravador.close()
+
+    gravar_atomico(destino, escrever)
+
+
+def _ler_agregados(pasta, manifesto):
+    agregados = {'cubo': pd.read_parquet(os.path.join(pasta, 'cubo.parquet'))}
+    agregados['fichas'] = pd.read_parquet(os.path.join(pasta, 'fichas.parquet'))
+    agregados['fornecedores'] = pd.read_parquet(os.path.join(pasta, 'fornecedores.parquet'))
+    agregados['totais'] = pd.Series(manifesto['totais'], dtype='int64')
+    agregados['data_inicial'] = pd.Timestamp(manifesto['data_inicial']) if manifesto['data_inicial'] else pd.NaT
+    agregados['rodape'] = manifesto['rodape']
+    agregados['celulas_invalidas'] = manifesto['celulas_invalidas']
+    agregados['alteracoes'] = manifesto['alteracoes']
+    return agregados
+
+
+def _gravar_parquet(destino, df, index=True):
+    gravar_atomico(destino, lambda temporario: df.to_parquet(temporario, index=index))
+
+
+def _limpar_pasta(pasta):
+    for arquivo in glob.glob(os.path.join(pasta, '*.parquet')):
+        os.remove(arquivo)
+
+
+def atualizar_despesas(esquema, diretorio=DIRETORIO_CACHE, linhas=None):
+    """Atualiza o armazém com o arquivo atual e devolve os agregados das despesas
+
+    Retorna o mesmo dicionário de agregar_despesas, mais 'alteracoes' com a
+    quantidade de linhas novas, alteradas e removidas na última atualização.
+    Sem pyarrow, recalcula tudo com agregar_despesas.
+    """
+    if not PARQUET_DISPONIVEL:
+        return agregar_despesas(esquema, linhas)
+
+    pasta = _pasta_armazem(esquema, diretorio)
+    arquivo_manifesto = os.path.join(pasta, 'manifesto.json')
+    assinatura = assinatura_esquema(esquema)
+    manifesto = ler_manifesto(arquivo_manifesto)
+
+    valido = (
+        manifesto is not None
+        and manifesto.get('versao_formato') == VERSAO_ARMAZEM
+        and manifesto.get('esquema') == assinatura
+    )
+
+    inalterado, impressao = conferir_origem(esquema.arquivo, manifesto['origem'] if valido else None)
+    if inalterado:
+        if impressao is not manifesto['origem']:
+            manifesto['origem'] = impressao
+            gravar_manifesto(arquivo_manifesto, manifesto)
+        return montar_visoes(_ler_agregados(pasta, manifesto))
+
+    if valido:
+        segmentos = manifesto['segmentos']
+        proximo_segmento = manifesto['proximo_segmento']
+        estado = _ler_estado(pasta, segmentos)
+        delta = None
+    else:
+        os.makedirs(pasta, exist_ok=True)
+        _limpar_pasta(pasta)
+        segmentos, proximo_segmento, estado, delta = [], 1, None, None
+
+    colunas = list(esquema.colunas)
+    valores = valores_dos_fatos(esquema)
+    alteracoes = {'novas': 0, 'alteradas': 0, 'removidas': 0}
+    rodape = dict.fromkeys(colunas_do_tipo(esquema, MONETARIO), 0)
+    invalidas = []
+    fichas = []
+    nomes = []
+    chaves_vistas = []
+    chaves_alteradas = []
+    gravar = []
+    datas_iniciais = []
+
+    for lote, invalidas_lote, rodape_lote in ler_lotes(esquema, linhas):
+        for coluna, total in rodape_lote.items():
+            rodape[coluna] += total
+        invalidas.extend(invalidas_lote.to_dict('records'))
+        datas_iniciais.append(lote['Data'].min())
+        fichas.append(separar_dimensao(lote, esquema)[1])
+        nomes.append(contar_nomes(lote))
+
+        lote = lote.assign(**{COLUNA_HASH: hash_linhas(lote, colunas)})
+        chave = _indice_chave(lote)
+        chaves_vistas.append(chave)
+
+        if estado is not None:
+            existia = chave.isin(estado.index)
+            mudou = np.ones(len(lote), dtype=bool)
+            mudou[existia] = (
+                estado.loc[chave[existia], COLUNA_HASH].to_numpy() != lote.loc[existia, COLUNA_HASH].to_numpy()
+            )
+            alteradas = chave[existia][mudou[existia]]
+            chaves_alteradas.append(alteradas)
+            alteracoes['alteradas'] += len(alteradas)
+            alteracoes['novas'] += int((~existia).sum())
+            lote = lote[mudou]
+        else:
+            alteracoes['novas'] += len(lote)
+
+        if not lote.empty:
+            delta = combinar_agregados(delta, agregar_lote(lote, valores))
+            gravar.append(lote)
+
+    if estado is not None and chaves_vistas:
+        removidas = estado.index.difference(chaves_vistas[0].append(chaves_vistas[1:]))
+        # Só as linhas alteradas e removidas são lidas inteiras, para retirar a versão anterior
+        retirar = removidas.append(chaves_alteradas)
+        if len(retirar):
+            anteriores = _ler_linhas(pasta, segmentos, estado, retirar)
+            delta = combinar_agregados(delta, agregar_lote(anteriores, valores), sinal=-1)
+        if len(removidas):
+            # Marcadores mantêm a linha inteira para não misturar tipos entre segmentos
+            marcadores = anteriores.loc[removidas].reset_index(drop=True).assign(**{COLUNA_HASH: HASH_REMOVIDO})
+            gravar.append(marcadores.astype({COLUNA_HASH: 'uint64'}))
+            alteracoes['removidas'] = len(removidas)
+
+    # Agregados: anteriores + diferença (ou a diferença inteira na primeira carga)
+    if valido:
+        agregados = _ler_agregados(pasta, manifesto)
+        if delta is not None:
+            agregados = combinar_agregados(agregados, delta)
+    elif delta is not None:
+        agregados = delta
+    else:
+        agregados = agregados_vazios(valores)
+
+    datas_iniciais = [data for data in datas_iniciais if pd.notna(data)]
+    agregados['data_inicial'] = min(datas_iniciais) if datas_iniciais else pd.NaT
+    agregados['fichas'] = juntar_dimensoes(fichas)
+    agregados['fornecedores'] = montar_fornecedores(nomes)
+    agregados['rodape'] = rodape
+    agregados['celulas_invalidas'] = invalidas
+    agregados['alteracoes'] = alteracoes
+
+    # Novo segmento só com as linhas que mudaram; compactar quando houver muitos
+    if gravar:
+        segmento = f'segmento-{proximo_segmento:05d}.parquet'
+        _gravar_parquet(os.path.join(pasta, segmento), pd.concat(gravar, ignore_index=True), index=False)
+        segmentos = segmentos + [segmento]
+        proximo_segmento += 1
+
+    if len(segmentos) > LIMITE_SEGMENTOS:
+        compactado = f'segmento-{proximo_segmento:05d}.parquet'
+        _compactar(pasta, segmentos, os.path.join(pasta, compactado))
+        for segmento in segmentos:
+            os.remove(os.path.join(pasta, segmento))
+        segmentos = [compactado]
+        proximo_segmento += 1
+
+    _gravar_parquet(os.path.join(pasta, 'cubo.parquet'), agregados['cubo'])
+    _gravar_parquet(os.path.join(pasta, 'fichas.parquet'), agregados['fichas'])
+    _gravar_parquet(os.path.join(pasta, 'fornecedores.parquet'), agregados['fornecedores'])
+
+    gravar_manifesto(arquivo_manifesto, {
+        'versao_formato': VERSAO_ARMAZEM,
+        'esquema': assinatura,
+        'origem': impressao,
+        'segmentos': segmentos,
+        'proximo_segmento': proximo_segmento,
+        'totais': {coluna: int(total) for coluna, total in agregados['totais'].items()},
+        'data_inicial': agregados['data_inicial'].isoformat() if pd.notna(agregados['data_inicial']) else None,
+        'rodape': rodape,
+        'celulas_invalidas': invalidas,
+        'alteracoes': alteracoes,
+    })
+    return montar_visoes(agregados)
@@ -0,0 +1,179 @@
+"""Ingestão das despesas em lotes, acumulando só os agregados usados pelos dashboards
+
+O CSV é lido em lotes com tamanho limitado por ORCAMENTO_LIMITE_MEMORIA_MB.
+Cada lote é convertido como em ler_tabela, somado ao cubo das despesas e depois
+descartado. O cubo tem uma célula por combinação de função, subfunção,
+natureza, fornecedor e mês, com as somas e a contagem de empenhos; as visões
+usadas pelas páginas (por função, subfunção, natureza, fornecedor, função e
+fornecedor, mês) saem dele uma vez por versão do arquivo, sem voltar às linhas.
+A dotação, que o Portal repete em cada empenho da ficha, não entra nesses
+agregados: vai para a dimensão das fichas ('fichas', uma linha por N° Ficha), à
+qual as métricas de dotação se juntam. O fornecedor entra no cubo pela chave
+inteira de orcamento.fornecedores; os nomes canônicos ficam na dimensão
+'fornecedores'. A tabela linha a linha só é montada quando uma página de
+detalhamento pedir (orcamento.cache_colunar.carregar_tabela).
+
+O cubo e os totais são somas e contagens; combinar_agregados aceita sinal
+negativo para retirar linhas, o que permite atualizá-los por diferença.
+"""
+import os
+
+import pandas as pd
+
+from orcamento.arquivos import TAMANHO_AMOSTRA
+from orcamento.esquemas import MONETARIO, colunas_do_tipo, valores_dos_fatos
+from orcamento.fornecedores import (
+    COLUNA_CHAVE,
+    agrupar_por_raiz,
+    chave_fornecedor,
+    contar_nomes,
+    montar_fornecedores,
+    nomear_fornecedores,
+)
+from orcamento.leitura import (
+    aplicar_conversores,
+    juntar_dimensoes,
+    ler_csv,
+    separar_dimensao,
+    separar_rodape,
+    tipos_leitura,
+)
+
+LIMITE_MEMORIA_MB = int(os.environ.get('ORCAMENTO_LIMITE_MEMORIA_MB', '64'))
+
+# Um lote tipado (com as cópias feitas na conversão) ocupa algumas vezes o
+# tamanho do texto do CSV; estimativa conservadora
+FATOR_EXPANSAO = 8
+MINIMO_LINHAS_LOTE = 1000
+
+COLUNA_CONTAGEM = 'empenhos'
+
+# Chaves das células do cubo (códigos com os nomes, que dependem deles)
+DIMENSOES_CUBO = [
+    'Função', 'Nome da Função', 'Subfunção', 'Nome da Subfunção',
+    'Natureza', 'Nome Natureza', COLUNA_CHAVE, 'mes',
+]
+
+# Visões do cubo usadas pelos dashboards: {nome: chaves}
+DIMENSOES_DESPESAS = {
+    'funcao': ['Função', 'Nome da Função'],
+    'subfuncao': ['Nome da Função', 'Subfunção', 'Nome da Subfunção'],
+    'natureza': ['Natureza', 'Nome Natureza'],
+    'fornecedor': [COLUNA_CHAVE],
+    'funcao_fornecedor': ['Nome da Função', COLUNA_CHAVE],
+    'mes': ['mes'],
+}
+
+
+def linhas_por_lote(caminho, limite_mb=LIMITE_MEMORIA_MB):
+    """Estima quantas linhas do CSV cabem em um lote dentro do limite de memória"""
+    with open(caminho, 'rb') as arquivo:
+        amostra = arquivo.read(TAMANHO_AMOSTRA)
+    bytes_por_linha = len(amostra) / max(amostra.count(b'\n'), 1)
+    limite_bytes = limite_mb * 1024 * 1024
+    return max(MINIMO_LINHAS_LOTE, int(limite_bytes / (bytes_por_linha * FATOR_EXPANSAO)))
+
+
+def ler_lotes(esquema, linhas=None):
+    """Gera (lote, invalidas, rodape) já convertidos, sem carregar o arquivo inteiro"""
+    linhas = linhas or linhas_por_lote(esquema.arquivo)
+    leitor = ler_csv(
+        esquema.arquivo,
+        usecols=list(esquema.colunas),
+        dtype=tipos_leitura(esquema),
+        chunksize=linhas,
+    )
+    with leitor:
+        for lote in leitor:
+            lote, invalidas = aplicar_conversores(lote, esquema)
+            lote, rodape = separar_rodape(lote, esquema)
+            yield lote, invalidas, rodape
+
+
+def agregar_lote(lote, valores):
+    """Agregados parciais (cubo e totais, em centavos, com a contagem de empenhos) de um lote"""
+    lote = lote.assign(**{
+        'mes': lote['Data'].dt.strftime('%Y-%m'),
+        COLUNA_CHAVE: chave_fornecedor(lote),
+        COLUNA_CONTAGEM: 1,
+    })
+    colunas = valores + [COLUNA_CONTAGEM]
+    agregados = {'cubo': lote.groupby(DIMENSOES_CUBO, observed=True, dropna=False)[colunas].sum()}
+    agregados['totais'] = lote[colunas].sum()
+    agregados['data_inicial'] = lote['Data'].min()
+    return agregados
+
+
+def agregados_vazios(valores):
+    """Agregados de um arquivo sem linhas: cubo vazio e totais zerados"""
+    colunas = valores + [COLUNA_CONTAGEM]
+    cubo = pd.DataFrame(
+        index=pd.MultiIndex.from_arrays([[]] * len(DIMENSOES_CUBO), names=DIMENSOES_CUBO),
+        columns=colunas,
+        dtype='int64',
+    )
+    return {'cubo': cubo, 'totais': pd.Series(0, index=colunas, dtype='int64'), 'data_inicial': pd.NaT}
+
+
+def combinar_agregados(acumulado, parcial, sinal=1):
+    """Soma (ou subtrai, com sinal=-1) agregados parciais aos acumulados"""
+    if acumulado is None:
+        acumulado = {'cubo': parcial['cubo'].iloc[0:0], 'totais': parcial['totais'] * 0, 'data_inicial': pd.NaT}
+
+    somado = consultar_cubo(pd.concat([acumulado['cubo'], parcial['cubo'] * sinal]), DIMENSOES_CUBO)
+    # Células zeradas somem; numa diferença, contagem zero ainda pode mover valores
+    combinado = {'cubo': somado[(somado != 0).any(axis=1)]}
+    combinado['totais'] = acumulado['totais'] + parcial['totais'] * sinal
+    datas = [data for data in (acumulado['data_inicial'], parcial['data_inicial']) if pd.notna(data)]
+    combinado['data_inicial'] = min(datas) if datas else pd.NaT
+    return combinado
+
+
+def consultar_cubo(cubo, chaves):
+    """Soma as células do cubo pelas chaves informadas (subconjunto de DIMENSOES_CUBO)"""
+    return cubo.groupby(level=chaves, observed=True, dropna=False).sum()
+
+
+def montar_visoes(agregados):
+    """Acrescenta aos agregados uma visão do cubo para cada item de DIMENSOES_DESPESAS
+
+    Visões por fornecedor já vêm com o nome canônico e o CPF/CNPJ; 'grupo_fornecedor'
+    soma a visão por fornecedor pela raiz do CNPJ.
+    """
+    fornecedores = agregados['fornecedores']
+    visoes = {}
+    for nome, chaves in DIMENSOES_DESPESAS.items():
+        visao = consultar_cubo(agregados['cubo'], chaves)
+        visoes[nome] = nomear_fornecedores(visao, fornecedores) if COLUNA_CHAVE in chaves else visao
+    visoes['grupo_fornecedor'] = agrupar_por_raiz(consultar_cubo(agregados['cubo'], [COLUNA_CHAVE]), fornecedores)
+    return {**agregados, **visoes}
+
+
+def agregar_despesas(esquema, linhas=None):
+    """Lê as despesas em lotes e devolve só os agregados, sem a tabela linha a linha
+
+    Retorna um dicionário com o 'cubo', uma visão dele por item de
+    DIMENSOES_DESPESAS (indexada pelas chaves), 'totais' (Series), 'data_inicial', 'fichas' (a
+    dimensão do esquema, com a dotação de cada ficha), 'rodape' e
+    'celulas_invalidas', estes dois como em df.attrs de ler_tabela.
+    """
+    valores = valores_dos_fatos(esquema)
+    agregados = None
+    rodape = dict.fromkeys(colunas_do_tipo(esquema, MONETARIO), 0)
+    invalidas = []
+    fichas = []
+    nomes = []
+
+    for lote, invalidas_lote, rodape_lote in ler_lotes(esquema, linhas):
+        agregados = combinar_agregados(agregados, agregar_lote(lote, valores))
+        fichas.append(separar_dimensao(lote, esquema)[1])
+        nomes.append(contar_nomes(lote))
+        for coluna, total in rodape_lote.items():
+            rodape[coluna] += total
+        invalidas.extend(invalidas_lote.to_dict('records'))
+
+    agregados['fichas'] = juntar_dimensoes(fichas)
+    agregados['fornecedores'] = montar_fornecedores(nomes)
+    agregados['rodape'] = rodape
+    agregados['celulas_invalidas'] = invalidas
+    return montar_visoes(agregados)
@@ -0,0 +1,101 @@
+"""Leitura dos CSVs exportados pelo Portal Transparência e pelo sistema da LOA"""
+import pandas as pd
+
+from orcamento.arquivos import CODIFICACAO_ALTERNATIVA, detectar_codificacao
+from orcamento.conversao import converter_coluna_centavos, converter_colunas_br
+from orcamento.esquemas import DATA, FORMATO_DATA, MONETARIO, colunas_do_tipo, valores_da_dimensao
+
+# Conversores especiais são lidos como texto e convertidos depois
+TIPOS_LEITURA = {MONETARIO: 'string', DATA: 'string'}
+
+
+def ler_csv(caminho, **opcoes):
+    """Lê um CSV separado por ponto e vírgula, decodificando o arquivo uma única vez"""
+    try:
+        return pd.read_csv(caminho, sep=';', encoding=detectar_codificacao(caminho), **opcoes)
+    except UnicodeDecodeError:
+        # A amostra não cobre o arquivo inteiro; byte inválido fora dela
+        return pd.read_csv(caminho, sep=';', encoding=CODIFICACAO_ALTERNATIVA, **opcoes)
+
+
+def aplicar_conversores(df, esquema):
+    """Converte as colunas monetárias (para centavos) e de data declaradas no esquema"""
+    df, invalidas = converter_colunas_br(df, colunas_do_tipo(esquema, MONETARIO), converter_coluna_centavos)
+    for coluna in colunas_do_tipo(esquema, DATA):
+        df[coluna] = pd.to_datetime(df[coluna], format=FORMATO_DATA, errors='coerce')
+    return df, invalidas
+
+
+def separar_rodape(df, esquema):
+    """Remove a linha de totais do Portal e retorna (df, totais em centavos por coluna)"""
+    if esquema.rodape is None:
+        return df, {}
+    eh_rodape = df[esquema.rodape].isna()
+    totais = {
+        coluna: int(df.loc[eh_rodape, coluna].sum())
+        for coluna in colunas_do_tipo(esquema, MONETARIO)
+    }
+    return df[~eh_rodape], totais
+
+
+def separar_dimensao(df, esquema):
+    """Divide a tabela em (fatos, dimensão) pela 'dimensao' do esquema
+
+    A dimensão tem uma linha por chave, indexada por ela e ordenada; os fatos
+    perdem os valores monetários da dimensão, que não podem ser somados linha a
+    linha. Sem 'dimensao' no esquema, retorna (df, None).
+    """
+    if esquema.dimensao is None:
+        return df, None
+    chave, colunas = esquema.dimensao
+    dimensao = df.drop_duplicates(chave, keep='last').set_index(chave)[colunas].sort_index()
+    return df.drop(columns=valores_da_dimensao(esquema)), dimensao
+
+
+def juntar_dimensoes(partes):
+    """Junta dimensões de lotes diferentes; numa chave repetida vale a última"""
+    dimensao = pd.concat(partes)
+    return dimensao[~dimensao.index.duplicated(keep='last')].sort_index()
+
+
+def divergencias_rodape(totais, rodape):
+    """Compara somas em centavos por coluna com os totais do rodapé do Portal
+
+    Colunas que o Portal não totaliza (zero no rodapé) são ignoradas. As somas
+    precisam ser de linhas que não se sobrepõem: as despesas inteiras, ou só as
+    folhas das receitas (orcamento.hierarquia.separar_folhas).
+    """
+    divergencias = []
+    for coluna, portal in rodape.items():
+        if portal == 0:
+            continue
+        calculado = int(totais[coluna])
+        if calculado != portal:
+            divergencias.append({'coluna': coluna, 'portal': portal, 'calculado': calculado})
+    return divergencias
+
+
+def aplicar_derivadas(df, esquema):
+    """Acrescenta as colunas derivadas do esquema (prefixos dos códigos de classificação)"""
+    if not esquema.derivadas:
+        return df
+    return df.assign(**{
+        nome: df[origem].str[:tamanho]
+        for nome, (origem, tamanho) in esquema.derivadas.items()
+    })
+
+
+def tipos_leitura(esquema):
+    """Dtypes passados ao read_csv para as colunas do esquema"""
+    return {coluna: TIPOS_LEITURA.get(tipo, tipo) for coluna, tipo in esquema.colunas.items()}
+
+
+def ler_tabela(esquema):
+    """Lê apenas as colunas do esquema, já com os tipos compactos, valores convertidos e colunas derivadas"""
+    df = ler_csv(esquema.arquivo, usecols=list(esquema.colunas), dtype=tipos_leitura(esquema))
+    df, invalidas = aplicar_conversores(df, esquema)
+    df, totais = separar_rodape(df, esquema)
+    df = aplicar_derivadas(df, esquema)
+    df.attrs['celulas_invalidas'] = invalidas.to_dict('records')
+    df.attrs['rodape'] = totais
+    return df
@@ -0,0 +1,48 @@
+"""Registro de métricas calculadas sob demanda
+
+Cada métrica é um nó com nome e dependências declaradas: o nome é o da função e
+as dependências são os nomes dos seus parâmetros (outras métricas ou os próprios
+conjuntos de dados, registrados como nós sem parâmetros). Definir não calcula
+nada; o valor de um nó é calculado na primeira vez que uma página pede por ele,
+junto com as dependências que ainda faltam, e guardado até o fim da execução.
+Assim cada página paga só pelo que mostra. Só usa a biblioteca padrão para
+servir também ao app_simple.py.
+"""
+import inspect
+
+
+class Metricas:
+    """Nós nomeados, avaliados preguiçosamente e memorizados"""
+
+    def __init__(self):
+        self._nos = {}
+        self._valores = {}
+        self._calculando = set()
+
+    def metrica(self, funcao):
+        """Decorador que registra a função como nó; os parâmetros dela são as dependências"""
+        if funcao.__name__ in self._nos:
+            raise ValueError(f"Métrica já definida: {funcao.__name__}")
+        dependencias = tuple(inspect.signature(funcao).parameters)
+        self._nos[funcao.__name__] = (funcao, dependencias)
+        return funcao
+
+    def __getitem__(self, nome):
+        if nome in self._valores:
+            return self._valores[nome]
+        if nome not in self._nos:
+            raise KeyError(f"Métrica não definida: {nome}")
+        if nome in self._calculando:
+            raise ValueError(f"Dependência circular na métrica: {nome}")
+        funcao, dependencias = self._nos[nome]
+        self._calculando.add(nome)
+        try:
+            valor = funcao(*(self[dependencia] for dependencia in dependencias))
+        finally:
+            self._calculando.discard(nome)
+        self._valores[nome] = valor
+        return valor
+
+    def calculadas(self):
+        """Nomes dos nós já calculados, na ordem em que ficaram prontos"""
+        return list(self._valores)
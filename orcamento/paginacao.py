@@ -0,0 +1,69 @@
+"""Paginação com ordenação no servidor para as tabelas de detalhamento
+
+Cada coluna ordenável é ordenada uma única vez por versão do arquivo: a ordem
+guarda as posições das linhas com valor, em ordem crescente do valor, e à parte
+as posições sem valor (que ficam sempre no fim). A cada mudança dos filtros a
+ordem é restrita às linhas selecionadas, numa única passada; uma página é então
+só uma fatia dessa ordem (contada do fim, se decrescente), com custo que não
+depende do número da página. Só essas linhas são formatadas e enviadas ao
+navegador. Só usa a biblioteca padrão para servir também ao app_simple.py; as
+ordens guardadas como arrays do numpy são restritas de forma vetorizada.
+"""
+from collections import namedtuple
+from itertools import chain
+
+TAMANHO_PAGINA = 50
+
+OrdemColuna = namedtuple('OrdemColuna', ['validas', 'ausentes'])
+
+
+def _ausente(valor):
+    try:
+        return valor is None or bool(valor != valor)
+    except TypeError:
+        # pd.NA não pode ser convertido para bool
+        return True
+
+
+def ordenar_coluna(valores):
+    """Ordem das posições de uma lista de valores; None, NaN, NaT e NA ficam em 'ausentes'"""
+    ausentes = [posicao for posicao, valor in enumerate(valores) if _ausente(valor)]
+    excluidas = set(ausentes)
+    validas = sorted((posicao for posicao in range(len(valores)) if posicao not in excluidas), key=valores.__getitem__)
+    return OrdemColuna(validas, ausentes)
+
+
+def numero_de_paginas(total, tamanho=TAMANHO_PAGINA):
+    """Quantidade de páginas para o total de linhas (ao menos uma)"""
+    return max(1, -(-total // tamanho))
+
+
+def _selecionar(posicoes, selecao):
+    if hasattr(posicoes, 'dtype'):
+        # Array do numpy com uma máscara do numpy: seleção vetorizada
+        return posicoes[selecao[posicoes]]
+    return [posicao for posicao in posicoes if selecao[posicao]]
+
+
+def selecionar_ordem(ordem, selecao):
+    """Ordem restrita às linhas selecionadas, mantendo a ordem da coluna
+
+    selecao: sequência de booleanos por posição (ex.: máscara dos filtros) ou None
+    para todas as linhas.
+    """
+    if selecao is None:
+        return ordem
+    return OrdemColuna(_selecionar(ordem.validas, selecao), _selecionar(ordem.ausentes, selecao))
+
+
+def posicoes_da_pagina(ordem, pagina, tamanho=TAMANHO_PAGINA, decrescente=False):
+    """Posições das linhas da página (começando em 1), fatiadas da ordem já selecionada"""
+    inicio = (pagina - 1) * tamanho
+    fim = inicio + tamanho
+    total_validas = len(ordem.validas)
+    if decrescente:
+        validas = ordem.validas[max(total_validas - fim, 0):max(total_validas - inicio, 0)][::-1]
+    else:
+        validas = ordem.validas[inicio:fim]
+    ausentes = ordem.ausentes[max(inicio - total_validas, 0):max(fim - total_validas, 0)]
+    return list(chain(validas, ausentes))
@@ -0,0 +1,30 @@
+"""Execução concorrente de cargas independentes, com tempo medido por tarefa
+
+A leitura de CSV (parser em C do pandas) e de Parquet (pyarrow) passa a maior
+parte do tempo fora do GIL, então threads bastam e evitam serializar os
+DataFrames entre processos.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _medir(tarefa):
+    inicio = time.perf_counter()
+    resultado = tarefa()
+    return resultado, time.perf_counter() - inicio
+
+
+def executar_em_paralelo(tarefas, inicializador=None):
+    """Executa funções sem argumentos em threads e mede o tempo de cada uma
+
+    tarefas: {nome: função}. Retorna (resultados, tempos) em dicionários com os
+    mesmos nomes; os tempos estão em segundos. 'inicializador' roda em cada thread
+    antes das tarefas (ex.: anexar o contexto do Streamlit). Exceções das tarefas
+    são propagadas.
+    """
+    with ThreadPoolExecutor(max_workers=len(tarefas) or 1, initializer=inicializador) as executor:
+        futuros = {nome: executor.submit(_medir, tarefa) for nome, tarefa in tarefas.items()}
+        medidos = {nome: futuro.result() for nome, futuro in futuros.items()}
+    resultados = {nome: resultado for nome, (resultado, _) in medidos.items()}
+    tempos = {nome: tempo for nome, (_, tempo) in medidos.items()}
+    return resultados, tempos
@@ -0,0 +1,113 @@
+"""Preaquecimento dos caches em disco antes de o servidor receber acessos
+
+Uso, na pasta dos CSVs (a mesma em que o streamlit run é executado):
+
+    python -m orcamento.preaquecer [--estrito] [--tempo-limite SEGUNDOS] [app ...]
+
+Primeiro confere e converte cada conjunto de dados do registro de esquemas,
+preenchendo o cache colunar. Depois executa, sem navegador (streamlit.testing),
+cada página de cada dashboard com os valores padrão dos controles. Assim os
+cubos, índices, ordens, agregados e figuras que elas montam ficam gravados no
+armazém de artefatos (orcamento/artefatos.py) e no armazém incremental das
+despesas. Visões que dependem de filtros e buscas continuam sendo montadas
+sob demanda.
+
+Termina com código 1 se algum arquivo não puder ser lido, vier sem linhas ou
+se alguma página falhar (com --estrito, também se houver valores monetários
+inválidos); 0 se tudo foi montado.
+"""
+import argparse
+import os
+import sys
+
+from orcamento.cache_colunar import carregar_tabela
+from orcamento.esquemas import ESQUEMAS
+
+APPS = ('app.py', 'app_executado.py', 'app_simple.py')
+
+# Pasta dos dashboards (a raiz do projeto, acima do pacote)
+PASTA_APPS = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Rótulo do menu de navegação da barra lateral, comum aos três dashboards
+ROTULO_NAVEGACAO = "📊 Escolha a análise:"
+
+TEMPO_LIMITE = 600
+
+
+def conferir_dados(estrito=False):
+    """Lê e converte cada conjunto de dados do registro; retorna a lista de erros"""
+    erros = []
+    for esquema in ESQUEMAS.values():
+        try:
+            df = carregar_tabela(esquema)
+        except (OSError, ValueError) as erro:
+            erros.append(f"{esquema.arquivo}: {erro}")
+            continue
+        if df.empty:
+            erros.append(f"{esquema.arquivo}: nenhuma linha de dados")
+            continue
+        invalidas = df.attrs.get('celulas_invalidas', [])
+        print(f"{esquema.nome}: {len(df)} linhas", end='')
+        if invalidas:
+            print(f", {len(invalidas)} valores monetários inválidos (considerados como zero)", end='')
+            if estrito:
+                erros.append(f"{esquema.arquivo}: {len(invalidas)} valores monetários inválidos")
+        print()
+    return erros
+
+
+def _navegacao(execucao):
+    for selectbox in execucao.sidebar.selectbox:
+        if selectbox.label == ROTULO_NAVEGACAO:
+            return selectbox
+    return None
+
+
+def _falhas(execucao):
+    return [excecao.message for excecao in execucao.exception]
+
+
+def preaquecer_app(app, tempo_limite=TEMPO_LIMITE):
+    """Executa cada página do dashboard com os controles no padrão; retorna a lista de erros"""
+    from streamlit.testing.v1 import AppTest
+
+    caminho = os.path.join(PASTA_APPS, app)
+    execucao = AppTest.from_file(caminho, default_timeout=tempo_limite).run()
+    navegacao = _navegacao(execucao)
+    if navegacao is None:
+        # A carga dos dados parou a execução (st.error + st.stop) antes do menu
+        mensagens = _falhas(execucao) + [erro.value for erro in execucao.error]
+        return [f"{app}: a carga dos dados falhou" + ''.join(f"\n    {mensagem}" for mensagem in mensagens)]
+
+    erros = []
+    for pagina in navegacao.options:
+        execucao = AppTest.from_file(caminho, default_timeout=tempo_limite).run()
+        _navegacao(execucao).select(pagina).run()
+        falhas = _falhas(execucao)
+        print(f"{app} / {pagina}: {'falhou' if falhas else 'ok'}")
+        erros.extend(f"{app} / {pagina}: {falha}" for falha in falhas)
+    return erros
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m orcamento.preaquecer',
+        description="Monta e grava em disco os dados e artefatos dos dashboards antes do primeiro acesso",
+    )
+    parser.add_argument('apps', nargs='*', default=list(APPS), help="dashboards a preaquecer (padrão: todos)")
+    parser.add_argument('--estrito', action='store_true', help="falha também com valores monetários inválidos")
+    parser.add_argument('--tempo-limite', type=float, default=TEMPO_LIMITE, help="segundos por execução de página")
+    opcoes = parser.parse_args(argumentos)
+
+    erros = conferir_dados(opcoes.estrito)
+    if not erros:
+        for app in opcoes.apps:
+            erros.extend(preaquecer_app(app, opcoes.tempo_limite))
+
+    for erro in erros:
+        print(f"ERRO {erro}", file=sys.stderr)
+    return 1 if erros else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
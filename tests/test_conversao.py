@@ -0,0 +1,43 @@
+"""Conversão de valores monetários para reais e centavos"""
+import numpy as np
+import pandas as pd
+
+from orcamento.colunar import centavos
+from orcamento.conversao import converter_coluna_br, converter_coluna_centavos, numero_br
+
+
+def test_ponto_decimal_virgula_decimal_e_numero():
+    assert numero_br('1234.56') == 1234.56
+    assert numero_br('1.234,56') == 1234.56
+    assert numero_br(1234) == 1234.0
+    # Com três dígitos depois do ponto, o ponto é de milhares
+    assert numero_br('1.234') == 1234.0
+    assert numero_br('1234.567') is None
+
+
+def test_centavos_de_celulas():
+    assert centavos('1234.56') == 123456
+    assert centavos('-1234.5') == -123450
+    assert centavos('1.234,56') == 123456
+    assert centavos(1234) == 123400
+    assert centavos(np.int64(1234)) == 123400
+    assert centavos(1234.56) == 123456
+    assert centavos(float('nan')) == 0
+
+
+def test_colunas_com_textos_e_numeros():
+    serie = pd.Series(['1234.56', '1.234,56', 1234, 12.5, '', None, 'abc'], dtype=object)
+
+    valores, invalidos = converter_coluna_centavos(serie)
+    assert valores.tolist() == [123456, 123456, 123400, 1250, 0, 0, 0]
+    assert invalidos.tolist() == ['abc']
+
+    valores, invalidos = converter_coluna_br(serie)
+    assert valores.tolist() == [1234.56, 1234.56, 1234.0, 12.5, 0.0, 0.0, 0.0]
+    assert invalidos.tolist() == ['abc']
+
+
+def test_colunas_numericas():
+    valores, invalidos = converter_coluna_centavos(pd.Series([1234, 5]))
+    assert valores.tolist() == [123400, 500]
+    assert invalidos.empty
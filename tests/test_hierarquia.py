@@ -0,0 +1,45 @@
+"""Conferência das contas sintéticas das receitas executadas"""
+import os
+
+import pandas as pd
+
+from orcamento.cache_colunar import carregar_tabela
+from orcamento.classificacao import indexar_tabela
+from orcamento.esquemas import RECEITAS_EXECUTADAS
+from orcamento.hierarquia import conferir_sinteticas, separar_folhas
+
+PASTA_DADOS = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VALORES = ['Prev. Atualizada', 'Arrec. Total']
+
+
+def _conferir(folhas, sinteticas):
+    return conferir_sinteticas(sinteticas, 'Código', indexar_tabela(folhas, 'Código', VALORES), VALORES)
+
+
+def test_planilha_do_portal_sem_divergencias(monkeypatch):
+    monkeypatch.chdir(PASTA_DADOS)
+    folhas, sinteticas = separar_folhas(carregar_tabela(RECEITAS_EXECUTADAS), RECEITAS_EXECUTADAS)
+    assert not sinteticas.empty
+    assert _conferir(folhas, sinteticas) == []
+
+
+def test_total_com_ou_sem_as_folhas_do_mesmo_codigo():
+    folhas = pd.DataFrame({
+        'Código': ['1321.01.0.1.90.00', '1321.01.0.1.90.55', '1751.50.0.1.00.00', '1751.50.0.1.02.01'],
+        'Prev. Atualizada': [300, 0, 500, 0],
+        'Arrec. Total': [200, 50, 400, 10],
+    })
+    sinteticas = pd.DataFrame({
+        'Código': ['1321.01.0.1.90.00', '1321.01.0.1.00.00', '1751.50.0.1.00.00'],
+        'Prev. Atualizada': [0, 300, 500],
+        'Arrec. Total': [50, 250, 410],
+    })
+    assert _conferir(folhas, sinteticas) == []
+
+
+def test_total_divergente():
+    folhas = pd.DataFrame({'Código': ['1112.50.0.1.00.00'], 'Prev. Atualizada': [100], 'Arrec. Total': [70]})
+    sinteticas = pd.DataFrame({'Código': ['1112.00.0.0.00.00'], 'Prev. Atualizada': [100], 'Arrec. Total': [90]})
+    assert _conferir(folhas, sinteticas) == [
+        {'codigo': '1112.00.0.0.00.00', 'coluna': 'Arrec. Total', 'informado': 90, 'calculado': 70},
+    ]
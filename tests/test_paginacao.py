@@ -0,0 +1,25 @@
+"""Páginas fatiadas da ordem restrita à seleção"""
+import numpy as np
+
+from orcamento.filtros import ordem_em_arrays
+from orcamento.paginacao import ordenar_coluna, posicoes_da_pagina, selecionar_ordem
+
+VALORES = [30, None, 10, 50, float('nan'), 20, 40]
+SELECAO = [True, True, False, True, True, True, False]
+
+
+def test_paginas_crescentes_e_decrescentes():
+    ordem = selecionar_ordem(ordenar_coluna(VALORES), SELECAO)
+    assert posicoes_da_pagina(ordem, 1, 2) == [5, 0]
+    assert posicoes_da_pagina(ordem, 2, 2) == [3, 1]
+    assert posicoes_da_pagina(ordem, 1, 2, decrescente=True) == [3, 0]
+    assert posicoes_da_pagina(ordem, 2, 2, decrescente=True) == [5, 1]
+    assert posicoes_da_pagina(ordem, 3, 2, decrescente=True) == [4]
+    assert posicoes_da_pagina(ordem, 4, 2) == []
+
+
+def test_sem_selecao_e_com_arrays_do_numpy():
+    ordem = ordenar_coluna(VALORES)
+    assert posicoes_da_pagina(selecionar_ordem(ordem, None), 1, 10) == [2, 5, 0, 6, 3, 1, 4]
+    vetorizada = selecionar_ordem(ordem_em_arrays(ordem), np.array(SELECAO))
+    assert [int(posicao) for posicao in posicoes_da_pagina(vetorizada, 1, 10, decrescente=True)] == [3, 0, 5, 1, 4]